@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark dos modos de parse YAML usados pelo discover_mcps.
+
+Gera uma árvore sintética de docker-compose.centralized.yml (com âncoras,
+merge keys, healthchecks, labels e volumes, como os composes reais) e mede o
+tempo de parse de cada modo em um único processo:
+
+- python: yaml.load com SafeLoader puro (comportamento original)
+- full:   yaml.load com CSafeLoader (libyaml), quando disponível
+
+Também confere que os dois modos produzem exatamente o mesmo resultado.
+
+Uso:
+    python bench_compose_loaders.py                  # 1000 arquivos sintéticos
+    python bench_compose_loaders.py --files 5000     # Árvore maior
+    python bench_compose_loaders.py --path /primoia  # Medir sobre uma árvore real
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+from discover_mcps import COMPOSE_FILENAME, YAML_PARSERS, FAST_YAML_LOADER, load_compose_services
+
+COMPOSE_TEMPLATE = """\
+x-logging: &default-logging
+  driver: json-file
+  options:
+    max-size: "10m"
+    max-file: "3"
+
+x-common-env: &common-env
+  LOG_LEVEL: info
+  TZ: America/Sao_Paulo
+
+services:
+  {name}-api:
+    image: primoia/{name}-api:latest
+    container_name: {name}-api
+    restart: unless-stopped
+    logging: *default-logging
+    ports:
+      - "{api_port}:8000"
+    environment:
+      <<: *common-env
+      DATABASE_URL: postgresql://user:pass@{name}-db:5432/{name}
+      REDIS_URL: redis://primoia-shared-redis:6379/0
+    volumes:
+      - ./data:/app/data
+      - ./config:/app/config:ro
+    labels:
+      com.primoia.service: "{name}"
+      com.primoia.tier: backend
+    healthcheck:
+      test: ["CMD", "curl", "-f", "http://localhost:8000/health"]
+      interval: 30s
+      timeout: 10s
+      retries: 3
+    networks:
+      - primoia-network
+
+  {name}-db:
+    image: postgres:16
+    logging: *default-logging
+    environment:
+      POSTGRES_DB: {name}
+      POSTGRES_USER: user
+      POSTGRES_PASSWORD: pass
+    volumes:
+      - {name}-db-data:/var/lib/postgresql/data
+    networks:
+      - primoia-network
+
+  {name}-mcp:
+    image: primoia/mcp-sidecar:latest
+    container_name: {name}-mcp
+    logging: *default-logging
+    ports:
+      - "{mcp_port}:9000"
+    environment:
+      - MCP_NAME={name}
+      - MCP_PORT=9000
+      - MCP_HOST_PORT={mcp_port}
+      - TARGET_URL=http://{name}-api:8000
+      - MCP_REGISTRY_URL=${{MCP_REGISTRY_URL:-http://community-conductor-bff:8080}}
+    depends_on:
+      - {name}-api
+    healthcheck:
+      test: ["CMD", "curl", "-f", "http://localhost:9000/health"]
+      interval: 30s
+      timeout: 10s
+      retries: 3
+    networks:
+      - primoia-network
+
+volumes:
+  {name}-db-data:
+
+networks:
+  primoia-network:
+    external: true
+"""
+
+
+def generate_tree(base_path: Path, count: int) -> None:
+    """Gera `count` compose files sintéticos sob base_path."""
+    for i in range(count):
+        service_dir = base_path / f"group-{i // 50:03d}" / f"service-{i:05d}"
+        service_dir.mkdir(parents=True, exist_ok=True)
+        (service_dir / COMPOSE_FILENAME).write_text(COMPOSE_TEMPLATE.format(
+            name=f"service-{i:05d}",
+            api_port=20000 + i,
+            mcp_port=40000 + i,
+        ))
+
+
+def run_benchmark(base_path: Path, repeat: int) -> None:
+    contents = [f.read_bytes() for f in sorted(base_path.rglob(COMPOSE_FILENAME))]
+    total_mb = sum(len(c) for c in contents) / 1024 / 1024
+
+    print(f"Arquivos: {len(contents)} ({total_mb:.1f} MB)")
+    print(f"Loader rápido: {FAST_YAML_LOADER.__name__}")
+    print()
+
+    results = {}
+    timings = {}
+    for mode in YAML_PARSERS:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parsed = [load_compose_services(c, mode) for c in contents]
+            best = min(best, time.perf_counter() - start)
+        results[mode] = parsed
+        timings[mode] = best
+
+    baseline = timings["python"]
+    print(f"{'modo':<8} {'total (s)':>10} {'ms/arquivo':>11} {'speedup':>8}")
+    for mode in YAML_PARSERS:
+        elapsed = timings[mode]
+        print(f"{mode:<8} {elapsed:>10.3f} {elapsed * 1000 / len(contents):>11.3f} "
+              f"{baseline / elapsed:>7.1f}x")
+
+    print()
+    if results["full"] == results["python"]:
+        print("✅ Os dois modos produziram o mesmo resultado")
+    else:
+        print("❌ Resultados divergentes entre os modos")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark dos modos de parse YAML do discover_mcps"
+    )
+    parser.add_argument(
+        "--files",
+        type=int,
+        default=1000,
+        help="Número de compose files sintéticos (padrão: %(default)s)"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Repetições por modo; vale o melhor tempo (padrão: %(default)s)"
+    )
+    parser.add_argument(
+        "--path",
+        type=str,
+        help="Usar uma árvore existente em vez de gerar arquivos sintéticos"
+    )
+
+    args = parser.parse_args()
+
+    if args.path:
+        run_benchmark(Path(args.path), args.repeat)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="bench-compose-") as tmp:
+        print(f"Gerando {args.files} compose files sintéticos em {tmp}...")
+        generate_tree(Path(tmp), args.files)
+        run_benchmark(Path(tmp), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,19 +7,38 @@ Usa docker-compose.centralized.yml como fonte de verdade para portas.
 Uso:
     python discover_mcps.py                      # Descobrir e mostrar MCPs
     python discover_mcps.py --register           # Descobrir e cadastrar no MongoDB
+    python discover_mcps.py --sync               # Cadastrar em lote (diff + bulk_write)
     python discover_mcps.py --dry-run            # Mostrar o que seria cadastrado
     python discover_mcps.py --base-path /path    # Usar path customizado
+    python discover_mcps.py --stats              # Mostrar estatísticas do scan (cache hits, parse)
+    python discover_mcps.py --no-cache           # Ignorar o cache de scan em disco
+    python discover_mcps.py --yaml-parser python # Parse com o SafeLoader puro (sem libyaml)
+    python discover_mcps.py --ndjson - | jq .name   # Streaming NDJSON durante o scan
+    python discover_mcps.py --watch              # Daemon: sincroniza compose files alterados
+    python discover_mcps.py --probe              # Verificar /health dos sidecars e backends
+    python discover_mcps.py --check-conflicts    # Portas host e MCP_NAME duplicados
+    python discover_mcps.py --allocate-ports     # Realocar portas em conflito (--port-range)
 """
 
 import os
 import sys
+import time
 import yaml
 import json
+import ctypes
+import ctypes.util
+import hashlib
+import re
+import select
+import struct
 import argparse
+import asyncio
 import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
+from urllib.parse import urlsplit
 from datetime import datetime, timezone
-from typing import List, Dict, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
 # Configurar logging
 logging.basicConfig(
@@ -31,6 +50,17 @@ logger = logging.getLogger(__name__)
 # Caminho base do Primoia (pode ser sobrescrito via argumento)
 DEFAULT_BASE_PATH = "/mnt/ramdisk/primoia-main/primoia"
 
+COMPOSE_FILENAME = "docker-compose.centralized.yml"
+
+# Intervalo de portas host usado pelo --allocate-ports
+DEFAULT_PORT_RANGE = "13100-13999"
+
+# Versão do formato do cache de scan (incrementar ao mudar o conteúdo cacheado)
+SCAN_CACHE_VERSION = 2
+
+# Abaixo disso o custo de subir o process pool supera o ganho do parse paralelo
+PARALLEL_PARSE_THRESHOLD = 8
+
 
 def get_env_value(env, key: str) -> Optional[str]:
     """Extrai valor de uma variável de ambiente (lista ou dict)."""
@@ -53,39 +83,475 @@ def get_host_port(ports: list) -> Optional[str]:
     return None
 
 
-def find_backend_host_port(services: dict, target_url: str) -> Optional[str]:
+def target_service_name(target_url: Optional[str]) -> Optional[str]:
     """
-    Encontra a porta host do backend API baseado no TARGET_URL.
+    Extrai o nome do serviço (host) de um TARGET_URL.
 
-    TARGET_URL: http://billing-billing-api:8000
-    Procura o serviço billing-billing-api e retorna sua porta host.
+    TARGET_URL: http://billing-billing-api:8000 -> billing-billing-api
     """
-    if not target_url:
+    if not target_url or not isinstance(target_url, str):
         return None
-
-    # Extrair nome do serviço do TARGET_URL (ex: http://billing-billing-api:8000 -> billing-billing-api)
+    if "://" not in target_url:
+        target_url = f"http://{target_url}"
     try:
-        # Remove http:// e pega só o host:port
-        host_part = target_url.replace("http://", "").replace("https://", "")
-        backend_service_name = host_part.split(":")[0]
-    except:
+        return urlsplit(target_url).hostname
+    except ValueError:
         return None
 
-    # Procurar o serviço no compose
+
+def build_port_index(services: Dict) -> Dict[str, Optional[str]]:
+    """
+    Índice nome -> porta host dos serviços de um compose file.
+
+    O container_name também é indexado, já que resolve no DNS da rede Docker.
+    """
+    index: Dict[str, Optional[str]] = {}
     for svc_name, svc_config in services.items():
-        if svc_name == backend_service_name:
-            ports = svc_config.get("ports", [])
-            return get_host_port(ports)
+        host_port = get_host_port(svc_config.get("ports", []))
+        index[svc_name] = host_port
+        container_name = svc_config.get("container_name")
+        if container_name:
+            index.setdefault(str(container_name), host_port)
+    return index
+
+
+def merge_port_indexes(indexes: List[Dict[str, Optional[str]]]) -> Dict[str, Optional[str]]:
+    """
+    Índice global (entre arquivos) nome -> porta host.
+
+    Em nomes repetidos prevalece o primeiro arquivo que publica uma porta host.
+    """
+    merged: Dict[str, Optional[str]] = {}
+    for index in indexes:
+        for name, host_port in index.items():
+            if merged.get(name) is None:
+                merged[name] = host_port
+    return merged
+
+
+def find_backend_host_port(
+    target_url: Optional[str],
+    local_index: Dict[str, Optional[str]],
+    global_index: Optional[Dict[str, Optional[str]]] = None
+) -> Optional[str]:
+    """
+    Encontra a porta host do backend API baseado no TARGET_URL.
+
+    Procura primeiro no próprio compose file do sidecar e, se o serviço não
+    estiver lá, no índice global (backend definido em outro compose file).
+    """
+    backend_service_name = target_service_name(target_url)
+    if not backend_service_name:
+        return None
+
+    if backend_service_name in local_index:
+        return local_index[backend_service_name]
+
+    if global_index:
+        return global_index.get(backend_service_name)
 
     return None
 
 
-def discover_mcps(base_path: str = DEFAULT_BASE_PATH) -> List[Dict]:
+def _compose_subset(compose) -> Dict[str, Dict]:
+    """Reduz um compose parseado aos campos usados na descoberta (ports/environment/container_name)."""
+    services = (compose or {}).get("services") or {}
+    subset = {}
+    for svc_name, svc_config in services.items():
+        svc_config = svc_config or {}
+        subset[str(svc_name)] = {
+            "ports": svc_config.get("ports") or [],
+            "environment": svc_config.get("environment") or [],
+            "container_name": svc_config.get("container_name"),
+        }
+    return subset
+
+
+# Loader YAML preferido: libyaml (CSafeLoader) quando compilado, senão o SafeLoader puro
+FAST_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Modos de parse:
+# - full: yaml.load completo com o loader mais rápido disponível
+# - python: yaml.load completo com o SafeLoader puro (referência para benchmark)
+YAML_PARSERS = ("full", "python")
+
+
+def load_compose_services(content, yaml_parser: str = "full") -> Dict[str, Dict]:
+    """Parseia um compose file e retorna o subconjunto de services usado na descoberta."""
+    loader_cls = yaml.SafeLoader if yaml_parser == "python" else FAST_YAML_LOADER
+    return _compose_subset(yaml.load(content, Loader=loader_cls))
+
+
+def _parse_compose_content(path: str, content: bytes,
+                           yaml_parser: str = "full") -> Tuple[str, Optional[Dict], Optional[str]]:
+    """
+    Parseia o conteúdo de um compose file (executado nos workers do process pool).
+
+    Returns:
+        Tupla (path, services, erro)
+    """
+    try:
+        return path, load_compose_services(content, yaml_parser), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def default_cache_path() -> Path:
+    """Caminho padrão do cache de scan (respeita XDG_CACHE_HOME)."""
+    cache_home = os.getenv("XDG_CACHE_HOME") or os.path.join(Path.home(), ".cache")
+    return Path(cache_home) / "conductor" / "discover_mcps_cache.json"
+
+
+def load_scan_cache(cache_path: Optional[Path]) -> Dict[str, Dict]:
+    """Carrega o cache de scan; cache ausente, corrompido ou de outra versão é ignorado."""
+    if not cache_path or not cache_path.exists():
+        return {}
+    try:
+        with open(cache_path) as f:
+            data = json.load(f)
+        if data.get("version") != SCAN_CACHE_VERSION:
+            return {}
+        return data.get("files", {})
+    except Exception as e:
+        logger.debug(f"Cache de scan inválido ({cache_path}): {e}")
+        return {}
+
+
+def save_scan_cache(cache_path: Optional[Path], files: Dict[str, Dict]) -> None:
+    """Grava o cache de scan de forma atômica (arquivo temporário + rename)."""
+    if not cache_path:
+        return
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"version": SCAN_CACHE_VERSION, "files": files}, f, default=str)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        logger.warning(f"Não foi possível gravar o cache de scan {cache_path}: {e}")
+
+
+def new_scan_stats() -> Dict:
+    """Estatísticas do scan (exibidas com --stats)."""
+    return {
+        "files_scanned": 0,
+        "cache_hits": 0,
+        "parsed": 0,
+        "parse_errors": 0,
+        "parse_time": 0.0,
+        "scan_time": 0.0,
+    }
+
+
+def _parse_compose_batch(batch: List[Tuple[str, bytes]],
+                         yaml_parser: str = "full") -> List[Tuple[str, Optional[Dict], Optional[str]]]:
+    """Parseia um lote de compose files (unidade de trabalho enviada ao process pool)."""
+    return [_parse_compose_content(path, content, yaml_parser) for path, content in batch]
+
+
+def iter_compose_files(
+    base_path: str = DEFAULT_BASE_PATH,
+    cache_path: Optional[Path] = None,
+    workers: Optional[int] = None,
+    stats: Optional[Dict] = None,
+    yaml_parser: str = "full"
+) -> Iterator[Tuple[Path, Dict]]:
+    """
+    Localiza e parseia os docker-compose.centralized.yml sob base_path.
+
+    Arquivos cujo (path, mtime, size) batem com o cache são reaproveitados sem
+    leitura. Se só o stat mudou, o sha256 do conteúdo é comparado antes de
+    re-parsear. Os arquivos restantes são parseados em lotes num process pool.
+
+    É um gerador: cache hits saem durante a varredura e arquivos parseados
+    saem conforme cada lote termina. O cache é gravado ao final da iteração.
+
+    Args:
+        base_path: Caminho base onde buscar os docker-compose files
+        cache_path: Arquivo de cache em disco (None desabilita o cache)
+        workers: Número de processos para o parse (padrão: os.cpu_count())
+        stats: Dict de estatísticas a ser preenchido (ver new_scan_stats)
+        yaml_parser: Modo de parse (ver YAML_PARSERS)
+
+    Yields:
+        Tuplas (compose_file, services)
+    """
+    stats = stats if stats is not None else new_scan_stats()
+    scan_start = time.perf_counter()
+
+    cached_files = load_scan_cache(cache_path)
+    fresh_files: Dict[str, Dict] = {}
+    pending: List[Tuple[str, bytes]] = []
+    cache_dirty = False
+
+    for compose_file in sorted(Path(base_path).rglob(COMPOSE_FILENAME)):
+        key = str(compose_file)
+        stats["files_scanned"] += 1
+        try:
+            st = compose_file.stat()
+            cached = cached_files.get(key)
+
+            if cached and cached["mtime_ns"] == st.st_mtime_ns and cached["size"] == st.st_size:
+                fresh_files[key] = cached
+                stats["cache_hits"] += 1
+                yield compose_file, cached["services"]
+                continue
+
+            content = compose_file.read_bytes()
+            digest = hashlib.sha256(content).hexdigest()
+
+            if cached and cached["sha256"] == digest:
+                # Apenas o mtime mudou (ex: touch, checkout): conteúdo idêntico
+                fresh_files[key] = dict(cached, mtime_ns=st.st_mtime_ns, size=st.st_size)
+                stats["cache_hits"] += 1
+                cache_dirty = True
+                yield compose_file, cached["services"]
+                continue
+
+            fresh_files[key] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": digest}
+            pending.append((key, content))
+        except OSError as e:
+            logger.warning(f"Erro ao ler {compose_file}: {e}")
+
+    if pending:
+        parse_start = time.perf_counter()
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        if workers > 1 and len(pending) >= PARALLEL_PARSE_THRESHOLD:
+            batch_size = max(1, len(pending) // (workers * 4))
+            batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+            pool = ProcessPoolExecutor(max_workers=min(workers, len(batches)))
+            futures = [pool.submit(_parse_compose_batch, batch, yaml_parser) for batch in batches]
+            completed = (f.result() for f in as_completed(futures))
+        else:
+            pool = None
+            completed = ([_parse_compose_content(k, v, yaml_parser)] for k, v in pending)
+
+        try:
+            for results in completed:
+                for key, services, error in results:
+                    if error is not None:
+                        logger.warning(f"Erro ao processar {key}: {error}")
+                        stats["parse_errors"] += 1
+                        del fresh_files[key]
+                        continue
+                    fresh_files[key]["services"] = services
+                    stats["parsed"] += 1
+                    yield Path(key), services
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+            stats["parse_time"] += time.perf_counter() - parse_start
+
+    # Só persiste as entradas ainda presentes na árvore (remove arquivos apagados)
+    if cache_path and (cache_dirty or pending or fresh_files.keys() != cached_files.keys()):
+        save_scan_cache(cache_path, fresh_files)
+
+    stats["scan_time"] += time.perf_counter() - scan_start
+
+
+def scan_compose_files(
+    base_path: str = DEFAULT_BASE_PATH,
+    cache_path: Optional[Path] = None,
+    workers: Optional[int] = None,
+    stats: Optional[Dict] = None,
+    yaml_parser: str = "full"
+) -> List[Tuple[Path, Dict]]:
+    """Versão materializada de iter_compose_files, ordenada por caminho."""
+    return sorted(iter_compose_files(base_path, cache_path, workers, stats, yaml_parser),
+                  key=lambda item: str(item[0]))
+
+
+def build_mcp_entries(
+    compose_file: Path,
+    services: Dict,
+    base_path_obj: Path,
+    global_index: Optional[Dict[str, Optional[str]]] = None
+) -> List[Dict]:
+    """
+    Monta as entradas de registry para os serviços MCP de um compose file.
+
+    Args:
+        compose_file: Caminho do docker-compose file
+        services: Mapa service_name -> {ports, environment, container_name}
+        base_path_obj: Caminho base (para docker_compose_path relativo)
+        global_index: Índice nome -> porta host de todos os compose files,
+            usado quando o backend está em outro arquivo
+
+    Returns:
+        Lista de entradas MCP do arquivo
+    """
+    mcps = []
+    local_index = build_port_index(services)
+
+    for service_name, service_config in services.items():
+        # Identificar serviço MCP (contém "mcp" no nome)
+        if "mcp" not in service_name.lower():
+            continue
+
+        ports = service_config.get("ports", [])
+        env = service_config.get("environment", [])
+
+        # Extrair port mapping do MCP
+        # Formato: "13145:9000" (host:container)
+        host_port = get_host_port(ports)
+        internal_port = "9000"  # Porta padrão MCP
+        if ports and isinstance(ports[0], str) and ":" in ports[0]:
+            internal_port = ports[0].split(":")[1]
+
+        # Extrair MCP_NAME do environment ou fallback do service_name
+        mcp_name = get_env_value(env, "MCP_NAME")
+        if not mcp_name:
+            # Fallback: extrair do nome do serviço
+            mcp_name = service_name.replace("-mcp", "").replace("verticals-", "").replace("billing-", "")
+
+        # Extrair TARGET_URL (URL interna do backend)
+        target_url = get_env_value(env, "TARGET_URL")
+
+        # Encontrar porta host do backend API
+        backend_host_port = find_backend_host_port(target_url, local_index, global_index)
+        backend_url = f"http://localhost:{backend_host_port}" if backend_host_port else None
+
+        # Caminho relativo ao base_path
+        try:
+            relative_path = str(compose_file.relative_to(base_path_obj))
+        except ValueError:
+            relative_path = str(compose_file)
+
+        # Extrair MCP_AUTH se configurado, ou usar padrão se IAM habilitado
+        auth = get_env_value(env, "MCP_AUTH")
+
+        # Verificar se IAM está habilitado
+        # O sidecar tem default ENABLE_IAM=true, então:
+        # - Se ENABLE_IAM ou IAM_ENABLED = "false" -> desabilitado
+        # - Se IAM_URL está configurado -> habilitado
+        # - Se nenhum config de IAM -> assume habilitado (default do sidecar)
+        enable_iam_val = get_env_value(env, "ENABLE_IAM") or get_env_value(env, "IAM_ENABLED")
+        iam_url = get_env_value(env, "IAM_URL")
+
+        iam_enabled = True  # Default do sidecar é true
+        if enable_iam_val:
+            enable_iam_str = str(enable_iam_val).lower().strip("'\"")
+            # Desabilitado apenas se explicitamente "false" ou "0"
+            if enable_iam_str in ("false", "0"):
+                iam_enabled = False
+            elif "true" in enable_iam_str or enable_iam_str == "1":
+                iam_enabled = True
+
+        # Se IAM habilitado e sem auth explícito, usar auth padrão
+        if not auth and iam_enabled:
+            auth = "YWRtaW46QWRtaW5AMTIzNDU2"  # admin:Admin@123456
+
+        mcp_entry = {
+            "name": mcp_name,
+            "type": "external",
+            "url": f"http://{service_name}:{internal_port}/sse",
+            "host_url": f"http://localhost:{host_port}/sse" if host_port else None,
+            "backend_url": backend_url,
+            "docker_compose_path": relative_path,
+            "status": "stopped",  # Todos começam parados (on-demand)
+            "auto_shutdown_minutes": 30,
+            "tools_count": 0,
+            "auth": auth,
+            "metadata": {
+                "category": categorize_service(str(compose_file)),
+                "description": f"MCP for {mcp_name}",
+                "service_name": service_name,
+                "target_url": target_url,
+                "discovered_at": datetime.now(timezone.utc).isoformat()
+            }
+        }
+
+        mcps.append(mcp_entry)
+        logger.info(f"  Descoberto: {mcp_name} -> localhost:{host_port} (backend: {backend_url})")
+
+    return mcps
+
+
+def mcps_from_scan(scanned: List[Tuple[Path, Dict]], base_path_obj: Path) -> List[Dict]:
+    """Monta as entradas MCP de todos os arquivos escaneados, resolvendo backends entre arquivos."""
+    global_index = merge_port_indexes([build_port_index(services) for _, services in scanned])
+
+    mcps = []
+    for compose_file, services in scanned:
+        try:
+            mcps.extend(build_mcp_entries(compose_file, services, base_path_obj, global_index))
+        except Exception as e:
+            logger.warning(f"Erro ao processar {compose_file}: {e}")
+    return mcps
+
+
+def iter_mcps(
+    base_path: str = DEFAULT_BASE_PATH,
+    cache_path: Optional[Path] = None,
+    workers: Optional[int] = None,
+    stats: Optional[Dict] = None,
+    yaml_parser: str = "full",
+    conflicts: Optional["ConflictIndex"] = None
+) -> Iterator[Dict]:
+    """
+    Gera as entradas MCP conforme cada compose file fica disponível.
+
+    Entradas cujo backend resolve no próprio arquivo (ou que não têm
+    TARGET_URL) saem imediatamente. Arquivos com backend em outro compose
+    file ficam retidos até o fim do scan, quando o índice global está
+    completo, e só então são emitidos.
+    """
+    base_path_obj = Path(base_path)
+    port_indexes: Dict[str, Dict] = {}
+    deferred: List[Tuple[Path, Dict]] = []
+
+    for compose_file, services in iter_compose_files(base_path, cache_path, workers, stats, yaml_parser):
+        local_index = build_port_index(services)
+        port_indexes[str(compose_file)] = local_index
+        if conflicts is not None:
+            conflicts.add_services(compose_file, services)
+
+        needs_global = any(
+            target_service_name(get_env_value(cfg.get("environment", []), "TARGET_URL")) not in local_index
+            for name, cfg in services.items()
+            if "mcp" in name.lower() and get_env_value(cfg.get("environment", []), "TARGET_URL")
+        )
+        if needs_global:
+            deferred.append((compose_file, services))
+            continue
+
+        try:
+            yield from build_mcp_entries(compose_file, services, base_path_obj)
+        except Exception as e:
+            logger.warning(f"Erro ao processar {compose_file}: {e}")
+
+    if deferred:
+        global_index = merge_port_indexes([port_indexes[p] for p in sorted(port_indexes)])
+        for compose_file, services in deferred:
+            try:
+                yield from build_mcp_entries(compose_file, services, base_path_obj, global_index)
+            except Exception as e:
+                logger.warning(f"Erro ao processar {compose_file}: {e}")
+
+
+def discover_mcps(
+    base_path: str = DEFAULT_BASE_PATH,
+    cache_path: Optional[Path] = None,
+    workers: Optional[int] = None,
+    stats: Optional[Dict] = None,
+    yaml_parser: str = "full",
+    on_discovered: Optional[Callable[[Dict], None]] = None,
+    conflicts: Optional["ConflictIndex"] = None
+) -> List[Dict]:
     """
     Descobre MCPs a partir dos docker-compose.centralized.yml files.
 
     Args:
         base_path: Caminho base onde buscar os docker-compose files
+        cache_path: Arquivo de cache de scan (None desabilita o cache)
+        workers: Número de processos para o parse dos arquivos
+        stats: Dict de estatísticas a ser preenchido (ver new_scan_stats)
+        yaml_parser: Modo de parse (ver YAML_PARSERS)
+        on_discovered: Callback chamado com cada MCP assim que é descoberto
+            (usado pelo emissor NDJSON)
+        conflicts: Índice de conflitos alimentado durante o scan
 
     Returns:
         Lista de dicionários com informações dos MCPs descobertos
@@ -97,104 +563,318 @@ def discover_mcps(base_path: str = DEFAULT_BASE_PATH) -> List[Dict]:
         logger.error(f"Caminho base não existe: {base_path}")
         return mcps
 
-    logger.info(f"Buscando docker-compose.centralized.yml em: {base_path}")
+    logger.info(f"Buscando {COMPOSE_FILENAME} em: {base_path}")
+
+    for mcp in iter_mcps(base_path, cache_path, workers, stats, yaml_parser, conflicts):
+        mcps.append(mcp)
+        if conflicts is not None:
+            conflicts.add_mcp(mcp)
+        if on_discovered is not None:
+            on_discovered(mcp)
+
+    mcps = order_mcps(mcps)
+    logger.info(f"Total de MCPs descobertos: {len(mcps)}")
+    return mcps
+
+
+def order_mcps(mcps: List[Dict]) -> List[Dict]:
+    """
+    Ordena por compose file e serviço e mantém uma entrada por MCP_NAME.
+
+    O scan entrega os MCPs na ordem em que os lotes do process pool terminam;
+    aqui a saída (resumo, --output, registry) volta a ser determinística. Em
+    nomes duplicados prevalece o primeiro compose file em ordem de caminho, o
+    mesmo critério do --allocate-ports (as colisões saem no --check-conflicts).
+    """
+    by_name: Dict[str, Dict] = {}
+    for mcp in sorted(mcps, key=lambda m: (m["docker_compose_path"], m["metadata"]["service_name"])):
+        kept = by_name.setdefault(mcp["name"], mcp)
+        if kept is not mcp:
+            logger.warning(f"MCP_NAME '{mcp['name']}' duplicado: mantido {kept['docker_compose_path']}, "
+                           f"ignorado {mcp['docker_compose_path']}")
+    return list(by_name.values())
+
+
+class NDJSONEmitter:
+    """Escreve um MCP por linha (NDJSON) com flush imediato, para consumo via pipe/jq."""
+
+    def __init__(self, path: str):
+        self._stream = sys.stdout if path == "-" else open(path, "w")
+
+    def __call__(self, mcp: Dict) -> None:
+        self._stream.write(json.dumps(mcp, default=str) + "\n")
+        self._stream.flush()
+
+    def close(self) -> None:
+        if self._stream is not sys.stdout:
+            self._stream.close()
+
+
+def summarize_by_category(mcps: List[Dict]) -> Dict[str, List[Tuple[str, Optional[str]]]]:
+    """Agrupa (nome, host_url) por categoria em uma única passada."""
+    categories: Dict[str, List[Tuple[str, Optional[str]]]] = {}
+    for mcp in mcps:
+        categories.setdefault(mcp["metadata"]["category"], []).append((mcp["name"], mcp.get("host_url")))
+    return categories
+
+
+def parse_host_ports(port) -> List[int]:
+    """
+    Portas host publicadas por um mapeamento de ports do compose.
+
+    Suporta "13199:9000", "127.0.0.1:13199:9000", faixas "8080-8081:80-81",
+    sufixo "/udp" e a sintaxe longa ({published: 13199, target: 9000}).
+    Mapeamentos só com a porta do container ou com variáveis (${...}) não
+    publicam uma porta host fixa e são ignorados.
+    """
+    if isinstance(port, dict):
+        published = port.get("published")
+        return parse_host_ports(f"{published}:{port.get('target')}") if published else []
+    if not isinstance(port, str) or "$" in port:
+        return []
+
+    parts = port.split("/")[0].split(":")
+    if len(parts) < 2:
+        return []
+    host = parts[-2]
 
-    for compose_file in base_path_obj.rglob("docker-compose.centralized.yml"):
+    try:
+        if "-" in host:
+            start, end = host.split("-", 1)
+            return list(range(int(start), int(end) + 1))
+        return [int(host)] if host else []
+    except ValueError:
+        return []
+
+
+class ConflictIndex:
+    """
+    Índice de conflitos construído durante o scan.
+
+    - Portas host: porta -> [(arquivo, serviço)] de todos os serviços, MCP ou não
+    - Nomes de MCP: MCP_NAME -> [(arquivo, serviço)] dos sidecars descobertos
+    """
+
+    def __init__(self):
+        self.ports: Dict[int, List[Tuple[str, str]]] = {}
+        self.mcp_names: Dict[str, List[Tuple[str, str]]] = {}
+
+    def add_services(self, compose_file: Path, services: Dict) -> None:
+        for svc_name, svc_config in services.items():
+            claimed = set()
+            for port in svc_config.get("ports", []):
+                claimed.update(parse_host_ports(port))
+            for host_port in claimed:
+                self.ports.setdefault(host_port, []).append((str(compose_file), svc_name))
+
+    def add_mcp(self, mcp: Dict) -> None:
+        claimant = (mcp["docker_compose_path"], mcp["metadata"]["service_name"])
+        self.mcp_names.setdefault(mcp["name"], []).append(claimant)
+
+    def port_collisions(self) -> Dict[int, List[Tuple[str, str]]]:
+        return {p: sorted(c) for p, c in sorted(self.ports.items()) if len(c) > 1}
+
+    def name_collisions(self) -> Dict[str, List[Tuple[str, str]]]:
+        return {n: sorted(c) for n, c in sorted(self.mcp_names.items()) if len(c) > 1}
+
+    def plan_port_allocation(self, port_range: Tuple[int, int]) -> List[Dict]:
+        """
+        Planeja a realocação das portas em conflito em uma única passada.
+
+        O primeiro dono de cada porta (ordem de caminho) a mantém; os demais
+        recebem a próxima porta livre do intervalo, nunca uma já publicada.
+
+        Returns:
+            Lista de {file, service, old_port, new_port}
+        """
+        free_ports = (p for p in range(port_range[0], port_range[1] + 1) if p not in self.ports)
+        plan = []
+        for old_port, claimants in self.port_collisions().items():
+            for compose_file, service in claimants[1:]:
+                new_port = next(free_ports, None)
+                if new_port is None:
+                    raise ValueError(f"Intervalo {port_range[0]}-{port_range[1]} sem portas livres")
+                plan.append({"file": compose_file, "service": service,
+                             "old_port": old_port, "new_port": new_port})
+        return plan
+
+
+def _compose_rewriter():
+    """
+    Importa scripts/rewrite_mcp_compose.py (localizador de serviços na árvore
+    de nós YAML e escrita atômica) só quando o --allocate-ports grava os
+    arquivos, para que a descoberta rode fora do checkout do conductor.
+    """
+    scripts_dir = str(Path(__file__).resolve().parents[2] / "scripts")
+    if scripts_dir not in sys.path:
+        sys.path.insert(0, scripts_dir)
+    import rewrite_mcp_compose
+    return rewrite_mcp_compose
+
+
+def apply_port_allocation(plan: List[Dict]) -> Tuple[int, List[Dict]]:
+    """
+    Reescreve as portas host planejadas nos compose files.
+
+    O serviço é localizado pela árvore de nós YAML (services.<nome>, ver
+    scripts/rewrite_mcp_compose.py) e a troca é feita na posição exata de
+    cada mapeamento de ports que publica a porta antiga (sintaxe curta, em
+    bloco ou flow, e `published:` da sintaxe longa), além do MCP_HOST_PORT
+    (se houver). Cada arquivo é lido e gravado uma única vez, de forma
+    atômica, e só depois de conferir no conteúdo novo que cada serviço
+    publica a porta nova e não mais a antiga.
+
+    Returns:
+        (número de arquivos alterados, itens do plano não aplicados)
+    """
+    rewriter = _compose_rewriter()
+    by_file: Dict[str, List[Dict]] = {}
+    for item in plan:
+        by_file.setdefault(item["file"], []).append(item)
+
+    changed_files = 0
+    unapplied: List[Dict] = []
+    for compose_file, items in by_file.items():
+        path = Path(compose_file)
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+            content = path.read_text()
+            new_content = _replace_service_ports(content, items, rewriter.find_services)
+            published = _published_ports(new_content)
+        except (OSError, yaml.YAMLError) as e:
+            unapplied.extend(dict(item, error=str(e)) for item in items)
+            continue
+
+        applied = []
+        for item in items:
+            ports = published.get(item["service"], set())
+            if item["new_port"] in ports and item["old_port"] not in ports:
+                applied.append(item)
+            else:
+                unapplied.append(dict(item, error="porta host não reescrita no ports do serviço"))
+
+        if not applied:
+            continue
         try:
-            with open(compose_file) as f:
-                compose = yaml.safe_load(f)
+            rewriter.atomic_write(path, new_content, mtime_ns)
+        except (OSError, RuntimeError) as e:
+            unapplied.extend(dict(item, error=str(e)) for item in applied)
+            continue
+        changed_files += 1
 
-            if not compose:
-                continue
+    return changed_files, unapplied
 
-            services = compose.get("services", {})
 
-            for service_name, service_config in services.items():
-                # Identificar serviço MCP (contém "mcp" no nome)
-                if "mcp" not in service_name.lower():
-                    continue
+def _published_ports(content: str) -> Dict[str, set]:
+    """Portas host publicadas por serviço, lidas do conteúdo reescrito."""
+    services = (yaml.load(content, Loader=FAST_YAML_LOADER) or {}).get("services") or {}
+    return {
+        str(name): {p for port in (config or {}).get("ports", []) for p in parse_host_ports(port)}
+        for name, config in services.items()
+    }
 
-                ports = service_config.get("ports", [])
-                env = service_config.get("environment", [])
-
-                # Extrair port mapping do MCP
-                # Formato: "13145:9000" (host:container)
-                host_port = get_host_port(ports)
-                internal_port = "9000"  # Porta padrão MCP
-                if ports and isinstance(ports[0], str) and ":" in ports[0]:
-                    internal_port = ports[0].split(":")[1]
-
-                # Extrair MCP_NAME do environment ou fallback do service_name
-                mcp_name = get_env_value(env, "MCP_NAME")
-                if not mcp_name:
-                    # Fallback: extrair do nome do serviço
-                    mcp_name = service_name.replace("-mcp", "").replace("verticals-", "").replace("billing-", "")
-
-                # Extrair TARGET_URL (URL interna do backend)
-                target_url = get_env_value(env, "TARGET_URL")
-
-                # Encontrar porta host do backend API
-                backend_host_port = find_backend_host_port(services, target_url)
-                backend_url = f"http://localhost:{backend_host_port}" if backend_host_port else None
-
-                # Caminho relativo ao base_path
-                try:
-                    relative_path = str(compose_file.relative_to(base_path_obj))
-                except ValueError:
-                    relative_path = str(compose_file)
-
-                # Extrair MCP_AUTH se configurado, ou usar padrão se IAM habilitado
-                auth = get_env_value(env, "MCP_AUTH")
-
-                # Verificar se IAM está habilitado
-                # O sidecar tem default ENABLE_IAM=true, então:
-                # - Se ENABLE_IAM ou IAM_ENABLED = "false" -> desabilitado
-                # - Se IAM_URL está configurado -> habilitado
-                # - Se nenhum config de IAM -> assume habilitado (default do sidecar)
-                enable_iam_val = get_env_value(env, "ENABLE_IAM") or get_env_value(env, "IAM_ENABLED")
-                iam_url = get_env_value(env, "IAM_URL")
-
-                iam_enabled = True  # Default do sidecar é true
-                if enable_iam_val:
-                    enable_iam_str = str(enable_iam_val).lower().strip("'\"")
-                    # Desabilitado apenas se explicitamente "false" ou "0"
-                    if enable_iam_str in ("false", "0"):
-                        iam_enabled = False
-                    elif "true" in enable_iam_str or enable_iam_str == "1":
-                        iam_enabled = True
-
-                # Se IAM habilitado e sem auth explícito, usar auth padrão
-                if not auth and iam_enabled:
-                    auth = "YWRtaW46QWRtaW5AMTIzNDU2"  # admin:Admin@123456
-
-                mcp_entry = {
-                    "name": mcp_name,
-                    "type": "external",
-                    "url": f"http://{service_name}:{internal_port}/sse",
-                    "host_url": f"http://localhost:{host_port}/sse" if host_port else None,
-                    "backend_url": backend_url,
-                    "docker_compose_path": relative_path,
-                    "status": "stopped",  # Todos começam parados (on-demand)
-                    "auto_shutdown_minutes": 30,
-                    "tools_count": 0,
-                    "auth": auth,
-                    "metadata": {
-                        "category": categorize_service(str(compose_file)),
-                        "description": f"MCP for {mcp_name}",
-                        "service_name": service_name,
-                        "target_url": target_url,
-                        "discovered_at": datetime.now(timezone.utc).isoformat()
-                    }
-                }
-
-                mcps.append(mcp_entry)
-                logger.info(f"  Descoberto: {mcp_name} -> localhost:{host_port} (backend: {backend_url})")
 
-        except Exception as e:
-            logger.warning(f"Erro ao processar {compose_file}: {e}")
+def _replace_service_ports(content: str, items: List[Dict], find_services: Callable) -> str:
+    """Aplica as trocas old_port -> new_port de `items` nos serviços localizados pela árvore YAML."""
+    lines = content.split("\n")
+    services = {service.name: service for service in find_services(content)}
+
+    edits = []
+    for item in items:
+        service = services.get(item["service"])
+        if service is not None:
+            edits.extend(_port_edits(lines, service, item["old_port"], item["new_port"]))
+
+    # Da direita para a esquerda: trocas na mesma linha não deslocam as colunas seguintes
+    for line_no, start, end, text in sorted(set(edits), reverse=True):
+        lines[line_no] = lines[line_no][:start] + text + lines[line_no][end:]
+    return "\n".join(lines)
+
+
+def _port_edits(lines: List[str], service, old_port: int, new_port: int) -> List[Tuple[int, int, int, str]]:
+    """Edições (linha, coluna inicial, coluna final, texto) da porta host e do MCP_HOST_PORT do serviço."""
+    port_pattern = re.compile(rf"(?<![\d.]){old_port}(?=:\d)")
+    exact_pattern = re.compile(rf"(?<!\d){old_port}(?!\d)")
+    env_pattern = re.compile(rf"(MCP_HOST_PORT\s*=\s*){old_port}(?!\d)")
+
+    port_targets = []
+    ports = service.fields.get("ports")
+    if isinstance(ports, yaml.SequenceNode):
+        for item in ports.value:
+            if isinstance(item, yaml.ScalarNode):
+                if old_port in parse_host_ports(item.value):
+                    port_targets.append((item, port_pattern, str(new_port)))
+            elif isinstance(item, yaml.MappingNode):
+                for key_node, value_node in item.value:
+                    if key_node.value == "published" and value_node.value == str(old_port):
+                        port_targets.append((value_node, exact_pattern, str(new_port)))
+
+    edits = _scalar_edits(lines, port_targets)
+    if not edits:
+        # Mapeamento não reescrito (ex.: faixa 8000-8001:80-81): MCP_HOST_PORT fica como está
+        return []
+
+    env_targets = []
+    env = service.fields.get("environment")
+    if isinstance(env, yaml.SequenceNode):
+        env_targets = [(item, env_pattern, rf"\g<1>{new_port}") for item in env.value
+                       if isinstance(item, yaml.ScalarNode) and item.value.startswith("MCP_HOST_PORT=")]
+    elif isinstance(env, yaml.MappingNode):
+        env_targets = [(value_node, exact_pattern, str(new_port)) for key_node, value_node in env.value
+                       if key_node.value == "MCP_HOST_PORT" and isinstance(value_node, yaml.ScalarNode)]
+
+    return edits + _scalar_edits(lines, env_targets)
+
+
+def _scalar_edits(lines: List[str], targets: List[Tuple]) -> List[Tuple[int, int, int, str]]:
+    """Aplica cada (nó, padrão, substituição) ao trecho do arquivo ocupado pelo escalar."""
+    edits = []
+    for node, pattern, replacement in targets:
+        start, end = node.start_mark, node.end_mark
+        if start.line != end.line:
+            continue  # escalar em várias linhas: fica como não aplicado
+        source = lines[start.line][start.column:end.column]
+        text = pattern.sub(replacement, source, count=1)
+        if text != source:
+            edits.append((start.line, start.column, end.column, text))
+    return edits
+
+
+def log_conflicts(conflicts: ConflictIndex, base_path: str) -> int:
+    """Loga colisões de porta host e de MCP_NAME. Retorna o total de colisões."""
+    port_collisions = conflicts.port_collisions()
+    name_collisions = conflicts.name_collisions()
 
-    logger.info(f"Total de MCPs descobertos: {len(mcps)}")
-    return mcps
+    logger.info("")
+    logger.info("=" * 60)
+    logger.info("CONFLITOS")
+    logger.info("=" * 60)
+
+    for port, claimants in port_collisions.items():
+        logger.warning(f"  Porta host {port} publicada por {len(claimants)} serviços:")
+        for compose_file, service in claimants:
+            logger.warning(f"    - {service} ({os.path.relpath(compose_file, base_path)})")
+
+    for name, claimants in name_collisions.items():
+        logger.warning(f"  MCP_NAME '{name}' usado por {len(claimants)} sidecars:")
+        for compose_file, service in claimants:
+            logger.warning(f"    - {service} ({compose_file})")
+
+    if not port_collisions and not name_collisions:
+        logger.info("  Nenhum conflito de porta ou de MCP_NAME")
+
+    return len(port_collisions) + len(name_collisions)
+
+
+def parse_port_range(value: str) -> Tuple[int, int]:
+    """Converte 'inicio-fim' em tupla (argparse type)."""
+    try:
+        start, end = (int(p) for p in value.split("-", 1))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Intervalo inválido: {value} (use inicio-fim)")
+    if not 0 < start <= end < 65536:
+        raise argparse.ArgumentTypeError(f"Intervalo inválido: {value}")
+    return start, end
 
 
 def categorize_service(path: str) -> str:
@@ -229,6 +909,196 @@ def categorize_service(path: str) -> str:
     return "other"
 
 
+# Campos do registry preenchidos pela descoberta (projeção usada no sync)
+REGISTRY_SYNC_PROJECTION = {
+    "_id": 0, "name": 1, "url": 1, "host_url": 1, "backend_url": 1,
+    "docker_compose_path": 1, "auto_shutdown_minutes": 1, "metadata": 1,
+    "auth": 1, "status": 1
+}
+
+# Campos de metadata que mudam a cada execução e não contam como alteração
+VOLATILE_METADATA_FIELDS = ("discovered_at",)
+
+
+def registry_update_fields(mcp: Dict, existing: Dict) -> Dict:
+    """
+    Campos a atualizar em uma entrada já existente no mcp_registry.
+
+    Regras:
+    - backend_url e auth não são sobrescritos com None
+    - status não é sobrescrito se o MCP já estiver healthy ou starting
+    """
+    update_fields = {
+        "url": mcp["url"],
+        "host_url": mcp["host_url"],
+        "docker_compose_path": mcp["docker_compose_path"],
+        "auto_shutdown_minutes": mcp["auto_shutdown_minutes"],
+        "metadata": mcp["metadata"],
+    }
+
+    # Atualizar backend_url se descoberto
+    if mcp.get("backend_url"):
+        update_fields["backend_url"] = mcp["backend_url"]
+
+    # Atualizar auth se descoberto (não sobrescrever com None)
+    if mcp.get("auth"):
+        update_fields["auth"] = mcp["auth"]
+
+    # Não sobrescrever status se já estiver healthy
+    if existing.get("status") not in ["healthy", "starting"]:
+        update_fields["status"] = mcp["status"]
+
+    return update_fields
+
+
+def _strip_volatile(metadata: Optional[Dict]) -> Dict:
+    return {k: v for k, v in (metadata or {}).items() if k not in VOLATILE_METADATA_FIELDS}
+
+
+def diff_registry_entry(mcp: Dict, existing: Dict) -> Dict:
+    """
+    Diff campo a campo entre a entrada descoberta e o documento do registry.
+
+    Returns:
+        Apenas os campos que mudaram (vazio se a entrada está em dia)
+    """
+    changed = {}
+    for field, value in registry_update_fields(mcp, existing).items():
+        if field == "metadata":
+            if _strip_volatile(value) != _strip_volatile(existing.get("metadata")):
+                changed[field] = value
+        elif existing.get(field) != value:
+            changed[field] = value
+    return changed
+
+
+def plan_registry_sync(mcps: List[Dict], existing_by_name: Dict[str, Dict]) -> Tuple[List, Dict]:
+    """
+    Monta as operações de bulk_write para sincronizar o registry.
+
+    Entradas novas viram upserts com $setOnInsert do documento completo;
+    entradas existentes só geram operação se algum campo mudou.
+
+    Returns:
+        Tupla (operações UpdateOne, contadores inserted/updated/unchanged)
+    """
+    from pymongo import UpdateOne
+
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    operations = []
+    now = datetime.now(timezone.utc)
+
+    # Uma operação por nome (discover_mcps já entrega os nomes sem duplicatas, ver order_mcps)
+    for name, mcp in {m["name"]: m for m in mcps}.items():
+        existing = existing_by_name.get(name)
+
+        if existing is None:
+            doc = {k: v for k, v in mcp.items() if k != "name"}
+            doc["registered_at"] = now
+            operations.append(UpdateOne({"name": name}, {"$setOnInsert": doc}, upsert=True))
+            counts["inserted"] += 1
+            continue
+
+        changed = diff_registry_entry(mcp, existing)
+        if not changed:
+            counts["unchanged"] += 1
+            continue
+
+        changed["updated_at"] = now
+        operations.append(UpdateOne({"name": name}, {"$set": changed}))
+        counts["updated"] += 1
+        logger.debug(f"  {name}: campos alterados {sorted(changed)}")
+
+    return operations, counts
+
+
+def sync_mcps(
+    mcps: List[Dict],
+    mongo_uri: str = "mongodb://localhost:27017",
+    database: str = "conductor_state",
+    dry_run: bool = False,
+    registry=None
+) -> Dict:
+    """
+    Sincroniza MCPs descobertos com o mcp_registry em lote.
+
+    Lê o registry uma única vez (com projeção), calcula o diff em memória e
+    aplica apenas os documentos alterados em um único bulk_write não ordenado.
+    Entradas sem mudança não geram escrita (nem updated_at).
+
+    Args:
+        mcps: Lista de MCPs descobertos
+        mongo_uri: URI de conexão MongoDB
+        database: Nome do database
+        dry_run: Se True, calcula o diff mas não escreve
+        registry: Collection já conectada (reutilizada pelo modo --watch)
+
+    Returns:
+        Dict com estatísticas do cadastro
+    """
+    stats = {
+        "total": len(mcps),
+        "registered": 0,
+        "updated": 0,
+        "skipped": 0,
+        "errors": 0
+    }
+
+    client = None
+    try:
+        from pymongo.errors import BulkWriteError
+
+        if registry is None:
+            from pymongo import MongoClient
+
+            client = MongoClient(mongo_uri)
+            registry = client[database]["mcp_registry"]
+            logger.info(f"Conectado ao MongoDB: {mongo_uri}/{database}")
+
+        names = list({m["name"] for m in mcps})
+        existing_by_name = {
+            doc["name"]: doc
+            for doc in registry.find({"name": {"$in": names}}, REGISTRY_SYNC_PROJECTION)
+        }
+
+        operations, counts = plan_registry_sync(mcps, existing_by_name)
+        stats["skipped"] = counts["unchanged"]
+
+        if dry_run:
+            logger.info("=== DRY RUN - Nenhuma alteração será feita ===")
+            logger.info(f"  [DRY RUN] Novos: {counts['inserted']}, alterados: {counts['updated']}, "
+                        f"sem mudança: {counts['unchanged']}")
+            return stats
+
+        if operations:
+            try:
+                result = registry.bulk_write(operations, ordered=False)
+                stats["registered"] = result.upserted_count
+                stats["updated"] = result.modified_count
+            except BulkWriteError as e:
+                details = e.details
+                stats["registered"] = details.get("nUpserted", 0)
+                stats["updated"] = details.get("nModified", 0)
+                stats["errors"] = len(details.get("writeErrors", []))
+                for error in details.get("writeErrors", []):
+                    logger.error(f"  Erro no bulk_write (op {error.get('index')}): {error.get('errmsg')}")
+
+        logger.info(f"  Sync: {stats['registered']} novos, {stats['updated']} atualizados, "
+                    f"{stats['skipped']} sem mudança ({len(operations)} operações)")
+
+    except ImportError:
+        logger.error("PyMongo não está instalado. Execute: pip install pymongo")
+        stats["errors"] = len(mcps)
+    except Exception as e:
+        logger.error(f"Erro ao sincronizar com o MongoDB: {e}")
+        stats["errors"] = len(mcps)
+    finally:
+        if client is not None:
+            client.close()
+
+    return stats
+
+
 def register_mcps(
     mcps: List[Dict],
     mongo_uri: str = "mongodb://localhost:27017",
@@ -277,26 +1147,8 @@ def register_mcps(
 
                 if existing:
                     # Atualizar campos de on-demand (preservar campos existentes)
-                    update_fields = {
-                        "url": mcp["url"],
-                        "host_url": mcp["host_url"],
-                        "docker_compose_path": mcp["docker_compose_path"],
-                        "auto_shutdown_minutes": mcp["auto_shutdown_minutes"],
-                        "metadata": mcp["metadata"],
-                        "updated_at": datetime.now(timezone.utc)
-                    }
-
-                    # Atualizar backend_url se descoberto
-                    if mcp.get("backend_url"):
-                        update_fields["backend_url"] = mcp["backend_url"]
-
-                    # Atualizar auth se descoberto (não sobrescrever com None)
-                    if mcp.get("auth"):
-                        update_fields["auth"] = mcp["auth"]
-
-                    # Não sobrescrever status se já estiver healthy
-                    if existing.get("status") not in ["healthy", "starting"]:
-                        update_fields["status"] = mcp["status"]
+                    update_fields = registry_update_fields(mcp, existing)
+                    update_fields["updated_at"] = datetime.now(timezone.utc)
 
                     registry.update_one(
                         {"name": mcp["name"]},
@@ -327,6 +1179,500 @@ def register_mcps(
     return stats
 
 
+# Diretórios ignorados pelo --watch (evita estourar fs.inotify.max_user_watches)
+WATCH_IGNORED_DIRS = {".git", "node_modules", "__pycache__", ".venv", "venv", ".mypy_cache", ".pytest_cache"}
+
+
+class InotifyWatcher:
+    """
+    Observador recursivo de diretórios via inotify (Linux), sem dependências externas.
+
+    O inotify não é recursivo: um watch é registrado por diretório e novos
+    diretórios criados depois do start são adicionados conforme aparecem.
+    """
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+
+    WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+                  | IN_DELETE | IN_DELETE_SELF)
+
+    _EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify não disponível nesta plataforma (apenas Linux)")
+
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falhou")
+        self._dirs: Dict[int, str] = {}
+
+    def add_tree(self, root: str) -> List[str]:
+        """
+        Registra watches em root e em todos os subdiretórios.
+
+        Returns:
+            Compose files já existentes na árvore (útil para diretórios recém-criados)
+        """
+        found = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d not in WATCH_IGNORED_DIRS]
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(dirpath), self.WATCH_MASK)
+            if wd < 0:
+                logger.warning(f"Não foi possível observar {dirpath} (errno {ctypes.get_errno()})")
+                continue
+            self._dirs[wd] = dirpath
+            if COMPOSE_FILENAME in filenames:
+                found.append(os.path.join(dirpath, COMPOSE_FILENAME))
+        return found
+
+    def read_events(self) -> List[Tuple[str, int]]:
+        """Lê os eventos pendentes como tuplas (caminho, mask)."""
+        try:
+            buffer = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _cookie, length = self._EVENT_HEADER.unpack_from(buffer, offset)
+            offset += self._EVENT_HEADER.size
+            name = buffer[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+
+            if mask & self.IN_Q_OVERFLOW:
+                events.append(("", mask))
+                continue
+            if mask & self.IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+
+            directory = self._dirs.get(wd)
+            if directory is not None:
+                events.append((os.path.join(directory, name) if name else directory, mask))
+        return events
+
+    @property
+    def watch_count(self) -> int:
+        return len(self._dirs)
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def watch_mcps(
+    base_path: str = DEFAULT_BASE_PATH,
+    mongo_uri: str = "mongodb://localhost:27017",
+    database: str = "conductor_state",
+    dry_run: bool = False,
+    cache_path: Optional[Path] = None,
+    debounce: float = 0.25,
+    max_delay: float = 1.0,
+    yaml_parser: str = "full"
+) -> None:
+    """
+    Modo daemon: observa base_path e sincroniza apenas os compose files alterados.
+
+    Eventos são acumulados até ficarem `debounce` segundos sem novidade (ou até
+    `max_delay` desde o primeiro evento), então cada arquivo tocado é re-parseado
+    uma única vez e as entradas de todos eles vão ao registry em um só sync.
+    Rajadas como um `git checkout` que toca 80 arquivos viram um único bulk_write.
+
+    Args:
+        base_path: Caminho base a observar
+        mongo_uri: URI de conexão MongoDB
+        database: Nome do database
+        dry_run: Se True, apenas loga o que seria sincronizado
+        cache_path: Cache de scan usado na sincronização inicial
+        debounce: Janela de silêncio (s) antes de processar a rajada
+        max_delay: Atraso máximo (s) entre o primeiro evento e o sync
+        yaml_parser: Modo de parse (ver YAML_PARSERS)
+    """
+    base_path_obj = Path(base_path)
+    if not base_path_obj.exists():
+        logger.error(f"Caminho base não existe: {base_path}")
+        return
+
+    registry = None
+    client = None
+    if not dry_run:
+        try:
+            from pymongo import MongoClient
+        except ImportError:
+            logger.error("PyMongo não está instalado. Execute: pip install pymongo")
+            return
+        client = MongoClient(mongo_uri)
+        registry = client[database]["mcp_registry"]
+        logger.info(f"Conectado ao MongoDB: {mongo_uri}/{database}")
+
+    watcher = InotifyWatcher()
+    watcher.add_tree(base_path)
+
+    # Sincronização inicial (com cache de scan fica na casa dos milissegundos)
+    scanned = scan_compose_files(base_path, cache_path, yaml_parser=yaml_parser)
+    _push_to_registry(mcps_from_scan(scanned, base_path_obj), dry_run, registry)
+
+    # Índices de portas por arquivo, mantidos para resolver backends entre arquivos
+    port_indexes = {str(path): build_port_index(services) for path, services in scanned}
+
+    logger.info(f"Observando {base_path} ({watcher.watch_count} diretórios). Ctrl+C para parar.")
+
+    pending: set = set()
+    first_event_at = last_event_at = 0.0
+
+    try:
+        while True:
+            timeout = None
+            if pending:
+                now = time.monotonic()
+                timeout = max(0.0, min(last_event_at + debounce, first_event_at + max_delay) - now)
+
+            ready, _, _ = select.select([watcher.fd], [], [], timeout)
+
+            if ready:
+                for path, mask in watcher.read_events():
+                    if mask & InotifyWatcher.IN_Q_OVERFLOW:
+                        # Fila do kernel estourou: eventos perdidos, rescan completo
+                        logger.warning("Fila do inotify estourou; fazendo rescan completo")
+                        pending.update(str(p) for p, _ in scan_compose_files(base_path, cache_path, yaml_parser=yaml_parser))
+                    elif mask & InotifyWatcher.IN_ISDIR:
+                        # Só diretórios novos com compose files entram na rajada
+                        if not mask & (InotifyWatcher.IN_CREATE | InotifyWatcher.IN_MOVED_TO):
+                            continue
+                        if os.path.basename(path) in WATCH_IGNORED_DIRS:
+                            continue
+                        added = watcher.add_tree(path)
+                        if not added:
+                            continue
+                        pending.update(added)
+                    elif os.path.basename(path) == COMPOSE_FILENAME:
+                        pending.add(path)
+                    else:
+                        continue
+
+                    now = time.monotonic()
+                    if not first_event_at:
+                        first_event_at = now
+                    last_event_at = now
+                continue
+
+            if pending:
+                _sync_touched_files(sorted(pending), base_path_obj, port_indexes, dry_run, registry, yaml_parser)
+                pending.clear()
+                first_event_at = last_event_at = 0.0
+
+    except KeyboardInterrupt:
+        logger.info("Watch interrompido")
+    finally:
+        watcher.close()
+        if client is not None:
+            client.close()
+
+
+def _push_to_registry(mcps: List[Dict], dry_run: bool, registry) -> None:
+    if not mcps:
+        return
+    if dry_run:
+        for mcp in mcps:
+            logger.info(f"  [DRY RUN] Sincronizaria: {mcp['name']} -> {mcp.get('host_url', 'N/A')}")
+        return
+    sync_mcps(mcps, registry=registry)
+
+
+def _sync_touched_files(paths: List[str], base_path_obj: Path, port_indexes: Dict[str, Dict],
+                        dry_run: bool, registry, yaml_parser: str = "full") -> None:
+    """Re-parseia os compose files tocados e envia suas entradas ao registry."""
+    start = time.perf_counter()
+    touched = {}
+
+    for path in paths:
+        if not os.path.exists(path):
+            logger.warning(f"  Removido: {path} (entradas no registry mantidas)")
+            port_indexes.pop(path, None)
+            continue
+        try:
+            with open(path, "rb") as f:
+                _, services, error = _parse_compose_content(path, f.read(), yaml_parser)
+        except OSError as e:
+            error = str(e)
+        if error is not None:
+            logger.warning(f"Erro ao processar {path}: {error}")
+            continue
+        touched[path] = services
+        port_indexes[path] = build_port_index(services)
+
+    global_index = merge_port_indexes([port_indexes[p] for p in sorted(port_indexes)])
+    mcps = []
+    for path, services in touched.items():
+        mcps.extend(build_mcp_entries(Path(path), services, base_path_obj, global_index))
+
+    _push_to_registry(mcps, dry_run, registry)
+    logger.info(f"  {len(paths)} arquivo(s) alterado(s), {len(mcps)} MCP(s) sincronizados "
+                f"em {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+class HealthProbePool:
+    """
+    Cliente HTTP/1.1 mínimo sobre asyncio com conexões keep-alive por (host, porta).
+
+    Conexões ociosas são reaproveitadas entre probes do mesmo destino; uma
+    conexão reaproveitada que o servidor já fechou é refeita uma vez.
+    """
+
+    def __init__(self):
+        self._idle: Dict[Tuple[str, int], List] = {}
+        self.connections_opened = 0
+        self.connections_reused = 0
+
+    async def get(self, url: str) -> Tuple[int, bytes]:
+        """Executa GET url e retorna (status HTTP, corpo)."""
+        parts = urlsplit(url)
+        host = parts.hostname or "localhost"
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        path = parts.path or "/"
+        if parts.query:
+            path += f"?{parts.query}"
+
+        for attempt in range(2):
+            reader, writer, reused = await self._acquire(host, port, parts.scheme == "https")
+            try:
+                writer.write(
+                    f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+                    f"Accept: application/json\r\nConnection: keep-alive\r\n\r\n".encode()
+                )
+                await writer.drain()
+                status, body, keep_alive = await self._read_response(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                # Timeout/cancelamento no meio da resposta: a conexão não é reutilizável
+                writer.close()
+                raise
+
+            if keep_alive:
+                self._idle.setdefault((host, port), []).append((reader, writer))
+            else:
+                writer.close()
+            return status, body
+
+        raise ConnectionError(f"Falha ao consultar {url}")
+
+    async def _acquire(self, host: str, port: int, use_ssl: bool):
+        idle = self._idle.get((host, port))
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                self.connections_reused += 1
+                return reader, writer, True
+            writer.close()
+        reader, writer = await asyncio.open_connection(host, port, ssl=use_ssl or None)
+        self.connections_opened += 1
+        return reader, writer, False
+
+    @staticmethod
+    async def _read_response(reader) -> Tuple[int, bytes, bool]:
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("Conexão fechada pelo servidor")
+        version, status = status_line.decode("latin-1").split(" ", 2)[:2]
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+
+        if "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            body = b"".join(chunks)
+        else:
+            body = await reader.read()
+            keep_alive = False
+
+        return int(status), body, keep_alive
+
+    def close(self) -> None:
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+
+def health_url(url: Optional[str]) -> Optional[str]:
+    """Converte host_url (.../sse) ou backend_url na URL de /health correspondente."""
+    if not url:
+        return None
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}/health"
+
+
+def _extract_tools_count(body: bytes) -> Optional[int]:
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(payload, dict):
+        return None
+    if isinstance(payload.get("tools_count"), int):
+        return payload["tools_count"]
+    if isinstance(payload.get("tools"), list):
+        return len(payload["tools"])
+    if isinstance(payload.get("tools"), int):
+        return payload["tools"]
+    return None
+
+
+async def _probe_target(pool: HealthProbePool, semaphore: asyncio.Semaphore,
+                        url: str, timeout: float) -> Dict:
+    """Consulta um /health e classifica o resultado (healthy/unhealthy/stopped)."""
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            status_code, body = await asyncio.wait_for(pool.get(url), timeout)
+        except asyncio.TimeoutError:
+            return {"status": "unhealthy", "error": f"timeout após {timeout}s", "latency_ms": None}
+        except ConnectionRefusedError as e:
+            # Conexão recusada = container não está rodando
+            return {"status": "stopped", "error": str(e), "latency_ms": None}
+        except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+            return {"status": "unhealthy", "error": str(e), "latency_ms": None}
+
+        latency_ms = round((time.perf_counter() - start) * 1000, 1)
+        status = "healthy" if 200 <= status_code < 300 else "unhealthy"
+        return {"status": status, "http_status": status_code, "latency_ms": latency_ms, "body": body}
+
+
+async def probe_mcps_async(mcps: List[Dict], concurrency: int = 32, timeout: float = 10.0) -> List[Dict]:
+    """
+    Verifica host_url e backend_url de todos os MCPs concorrentemente.
+
+    Args:
+        mcps: Entradas do registry (host_url/backend_url)
+        concurrency: Máximo de requisições simultâneas
+        timeout: Timeout por destino, em segundos
+
+    Returns:
+        Um resultado por MCP com status, latência, tools_count e status do backend
+    """
+    pool = HealthProbePool()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def probe(url: Optional[str]) -> Optional[Dict]:
+        if not url:
+            return None
+        return await _probe_target(pool, semaphore, url, timeout)
+
+    try:
+        pairs = await asyncio.gather(*(
+            asyncio.gather(probe(health_url(m.get("host_url"))), probe(health_url(m.get("backend_url"))))
+            for m in mcps
+        ))
+    finally:
+        pool.close()
+
+    logger.debug(f"Probe: {pool.connections_opened} conexões abertas, "
+                 f"{pool.connections_reused} reutilizadas")
+
+    results = []
+    for mcp, (sidecar, backend) in zip(mcps, pairs):
+        result = {
+            "name": mcp["name"],
+            "status": sidecar["status"] if sidecar else "stopped",
+            "latency_ms": sidecar["latency_ms"] if sidecar else None,
+            "tools_count": None,
+            "backend_status": backend["status"] if backend else None,
+            "backend_latency_ms": backend["latency_ms"] if backend else None,
+        }
+        if sidecar and sidecar["status"] == "healthy":
+            result["tools_count"] = _extract_tools_count(sidecar["body"])
+        results.append(result)
+    return results
+
+
+def write_probe_results(
+    results: List[Dict],
+    mongo_uri: str = "mongodb://localhost:27017",
+    database: str = "conductor_state",
+    registry=None
+) -> int:
+    """
+    Grava status/latência/tools_count observados no mcp_registry em um único bulk_write.
+
+    Returns:
+        Número de documentos modificados
+    """
+    from pymongo import MongoClient, UpdateOne
+
+    if not results:
+        return 0
+
+    client = None
+    if registry is None:
+        client = MongoClient(mongo_uri)
+        registry = client[database]["mcp_registry"]
+
+    now = datetime.now(timezone.utc)
+    operations = []
+    for result in results:
+        fields = {
+            "status": result["status"],
+            "health": {
+                "latency_ms": result["latency_ms"],
+                "backend_status": result["backend_status"],
+                "backend_latency_ms": result["backend_latency_ms"],
+                "checked_at": now,
+            },
+        }
+        if result["tools_count"] is not None:
+            fields["tools_count"] = result["tools_count"]
+        operations.append(UpdateOne({"name": result["name"]}, {"$set": fields}))
+
+    try:
+        return registry.bulk_write(operations, ordered=False).modified_count
+    finally:
+        if client is not None:
+            client.close()
+
+
+def log_scan_stats(stats: Dict) -> None:
+    """Loga o resumo do scan (--stats)."""
+    logger.info("")
+    logger.info("Estatísticas do scan:")
+    logger.info(f"  Arquivos encontrados: {stats['files_scanned']}")
+    logger.info(f"  Cache hits: {stats['cache_hits']}")
+    logger.info(f"  Parseados: {stats['parsed']}")
+    logger.info(f"  Erros de parse: {stats['parse_errors']}")
+    logger.info(f"  Tempo de parse: {stats['parse_time'] * 1000:.1f} ms")
+    logger.info(f"  Tempo total do scan: {stats['scan_time'] * 1000:.1f} ms")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Descobrir e cadastrar MCPs no mcp_registry"
@@ -341,6 +1687,11 @@ def main():
         action="store_true",
         help="Cadastrar MCPs descobertos no MongoDB"
     )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="Cadastrar em lote: lê o registry uma vez e aplica só o diff via bulk_write"
+    )
     parser.add_argument(
         "--dry-run",
         action="store_true",
@@ -361,6 +1712,84 @@ def main():
         "-o",
         help="Salvar MCPs descobertos em arquivo JSON"
     )
+    parser.add_argument(
+        "--ndjson",
+        help="Emitir cada MCP em NDJSON assim que descoberto ('-' para stdout)"
+    )
+    parser.add_argument(
+        "--cache-file",
+        default=str(default_cache_path()),
+        help="Arquivo de cache do scan (padrão: %(default)s)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Não usar o cache de scan (re-parseia todos os arquivos)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Processos para parse dos compose files (padrão: número de CPUs)"
+    )
+    parser.add_argument(
+        "--yaml-parser",
+        choices=YAML_PARSERS,
+        default="full",
+        help="Modo de parse YAML: full (libyaml se disponível) ou python "
+             "(SafeLoader puro) (padrão: %(default)s)"
+    )
+    parser.add_argument(
+        "--check-conflicts",
+        action="store_true",
+        help="Reportar portas host publicadas por mais de um serviço e MCP_NAME duplicados "
+             "(sai com código 1 se houver conflitos)"
+    )
+    parser.add_argument(
+        "--allocate-ports",
+        action="store_true",
+        help="Realocar portas host em conflito para portas livres de --port-range "
+             "(reescreve os compose files; use com --dry-run para só ver o plano)"
+    )
+    parser.add_argument(
+        "--port-range",
+        type=parse_port_range,
+        default=DEFAULT_PORT_RANGE,
+        help="Intervalo para --allocate-ports (padrão: %(default)s)"
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Mostrar estatísticas do scan (arquivos, cache hits, tempo de parse)"
+    )
+    parser.add_argument(
+        "--probe",
+        action="store_true",
+        help="Verificar /health de host_url e backend_url e gravar o status observado"
+    )
+    parser.add_argument(
+        "--probe-concurrency",
+        type=int,
+        default=32,
+        help="Máximo de probes simultâneos (padrão: %(default)s)"
+    )
+    parser.add_argument(
+        "--probe-timeout",
+        type=float,
+        default=10.0,
+        help="Timeout por destino do probe em segundos (padrão: %(default)s)"
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Modo daemon: observa --base-path (inotify) e sincroniza compose files alterados"
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=0.25,
+        help="Janela de debounce do --watch em segundos (padrão: %(default)s)"
+    )
     parser.add_argument(
         "--verbose", "-v",
         action="store_true",
@@ -377,7 +1806,62 @@ def main():
     logger.info("MCP Discovery Tool - On-Demand System")
     logger.info("=" * 60)
 
-    mcps = discover_mcps(args.base_path)
+    scan_stats = new_scan_stats()
+    cache_path = None if args.no_cache else Path(args.cache_file)
+
+    if args.watch:
+        watch_mcps(
+            args.base_path,
+            mongo_uri=args.mongo_uri,
+            database=args.database,
+            dry_run=args.dry_run,
+            cache_path=cache_path,
+            debounce=args.debounce,
+            yaml_parser=args.yaml_parser
+        )
+        return
+    emitter = NDJSONEmitter(args.ndjson) if args.ndjson else None
+    conflicts = ConflictIndex() if args.check_conflicts or args.allocate_ports else None
+    try:
+        mcps = discover_mcps(
+            args.base_path,
+            cache_path=cache_path,
+            workers=args.workers,
+            stats=scan_stats,
+            yaml_parser=args.yaml_parser,
+            on_discovered=emitter,
+            conflicts=conflicts
+        )
+    finally:
+        if emitter is not None:
+            emitter.close()
+
+    if args.stats:
+        log_scan_stats(scan_stats)
+
+    collisions = log_conflicts(conflicts, args.base_path) if conflicts is not None else 0
+
+    if args.allocate_ports:
+        plan = conflicts.plan_port_allocation(args.port_range)
+        for item in plan:
+            logger.info(f"  {'[DRY RUN] ' if args.dry_run else ''}{item['service']}: "
+                        f"{item['old_port']} -> {item['new_port']} ({item['file']})")
+        if plan and not args.dry_run:
+            try:
+                changed, unapplied = apply_port_allocation(plan)
+            except ImportError as e:
+                logger.error(f"--allocate-ports requer scripts/rewrite_mcp_compose.py do conductor: {e}")
+                sys.exit(1)
+            for item in unapplied:
+                logger.error(f"  Não realocada: {item['service']} {item['old_port']} -> "
+                             f"{item['new_port']} ({item['file']}): {item['error']}")
+            logger.info(f"  {len(plan) - len(unapplied)} de {len(plan)} porta(s) realocada(s) "
+                        f"em {changed} arquivo(s). Rode a descoberta novamente para atualizar o registry.")
+            if unapplied:
+                sys.exit(1)
+        if args.check_conflicts and collisions:
+            sys.exit(1)
+        return
 
     if not mcps:
         logger.warning("Nenhum MCP descoberto!")
@@ -389,18 +1873,10 @@ def main():
     logger.info("RESUMO DOS MCPs DESCOBERTOS")
     logger.info("=" * 60)
 
-    categories = {}
-    for mcp in mcps:
-        cat = mcp["metadata"]["category"]
-        if cat not in categories:
-            categories[cat] = []
-        categories[cat].append(mcp["name"])
-
-    for cat, names in sorted(categories.items()):
-        logger.info(f"  {cat}: {len(names)} MCPs")
-        for name in sorted(names):
-            mcp = next(m for m in mcps if m["name"] == name)
-            logger.info(f"    - {name} ({mcp.get('host_url', 'N/A')})")
+    for cat, entries in sorted(summarize_by_category(mcps).items()):
+        logger.info(f"  {cat}: {len(entries)} MCPs")
+        for name, host_url in sorted(entries, key=lambda e: e[0]):
+            logger.info(f"    - {name} ({host_url or 'N/A'})")
 
     # Salvar em arquivo se solicitado
     if args.output:
@@ -409,13 +1885,14 @@ def main():
         logger.info(f"\nMCPs salvos em: {args.output}")
 
     # Cadastrar no MongoDB se solicitado
-    if args.register or args.dry_run:
+    if args.register or args.sync or args.dry_run:
         logger.info("")
         logger.info("=" * 60)
         logger.info("CADASTRO NO MONGODB")
         logger.info("=" * 60)
 
-        stats = register_mcps(
+        register = sync_mcps if args.sync else register_mcps
+        stats = register(
             mcps,
             mongo_uri=args.mongo_uri,
             database=args.database,
@@ -427,13 +1904,50 @@ def main():
         logger.info(f"  Total descobertos: {stats['total']}")
         logger.info(f"  Novos registrados: {stats['registered']}")
         logger.info(f"  Atualizados: {stats['updated']}")
+        if args.sync:
+            logger.info(f"  Sem mudança: {stats['skipped']}")
         logger.info(f"  Erros: {stats['errors']}")
 
+    # Verificar saúde dos sidecars e backends
+    if args.probe:
+        logger.info("")
+        logger.info("=" * 60)
+        logger.info("HEALTH PROBE")
+        logger.info("=" * 60)
+
+        probe_start = time.perf_counter()
+        results = asyncio.run(probe_mcps_async(
+            mcps, concurrency=args.probe_concurrency, timeout=args.probe_timeout
+        ))
+        probe_time = time.perf_counter() - probe_start
+
+        for result in sorted(results, key=lambda r: r["name"]):
+            latency = f"{result['latency_ms']} ms" if result["latency_ms"] is not None else "-"
+            logger.info(f"  {result['name']}: {result['status']} ({latency}, "
+                        f"tools: {result['tools_count']}, backend: {result['backend_status']})")
+
+        healthy = sum(1 for r in results if r["status"] == "healthy")
+        logger.info(f"  {healthy}/{len(results)} healthy em {probe_time:.2f}s")
+
+        if args.dry_run:
+            logger.info("  [DRY RUN] Status não gravado no registry")
+        else:
+            try:
+                modified = write_probe_results(results, mongo_uri=args.mongo_uri, database=args.database)
+                logger.info(f"  Registry atualizado: {modified} documentos")
+            except ImportError:
+                logger.error("PyMongo não está instalado. Execute: pip install pymongo")
+            except Exception as e:
+                logger.error(f"Erro ao gravar resultado do probe: {e}")
+
     logger.info("")
     logger.info("=" * 60)
     logger.info("Concluído!")
     logger.info("=" * 60)
 
+    if args.check_conflicts and collisions:
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
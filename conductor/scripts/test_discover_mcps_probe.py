@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Testes do probe assíncrono de /health do discover_mcps contra servidores stub locais.
+
+Cada stub é um asyncio.start_server que responde HTTP/1.1 keep-alive:
+- healthy:   200 com {"tools_count": 3}
+- unhealthy: 503
+- slow:      demora SLOW_DELAY segundos para responder
+
+Uso:
+    python -m pytest conductor/scripts/test_discover_mcps_probe.py -q
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from discover_mcps import HealthProbePool, _probe_target, probe_mcps_async  # noqa: E402
+
+SLOW_DELAY = 2.0
+
+
+class StubServer:
+    """Servidor /health local; conta conexões aceitas e requisições atendidas."""
+
+    def __init__(self, status: int, body: bytes = b"{}", delay: float = 0.0):
+        self.status = status
+        self.body = body
+        self.delay = delay
+        self.connections = 0
+        self.requests = 0
+        self.server = None
+
+    async def start(self) -> "StubServer":
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    @property
+    def url(self) -> str:
+        port = self.server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/sse"
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                while (await reader.readline()) not in (b"\r\n", b""):
+                    pass
+                self.requests += 1
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                writer.write(
+                    f"HTTP/1.1 {self.status} X\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(self.body)}\r\nConnection: keep-alive\r\n\r\n".encode()
+                    + self.body
+                )
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def close(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+
+def test_probe_classifies_healthy_unhealthy_and_slow():
+    async def scenario():
+        healthy = await StubServer(200, json.dumps({"tools_count": 3}).encode()).start()
+        unhealthy = await StubServer(503).start()
+        slow = await StubServer(200, delay=SLOW_DELAY).start()
+        try:
+            return await probe_mcps_async([
+                {"name": "ok", "host_url": healthy.url, "backend_url": unhealthy.url},
+                {"name": "slow", "host_url": slow.url},
+            ], timeout=0.3)
+        finally:
+            for server in (healthy, unhealthy, slow):
+                await server.close()
+
+    ok, slow = asyncio.run(scenario())
+
+    assert ok["status"] == "healthy"
+    assert ok["tools_count"] == 3
+    assert ok["backend_status"] == "unhealthy"
+    assert slow["status"] == "unhealthy"
+    assert slow["latency_ms"] is None
+    assert slow["backend_status"] is None
+
+
+def test_pool_reuses_keep_alive_connection():
+    async def scenario():
+        server = await StubServer(200).start()
+        pool = HealthProbePool()
+        try:
+            for _ in range(3):
+                status, _ = await pool.get(server.url)
+                assert status == 200
+        finally:
+            pool.close()
+            await server.close()
+        return pool, server
+
+    pool, server = asyncio.run(scenario())
+
+    assert server.connections == 1
+    assert server.requests == 3
+    assert pool.connections_opened == 1
+    assert pool.connections_reused == 2
+
+
+def test_timeout_discards_connection():
+    async def scenario():
+        server = await StubServer(200, delay=SLOW_DELAY).start()
+        pool = HealthProbePool()
+        try:
+            result = await _probe_target(pool, asyncio.Semaphore(1), server.url, 0.2)
+            idle = sum(len(connections) for connections in pool._idle.values())
+        finally:
+            pool.close()
+            await server.close()
+        return result, idle
+
+    result, idle = asyncio.run(scenario())
+
+    assert result["status"] == "unhealthy"
+    assert "timeout" in result["error"]
+    # Conexão com resposta pendente não volta para o pool
+    assert idle == 0
@@ -1,115 +1,299 @@
 #!/usr/bin/env python3
 """
-Script to create MongoDB index for optimizing soft-delete queries on history collection
+Script to reconcile MongoDB indexes for conductor_state against a declarative manifest
+
+INDEX_MANIFEST lists every index the cascade, the MCP registry and the task
+watcher rely on, per collection, next to the query it serves. The reconciler
+diffs the manifest against list_indexes() and:
+
+- creates missing indexes (background builds)
+- reports conflicts: an index with the manifest's name but a different key or
+  options (never dropped automatically)
+- flags redundant indexes: deprecated ones (REDUNDANT_INDEXES) and plain
+  indexes whose key is a prefix of another index on the same collection
+- reports size (collStats) and usage ($indexStats) for every index
+
+Unless --skip-advisor is given, index_advisor.py replays the conductor query
+shapes with explain("executionStats") before and after the changes and prints
+the measured difference (a dry run prints the current numbers only).
+
+Usage:
+    python create_mongodb_index.py                      # create missing indexes
+    python create_mongodb_index.py --dry-run            # report only
+    python create_mongodb_index.py -c history -c tasks  # restrict collections
+    python create_mongodb_index.py --drop-redundant     # also drop flagged indexes
 """
 
-from pymongo import MongoClient, ASCENDING
 import os
 import sys
+import argparse
+from pymongo import MongoClient, IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+from index_advisor import advise, print_advice
 
 # MongoDB connection settings
 MONGO_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
-MONGO_DB = os.getenv("MONGODB_DB", "conductor")
+MONGO_DB = os.getenv("MONGODB_DB") or os.getenv("MONGO_DATABASE") or "conductor_state"
+
+# Index options compared between the manifest and the server. expireAfterSeconds
+# is left out: the TTL indexes of scripts/retention_purge.py --mode ttl (<field>_ttl)
+# live outside the manifest
+COMPARED_OPTIONS = ("unique", "sparse", "partialFilterExpression")
+
+# Partial filter of the live-document indexes; isDeleted is always a boolean
+# after migration 20250110_03 (scripts/migrations.py)
+LIVE = {"partialFilterExpression": {"isDeleted": False}}
+
+# Required indexes per collection: (name, keys, options)
+INDEX_MANIFEST = {
+    "history": [
+        # Live messages of an instance, in insertion order (only isDeleted: false is indexed)
+        ("instance_id_live", [("instance_id", ASCENDING), ("_id", ASCENDING)], LIVE),
+        # Cascade: history of cascaded agent_instances (key batches, explain-checked)
+        ("instance_id_1_isDeleted_1", [("instance_id", ASCENDING), ("isDeleted", ASCENDING)], {}),
+        # Retention purge of old soft-deleted messages (scripts/retention_purge.py)
+        ("deleted_at_1", [("deleted_at", ASCENDING)], {"sparse": True}),
+    ],
+    "conversations": [
+        # Live conversations of a screenplay (only isDeleted: false is indexed)
+        ("screenplay_id_live", [("screenplay_id", ASCENDING), ("_id", ASCENDING)], LIVE),
+        # Cascade: $lookup screenplays.screenplay_id -> conversations
+        ("screenplay_id_1_isDeleted_1", [("screenplay_id", ASCENDING), ("isDeleted", ASCENDING)], {}),
+        # Retention purge (scripts/retention_purge.py)
+        ("deletedAt_1", [("deletedAt", ASCENDING)], {"sparse": True}),
+    ],
+    "agent_instances": [
+        # Live agent instances of a screenplay (only isDeleted: false is indexed)
+        ("screenplay_id_live", [("screenplay_id", ASCENDING), ("_id", ASCENDING)], LIVE),
+        # Cascade: $lookup conversations.participants.instance_id -> agent_instances
+        ("instance_id_1_isDeleted_1", [("instance_id", ASCENDING), ("isDeleted", ASCENDING)], {}),
+        # Cascade: $lookup screenplays.screenplay_id -> agent_instances
+        ("screenplay_id_1_isDeleted_1", [("screenplay_id", ASCENDING), ("isDeleted", ASCENDING)], {}),
+        # Retention purge (scripts/retention_purge.py)
+        ("deleted_at_1", [("deleted_at", ASCENDING)], {"sparse": True}),
+    ],
+    "screenplays": [
+        # Cascade: deleted screenplays scanned in _id order (--resume checkpoints);
+        # also serves live screenplays ({isDeleted: false}) in _id order
+        ("isDeleted_1__id_1", [("isDeleted", ASCENDING), ("_id", ASCENDING)], {}),
+        # Cascade: --screenplay-id selection
+        ("id_1", [("id", ASCENDING)], {"sparse": True}),
+    ],
+    "mcp_registry": [
+        # Registry sync/health checks: lookups and upserts by name
+        ("name_1", [("name", ASCENDING)], {"unique": True}),
+    ],
+    "tasks": [
+        # Watcher: polls pending tasks oldest first
+        ("status_1_created_at_1", [("status", ASCENDING), ("created_at", ASCENDING)], {}),
+        # Councilor execution queries per agent
+        ("councilor_executions_idx", [("agent_id", ASCENDING), ("is_councilor_execution", ASCENDING),
+                                      ("created_at", DESCENDING)], {}),
+        ("severity_idx", [("severity", ASCENDING)], {}),
+        # Idempotent upserts of migrate_councilor_executions.py
+        ("migration_key_unique", [("migration_key", ASCENDING)],
+         {"unique": True, "partialFilterExpression": {"migration_key": {"$exists": True}}}),
+    ],
+}
+
+# Indexes known to be redundant, with the reason shown in the report
+_SAME_KEY = "every entry has the same key (isDeleted: false); live queries use the {field, _id} partial indexes"
+REDUNDANT_INDEXES = {
+    "history": {"isDeleted_live": _SAME_KEY},
+    "conversations": {"isDeleted_live": _SAME_KEY},
+    "agent_instances": {"isDeleted_live": _SAME_KEY},
+    "screenplays": {"isDeleted_live": "every entry has the same key; isDeleted_1__id_1 serves live screenplays"},
+    "tasks": {
+        "is_councilor_idx": "low-cardinality boolean; councilor queries use councilor_executions_idx",
+    },
+}
+
+
+def _options(index: dict) -> dict:
+    return {option: index[option] for option in COMPARED_OPTIONS if option in index}
+
+
+def _is_prefix(key: list, other: list) -> bool:
+    return len(key) < len(other) and other[:len(key)] == key
 
-def create_history_indexes():
-    """Create indexes on history collection for performance optimization"""
 
+def diff_indexes(collection, manifest: list) -> dict:
+    """
+    Compare a collection's indexes with its manifest entries.
+
+    Returns:
+        Dict with missing (IndexModel list), present, conflicts and redundant
+        ({name: reason}) indexes
+    """
+    existing = {idx["name"]: idx for idx in collection.list_indexes()}
+    result = {"missing": [], "present": [], "conflicts": [], "redundant": {}}
+
+    for name, keys, options in manifest:
+        current = existing.get(name)
+        if current is None:
+            result["missing"].append(IndexModel(keys, name=name, background=True, **options))
+        elif list(current["key"].items()) != keys or _options(current) != options:
+            result["conflicts"].append(
+                f"{name}: server {dict(current['key'])} {_options(current)} "
+                f"!= manifest {dict(keys)} {options}"
+            )
+        else:
+            result["present"].append(name)
+
+    deprecated = REDUNDANT_INDEXES.get(collection.name, {})
+    for name, index in existing.items():
+        if name == "_id_":
+            continue
+        if name in deprecated:
+            result["redundant"][name] = deprecated[name]
+            continue
+        if _options(index):
+            continue  # unique/sparse/partial/TTL indexes are not plain prefixes
+        key = list(index["key"].items())
+        for other_name, other in existing.items():
+            if other_name != name and _is_prefix(key, list(other["key"].items())):
+                result["redundant"][name] = f"prefix of {other_name}"
+                break
+
+    return result
+
+
+def index_report(db, collection_name: str) -> list:
+    """Size (collStats) and usage ($indexStats) for each index of a collection"""
+    sizes = db.command("collStats", collection_name).get("indexSizes", {})
     try:
-        # Connect to MongoDB
-        print(f"Connecting to MongoDB at {MONGO_URI}...")
-        client = MongoClient(MONGO_URI)
-        db = client[MONGO_DB]
+        usage = {
+            stat["name"]: stat["accesses"]
+            for stat in db[collection_name].aggregate([{"$indexStats": {}}])
+        }
+    except OperationFailure:
+        usage = {}  # $indexStats needs clusterMonitor-level privileges
 
-        # Get history collection
-        history_collection = db["history"]
-
-        print("\nCurrent indexes on 'history' collection:")
-        existing_indexes = list(history_collection.list_indexes())
-        for idx in existing_indexes:
-            print(f"  - {idx['name']}: {idx['key']}")
-
-        # Create compound index for instance_id + isDeleted
-        print("\nCreating compound index: {instance_id: 1, isDeleted: 1}...")
-        index_name = history_collection.create_index(
-            [("instance_id", ASCENDING), ("isDeleted", ASCENDING)],
-            name="instance_id_1_isDeleted_1"
-        )
-        print(f"✅ Index created: {index_name}")
-
-        # Optional: Create index for deleted_at for cleanup queries
-        print("\nCreating index: {deleted_at: 1}...")
-        index_name2 = history_collection.create_index(
-            [("deleted_at", ASCENDING)],
-            name="deleted_at_1",
-            sparse=True  # Only index documents that have deleted_at
-        )
-        print(f"✅ Index created: {index_name2}")
-
-        print("\n" + "="*60)
-        print("  INDEX CREATION COMPLETED")
-        print("="*60)
-
-        # Show all indexes after creation
-        print("\nAll indexes on 'history' collection:")
-        all_indexes = list(history_collection.list_indexes())
-        for idx in all_indexes:
-            print(f"  - {idx['name']}: {idx['key']}")
-            if 'sparse' in idx:
-                print(f"    sparse: {idx['sparse']}")
-
-        # Show collection stats
-        stats = db.command("collStats", "history")
-        print(f"\nCollection stats:")
-        print(f"  - Documents: {stats.get('count', 0):,}")
-        print(f"  - Storage size: {stats.get('storageSize', 0) / 1024 / 1024:.2f} MB")
-        print(f"  - Total indexes: {stats.get('nindexes', 0)}")
-        print(f"  - Total index size: {stats.get('totalIndexSize', 0) / 1024 / 1024:.2f} MB")
+    report = []
+    for name, size in sorted(sizes.items()):
+        accesses = usage.get(name, {})
+        report.append({
+            "name": name,
+            "size_mb": size / 1024 / 1024,
+            "ops": accesses.get("ops"),
+            "since": accesses.get("since"),
+        })
+    return report
 
-        client.close()
-        return True
 
-    except Exception as e:
-        print(f"\n❌ ERROR: {str(e)}")
-        return False
+def reconcile_indexes(db, collections=None, dry_run: bool = False,
+                      drop_redundant: bool = False) -> bool:
+    """
+    Reconcile the manifest against the server.
 
-def explain_benefits():
-    """Explain the benefits of the created indexes"""
-    print("\n" + "="*60)
-    print("  INDEX BENEFITS")
-    print("="*60)
-    print("""
-1. Compound Index {instance_id: 1, isDeleted: 1}:
-   - Optimizes soft-delete propagation queries
-   - Speeds up filtering messages by instance and deletion status
-   - Used by queries like: db.history.find({instance_id: "...", isDeleted: true})
-   - Essential for performance when deleting instances with many messages
-
-2. Index {deleted_at: 1} (sparse):
-   - Optimizes cleanup/maintenance queries
-   - Enables efficient queries to find old deleted messages
-   - Sparse index saves space (only indexes docs with deleted_at field)
-   - Useful for future cleanup jobs: "delete messages deleted > 90 days ago"
-
-Performance Impact:
-- Query time reduction: O(n) → O(log n)
-- Memory usage: Minimal (sparse indexes)
-- Write overhead: Negligible (only on updates with indexed fields)
-    """)
+    Returns:
+        True when every manifest index is present without conflicts
+    """
+    healthy = True
+    existing_collections = set(db.list_collection_names())
+
+    for collection_name in collections or INDEX_MANIFEST:
+        collection = db[collection_name]
+        print(f"\n📁 {collection_name}")
+
+        if collection_name not in existing_collections:
+            print("   ⚠️  Collection does not exist yet (indexes will be created on it)")
+
+        diff = diff_indexes(collection, INDEX_MANIFEST.get(collection_name, []))
+
+        for name in diff["present"]:
+            print(f"   ✅ {name}")
+        for conflict in diff["conflicts"]:
+            healthy = False
+            print(f"   ❌ Conflict {conflict} (drop and recreate manually)")
+
+        if diff["missing"]:
+            names = [model.document["name"] for model in diff["missing"]]
+            if dry_run:
+                healthy = False
+                print(f"   ➕ Missing (dry run, not created): {', '.join(names)}")
+            else:
+                try:
+                    collection.create_indexes(diff["missing"])
+                    print(f"   ➕ Created: {', '.join(names)}")
+                except OperationFailure as e:
+                    healthy = False
+                    print(f"   ❌ Failed to create {', '.join(names)}: {e}")
+
+        for name, reason in diff["redundant"].items():
+            if drop_redundant and not dry_run:
+                collection.drop_index(name)
+                print(f"   🗑️  Dropped redundant {name} ({reason})")
+            else:
+                print(f"   ⚠️  Redundant {name} ({reason})")
+
+        if collection_name in existing_collections:
+            for index in index_report(db, collection_name):
+                ops = "n/a" if index["ops"] is None else f"{index['ops']:,} ops"
+                since = f" since {index['since']:%Y-%m-%d}" if index["since"] else ""
+                print(f"      {index['name']}: {index['size_mb']:.2f} MB, {ops}{since}")
+
+    return healthy
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Reconcile conductor_state indexes against the declarative manifest"
+    )
+    parser.add_argument(
+        "-c", "--collection",
+        action="append",
+        choices=sorted(INDEX_MANIFEST),
+        help="Restrict to this collection (repeatable; default: all in the manifest)"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only report missing, conflicting and redundant indexes"
+    )
+    parser.add_argument(
+        "--drop-redundant",
+        action="store_true",
+        help="Drop indexes flagged as redundant"
+    )
+    parser.add_argument(
+        "--skip-advisor",
+        action="store_true",
+        help="Do not replay query shapes with explain() before/after the changes"
+    )
+    args = parser.parse_args()
 
-if __name__ == "__main__":
     print("\n" + "="*60)
-    print("  MONGODB INDEX CREATION SCRIPT")
+    print("  MONGODB INDEX RECONCILER")
     print("="*60)
-    print("\nThis script creates optimized indexes for soft-delete")
-    print("propagation on the 'history' collection")
-    print("\nBased on: requisitos_propagacao_soft_delete.md")
 
-    # Create indexes
-    success = create_history_indexes()
+    try:
+        print(f"\nConnecting to MongoDB at {MONGO_URI}...")
+        client = MongoClient(MONGO_URI)
+        db = client[MONGO_DB]
+        client.admin.command("ping")
+        print(f"✅ Connected to database: {MONGO_DB}")
+
+        baseline = None if args.skip_advisor else advise(db)
+        healthy = reconcile_indexes(db, args.collection, args.dry_run, args.drop_redundant)
+
+        if args.dry_run and baseline:
+            print_advice(baseline)
+        elif baseline:
+            print_advice(advise(db), baseline)
+        client.close()
+
+    except Exception as e:
+        print(f"\n❌ ERROR: {str(e)}")
+        sys.exit(1)
 
-    if success:
-        explain_benefits()
-        print("\n✅ Setup complete! Your soft-delete queries are now optimized.")
+    if healthy:
+        print("\n✅ All manifest indexes are in place.")
     else:
-        print("\n⚠️  Index creation failed. Please check the error above.")
+        print("\n⚠️  Indexes out of sync with the manifest. See the report above.")
         sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Index advisor for conductor_state, built on explain() and $indexStats
+
+Replays QUERY_SHAPES, the query shapes the conductor tooling issues (cascade
+soft-delete, councilor migration, task watcher, MCP registry), with
+explain("executionStats") and real values sampled from each collection, then
+combines the results with $indexStats usage counters. It reports:
+
+- COLLSCAN plans
+- keys/docs examined vs. documents returned (docs/returned ratio)
+- execution time of each shape
+- unused indexes (0 ops in $indexStats and not chosen by any replayed shape)
+
+create_mongodb_index.py runs the advisor before and after every index change
+and prints the difference.
+
+Usage:
+    python index_advisor.py
+    python index_advisor.py --sample 200
+"""
+
+import os
+import sys
+import argparse
+from pathlib import Path
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure
+
+# Explain plan walker and live-document filter shared with scripts/cascade_engine.py
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from cascade_engine import NOT_DELETED, plan_stages  # noqa: E402
+
+# MongoDB connection settings
+MONGO_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
+MONGO_DB = os.getenv("MONGODB_DB") or os.getenv("MONGO_DATABASE") or "conductor_state"
+
+DEFAULT_SAMPLE_SIZE = 50
+
+# Ratio of documents examined per document returned above which a shape is flagged
+EXAMINED_RATIO_THRESHOLD = 10
+
+# Query shapes replayed by the advisor. `sample` names the fields whose values
+# are sampled from the collection; `filter` builds the query from them.
+QUERY_SHAPES = [
+    {
+        "label": "cascade: history by instance_id $in + isDeleted false",
+        "collection": "history",
+        "sample": "instance_id",
+        "filter": lambda values: {"instance_id": {"$in": values}, **NOT_DELETED},
+    },
+    {
+        "label": "cascade: conversations by screenplay_id $in + isDeleted false",
+        "collection": "conversations",
+        "sample": "screenplay_id",
+        "filter": lambda values: {"screenplay_id": {"$in": values}, **NOT_DELETED},
+    },
+    {
+        "label": "cascade: agent_instances by instance_id $in + isDeleted false",
+        "collection": "agent_instances",
+        "sample": "instance_id",
+        "filter": lambda values: {"instance_id": {"$in": values}, **NOT_DELETED},
+    },
+    {
+        "label": "cascade: agent_instances by screenplay_id $in + isDeleted false",
+        "collection": "agent_instances",
+        "sample": "screenplay_id",
+        "filter": lambda values: {"screenplay_id": {"$in": values}, **NOT_DELETED},
+    },
+    {
+        "label": "cascade: deleted screenplays in _id order",
+        "collection": "screenplays",
+        "filter": lambda values: {"isDeleted": True},
+        "sort": [("_id", 1)],
+    },
+    {
+        "label": "ui: live history of an instance, in insertion order",
+        "collection": "history",
+        "sample": "instance_id",
+        "filter": lambda values: {"instance_id": values[0], **NOT_DELETED},
+        "sort": [("_id", 1)],
+    },
+    {
+        "label": "ui: live conversations of a screenplay",
+        "collection": "conversations",
+        "sample": "screenplay_id",
+        "filter": lambda values: {"screenplay_id": values[0], **NOT_DELETED},
+        "sort": [("_id", 1)],
+    },
+    {
+        "label": "ui: live agent instances of a screenplay",
+        "collection": "agent_instances",
+        "sample": "screenplay_id",
+        "filter": lambda values: {"screenplay_id": values[0], **NOT_DELETED},
+        "sort": [("_id", 1)],
+    },
+    {
+        "label": "ui: live screenplays in _id order",
+        "collection": "screenplays",
+        "filter": lambda values: NOT_DELETED,
+        "sort": [("_id", 1)],
+    },
+    {
+        "label": "migration: councilor executions per agent, newest first",
+        "collection": "tasks",
+        "sample": "agent_id",
+        "filter": lambda values: {"agent_id": values[0], "is_councilor_execution": True},
+        "sort": [("created_at", -1)],
+    },
+    {
+        "label": "migration: tasks by migration_key $in",
+        "collection": "tasks",
+        "sample": "migration_key",
+        "filter": lambda values: {"migration_key": {"$in": values}},
+    },
+    {
+        "label": "watcher: pending tasks, oldest first",
+        "collection": "tasks",
+        "filter": lambda values: {"status": "pending"},
+        "sort": [("created_at", 1)],
+    },
+    {
+        "label": "registry: mcp_registry by name $in",
+        "collection": "mcp_registry",
+        "sample": "name",
+        "filter": lambda values: {"name": {"$in": values}},
+    },
+]
+
+
+def sample_values(collection, field: str, sample_size: int) -> list:
+    """Distinct values of `field` from up to sample_size documents"""
+    values = []
+    for doc in collection.find({field: {"$exists": True}}, {field: 1}).limit(sample_size):
+        if doc[field] not in values:
+            values.append(doc[field])
+    return values
+
+
+def explain_shape(db, shape: dict, sample_size: int) -> dict:
+    """Run explain("executionStats") for one query shape"""
+    collection = db[shape["collection"]]
+    values = sample_values(collection, shape["sample"], sample_size) if "sample" in shape else []
+    result = {"label": shape["label"], "collection": shape["collection"]}
+
+    if "sample" in shape and not values:
+        result["skipped"] = f"no documents with {shape['sample']}"
+        return result
+
+    command = {"find": collection.name, "filter": shape["filter"](values)}
+    if shape.get("sort"):
+        command["sort"] = dict(shape["sort"])
+    explain = db.command("explain", command, verbosity="executionStats")
+
+    stats = explain["executionStats"]
+    stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+    returned = stats.get("nReturned", 0)
+    docs_examined = stats.get("totalDocsExamined", 0)
+    result.update({
+        "collscan": any(stage == "COLLSCAN" for stage, _ in stages),
+        "indexes": sorted({index for _, index in stages if index}),
+        "keys_examined": stats.get("totalKeysExamined", 0),
+        "docs_examined": docs_examined,
+        "returned": returned,
+        "ratio": docs_examined / max(returned, 1),
+        "millis": stats.get("executionTimeMillis", 0),
+    })
+    return result
+
+
+def index_usage(db, collection_name: str) -> dict:
+    """$indexStats ops per index name (empty if not permitted)"""
+    try:
+        return {
+            stat["name"]: stat["accesses"]["ops"]
+            for stat in db[collection_name].aggregate([{"$indexStats": {}}])
+        }
+    except OperationFailure:
+        return {}
+
+
+def advise(db, sample_size: int = DEFAULT_SAMPLE_SIZE) -> dict:
+    """
+    Replay every query shape and collect index usage.
+
+    Returns:
+        Dict with shapes (explain results) and unused ({collection: [index names]})
+    """
+    existing = set(db.list_collection_names())
+    shapes = [
+        explain_shape(db, shape, sample_size) if shape["collection"] in existing
+        else {"label": shape["label"], "collection": shape["collection"],
+              "skipped": "collection does not exist"}
+        for shape in QUERY_SHAPES
+    ]
+
+    chosen = {(s["collection"], index) for s in shapes for index in s.get("indexes", [])}
+    unused = {}
+    for collection_name in sorted({shape["collection"] for shape in QUERY_SHAPES} & existing):
+        idle = [
+            name for name, ops in index_usage(db, collection_name).items()
+            if name != "_id_" and ops == 0 and (collection_name, name) not in chosen
+        ]
+        if idle:
+            unused[collection_name] = sorted(idle)
+
+    return {"shapes": shapes, "unused": unused}
+
+
+def print_advice(advice: dict, baseline: dict = None) -> int:
+    """
+    Print the advisor report, with deltas against `baseline` when given.
+
+    Returns:
+        Number of problems found (COLLSCANs + high examined ratios)
+    """
+    before = {s["label"]: s for s in (baseline or {}).get("shapes", []) if "skipped" not in s}
+    problems = 0
+
+    print("\n" + "="*60)
+    print("  INDEX ADVISOR")
+    print("="*60)
+
+    for shape in advice["shapes"]:
+        print(f"\n🔎 {shape['label']}")
+        if "skipped" in shape:
+            print(f"   ⏭️  Skipped: {shape['skipped']}")
+            continue
+
+        if shape["collscan"]:
+            problems += 1
+            print("   ❌ COLLSCAN")
+        else:
+            print(f"   ✅ IXSCAN {', '.join(shape['indexes'])}")
+        if shape["ratio"] > EXAMINED_RATIO_THRESHOLD:
+            problems += 1
+            print(f"   ⚠️  {shape['ratio']:.1f} docs examined per doc returned")
+
+        line = (f"   keys {shape['keys_examined']:,} | docs {shape['docs_examined']:,} | "
+                f"returned {shape['returned']:,} | {shape['millis']} ms")
+        previous = before.get(shape["label"])
+        if previous:
+            line += (f"   (before: docs {previous['docs_examined']:,}, {previous['millis']} ms"
+                     f"{', COLLSCAN' if previous['collscan'] else ''})")
+        print(line)
+
+    if advice["unused"]:
+        print("\n💤 Unused indexes (0 ops in $indexStats, not chosen by any shape):")
+        for collection_name, names in advice["unused"].items():
+            print(f"   - {collection_name}: {', '.join(names)}")
+
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay conductor query shapes with explain() and report index usage"
+    )
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=DEFAULT_SAMPLE_SIZE,
+        help="Documents sampled per shape for $in values (default: %(default)s)"
+    )
+    args = parser.parse_args()
+
+    try:
+        print(f"Connecting to MongoDB at {MONGO_URI}...")
+        client = MongoClient(MONGO_URI)
+        db = client[MONGO_DB]
+        client.admin.command("ping")
+        print(f"✅ Connected to database: {MONGO_DB}")
+
+        problems = print_advice(advise(db, args.sample))
+        client.close()
+
+    except Exception as e:
+        print(f"\n❌ ERROR: {str(e)}")
+        sys.exit(1)
+
+    print(f"\n{'✅ No problems found' if not problems else f'⚠️  {problems} problem(s) found'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,17 +5,69 @@ Script de migração: councilor_executions → tasks
 Este script migra execuções de conselheiros da coleção legacy councilor_executions
 para a coleção unificada tasks, adicionando os campos necessários.
 
+A migração lê o cursor em lotes de --batch-size e grava cada lote com um único
+bulk_write não ordenado de upserts ($setOnInsert) chaveados por migration_key
+(derivada do _id legacy). Um índice único em tasks.migration_key torna
+re-execuções idempotentes: documentos já migrados viram matches, sem escrita.
+
+Para caber em janelas de manutenção, a migração pode ser dividida em faixas de
+_id (--partitions, limites calculados com $bucketAuto) processadas por um pool
+de threads (--workers). Cada partição grava o seu checkpoint em
+migration_checkpoints após cada lote; --resume reaproveita o mesmo plano de
+partições e continua cada uma do último _id confirmado. Ao final, os
+resultados das partições são consolidados em um único relatório.
+
+O backup é feito no servidor: uma aggregation com $out copia councilor_executions
+para uma coleção com timestamp (councilor_executions_backup_AAAAMMDD_HHMMSS),
+sem passar os documentos pelo Python. Opcionalmente (--export-dir) a coleção de
+backup é exportada em streaming para um arquivo comprimido (.bson.gz ou
+.ndjson.gz), acompanhado de um .sha256 (formato sha256sum) e de um
+.manifest.json com contagem e checksums. Para restaurar:
+
+    sha256sum -c councilor_executions_backup_<ts>.bson.gz.sha256
+    gunzip -k councilor_executions_backup_<ts>.bson.gz
+    mongorestore --db conductor_state --collection councilor_executions \\
+        councilor_executions_backup_<ts>.bson
+    # NDJSON (Extended JSON canônico), após o gunzip:
+    mongoimport --db conductor_state --collection councilor_executions \\
+        --file councilor_executions_backup_<ts>.ndjson
+
+Também registrada como a migração 20250110_01 em scripts/migrations.py, que
+guarda a versão aplicada em schema_migrations (python scripts/migrations.py up).
+
 Uso:
     python migrate_councilor_executions.py [--dry-run] [--batch-size=100]
+    python migrate_councilor_executions.py --workers 8 --partitions 32 [--resume]
+    python migrate_councilor_executions.py --export-dir ./backups [--export-format ndjson]
 """
 
 import os
 import sys
+import gzip
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+import bson
+from bson import json_util, MinKey, MaxKey
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure
 import argparse
 
+from create_mongodb_index import reconcile_indexes
+
+MIGRATION_KEY_FIELD = "migration_key"
+MIGRATION_KEY_INDEX = "migration_key_unique"
+DUPLICATE_KEY_ERROR = 11000
+
+CHECKPOINT_COLLECTION = "migration_checkpoints"
+PARTITION_PLAN_ID = "councilor_executions:partitions"
+
+BACKUP_PREFIX = "councilor_executions_backup"
+EXPORT_FORMATS = ("bson", "ndjson")
+
 
 def connect_to_mongodb(mongo_uri: str):
     """Conecta ao MongoDB e retorna o database"""
@@ -30,7 +82,142 @@ def connect_to_mongodb(mongo_uri: str):
         sys.exit(1)
 
 
-def migrate_executions(db, dry_run: bool = False, batch_size: int = 100):
+def migration_key(execution: dict) -> str:
+    """Chave determinística da task migrada a partir de uma execução legacy."""
+    return f"councilor_executions:{execution['_id']}"
+
+
+def build_task_doc(execution: dict) -> dict:
+    """Mapeia campos de execution para task"""
+    return {
+        MIGRATION_KEY_FIELD: migration_key(execution),
+        "agent_id": execution.get("councilor_id"),
+        "provider": "claude",  # Default provider
+        "prompt": f"Councilor task: {execution.get('councilor_id')}",  # Placeholder
+        "cwd": os.getcwd(),  # Default cwd
+        "timeout": 600,
+        "status": execution.get("status", "completed"),
+        "instance_id": None,  # Não temos no legacy
+        "context": {},
+        "created_at": execution.get("started_at") or execution.get("created_at"),
+        "updated_at": execution.get("created_at"),
+        "started_at": execution.get("started_at"),
+        "completed_at": execution.get("completed_at"),
+        "result": execution.get("output") or execution.get("error") or "",
+        "exit_code": 0 if execution.get("status") == "completed" else 1,
+        "duration": execution.get("duration_ms") / 1000.0 if execution.get("duration_ms") else None,
+        # Campos específicos de conselheiros
+        "is_councilor_execution": True,
+        "councilor_config": None,  # Não temos no legacy
+        "severity": execution.get("severity", "success")
+    }
+
+
+def ensure_migration_index(db):
+    """Índice único que sustenta os upserts por migration_key"""
+    db.tasks.create_index(
+        MIGRATION_KEY_FIELD,
+        name=MIGRATION_KEY_INDEX,
+        unique=True,
+        partialFilterExpression={MIGRATION_KEY_FIELD: {"$exists": True}}
+    )
+
+
+def has_unkeyed_migrations(db) -> bool:
+    """Há tasks migradas por versões anteriores do script (sem migration_key)?"""
+    return db.tasks.count_documents(
+        {"is_councilor_execution": True, MIGRATION_KEY_FIELD: {"$exists": False}},
+        limit=1
+    ) > 0
+
+
+def adopt_unkeyed_migrations(tasks_collection, batch: list) -> dict:
+    """
+    Localiza, com uma query por lote, tasks migradas sem migration_key.
+
+    Usa o mesmo critério de dedup da versão anterior (agent_id,
+    is_councilor_execution, created_at), coberto por councilor_executions_idx.
+
+    Returns:
+        Dict {migration_key: _id da task existente}
+    """
+    candidates = {}
+    for execution in batch:
+        candidates[(execution.get("councilor_id"), execution.get("started_at"))] = migration_key(execution)
+
+    existing = tasks_collection.find(
+        {
+            "agent_id": {"$in": list({agent for agent, _ in candidates})},
+            "is_councilor_execution": True,
+            "created_at": {"$in": list({created for _, created in candidates})},
+            MIGRATION_KEY_FIELD: {"$exists": False}
+        },
+        {"agent_id": 1, "created_at": 1}
+    )
+
+    adopted = {}
+    for task in existing:
+        key = candidates.get((task.get("agent_id"), task.get("created_at")))
+        if key and key not in adopted:
+            adopted[key] = task["_id"]
+    return adopted
+
+
+def batches(cursor, batch_size: int):
+    """Agrupa os documentos do cursor em listas de até batch_size."""
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_batch(tasks_collection, batch: list, adopt_legacy: bool) -> dict:
+    """
+    Grava um lote com um único bulk_write não ordenado.
+
+    Returns:
+        Dict com migrated, skipped e errors do lote
+    """
+    adopted = adopt_unkeyed_migrations(tasks_collection, batch) if adopt_legacy else {}
+
+    operations = []
+    for execution in batch:
+        task_doc = build_task_doc(execution)
+        key = task_doc[MIGRATION_KEY_FIELD]
+        if key in adopted:
+            # Já migrado pela versão anterior: só grava a chave
+            operations.append(UpdateOne({"_id": adopted[key]}, {"$set": {MIGRATION_KEY_FIELD: key}}))
+        else:
+            operations.append(UpdateOne({MIGRATION_KEY_FIELD: key}, {"$setOnInsert": task_doc}, upsert=True))
+
+    try:
+        result = tasks_collection.bulk_write(operations, ordered=False)
+        details = result.bulk_api_result
+        errors = []
+    except BulkWriteError as e:
+        details = e.details
+        errors = details.get("writeErrors", [])
+
+    # Chave duplicada = outro processo migrou o mesmo documento entre o match e o insert
+    duplicates = sum(1 for error in errors if error.get("code") == DUPLICATE_KEY_ERROR)
+    for error in errors:
+        if error.get("code") != DUPLICATE_KEY_ERROR:
+            execution = batch[error["index"]]
+            print(f"   ❌ Erro ao migrar execution {execution.get('execution_id')}: {error.get('errmsg')}")
+
+    return {
+        "migrated": details.get("nUpserted", 0),
+        "skipped": len(batch) - details.get("nUpserted", 0) - len(errors) + duplicates,
+        "errors": len(errors) - duplicates,
+    }
+
+
+def migrate_executions(db, dry_run: bool = False, batch_size: int = 100,
+                       workers: int = 1, partitions_count: int = 1, resume: bool = False):
     """Migra execuções de councilor_executions para tasks"""
 
     legacy_collection = db.councilor_executions
@@ -46,6 +233,8 @@ def migrate_executions(db, dry_run: bool = False, batch_size: int = 100):
 
     if dry_run:
         print("🔍 MODO DRY-RUN: Nenhum dado será modificado")
+        already = tasks_collection.count_documents({MIGRATION_KEY_FIELD: {"$regex": "^councilor_executions:"}})
+        print(f"   Já migradas (com migration_key): {already}")
         print("\nPrimeiro documento como exemplo:")
         sample = legacy_collection.find_one()
         if sample:
@@ -54,121 +243,318 @@ def migrate_executions(db, dry_run: bool = False, batch_size: int = 100):
             print(f"   status: {sample.get('status')}")
             print(f"   severity: {sample.get('severity')}")
             print(f"   started_at: {sample.get('started_at')}")
+            print(f"   migration_key: {migration_key(sample)}")
         return 0
 
-    # Processar em lotes
-    migrated_count = 0
-    skipped_count = 0
-    error_count = 0
-
-    cursor = legacy_collection.find().batch_size(batch_size)
-
-    print(f"\n🔄 Iniciando migração em lotes de {batch_size}...")
-
-    for execution in cursor:
-        try:
-            # Verificar se já foi migrado
-            existing = tasks_collection.find_one({
-                "agent_id": execution.get("councilor_id"),
-                "is_councilor_execution": True,
-                "created_at": execution.get("started_at")
-            })
-
-            if existing:
-                skipped_count += 1
-                continue
-
-            # Mapear campos de execution para task
-            task_doc = {
-                "agent_id": execution.get("councilor_id"),
-                "provider": "claude",  # Default provider
-                "prompt": f"Councilor task: {execution.get('councilor_id')}",  # Placeholder
-                "cwd": os.getcwd(),  # Default cwd
-                "timeout": 600,
-                "status": execution.get("status", "completed"),
-                "instance_id": None,  # Não temos no legacy
-                "context": {},
-                "created_at": execution.get("started_at") or execution.get("created_at"),
-                "updated_at": execution.get("created_at"),
-                "started_at": execution.get("started_at"),
-                "completed_at": execution.get("completed_at"),
-                "result": execution.get("output") or execution.get("error") or "",
-                "exit_code": 0 if execution.get("status") == "completed" else 1,
-                "duration": execution.get("duration_ms") / 1000.0 if execution.get("duration_ms") else None,
-                # Campos específicos de conselheiros
-                "is_councilor_execution": True,
-                "councilor_config": None,  # Não temos no legacy
-                "severity": execution.get("severity", "success")
-            }
-
-            # Inserir na coleção tasks
-            tasks_collection.insert_one(task_doc)
-            migrated_count += 1
-
-            if migrated_count % 10 == 0:
-                print(f"   ✓ Migrados: {migrated_count}/{total_docs}")
-
-        except Exception as e:
-            error_count += 1
-            print(f"   ❌ Erro ao migrar execution {execution.get('execution_id')}: {e}")
-            continue
-
-    print(f"\n✅ Migração concluída!")
-    print(f"   📊 Total processados: {total_docs}")
-    print(f"   ✓ Migrados: {migrated_count}")
-    print(f"   ⏭️  Pulados (já existentes): {skipped_count}")
-    print(f"   ❌ Erros: {error_count}")
-
-    return migrated_count
+    # O índice único precisa existir antes do primeiro upsert
+    ensure_migration_index(db)
+    adopt_legacy = has_unkeyed_migrations(db)
+    if adopt_legacy:
+        print("ℹ️  Tasks migradas por versão anterior encontradas: serão reaproveitadas (sem duplicar)")
+
+    partitions = load_or_plan_partitions(db, partitions_count, resume)
+    print(f"\n🔄 Iniciando migração: {len(partitions)} partição(ões), "
+          f"{workers} worker(s), lotes de {batch_size}...")
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = list(executor.map(
+            lambda partition: migrate_partition(db, partition, batch_size, adopt_legacy, resume),
+            partitions
+        ))
+    elapsed = time.monotonic() - started
+
+    print_partition_report(results, elapsed)
+    complete_partition_plan(db)
+
+    return sum(result["migrated"] for result in results)
+
+
+def plan_partitions(legacy_collection, partitions_count: int) -> list:
+    """
+    Divide councilor_executions em faixas de _id de tamanho parecido.
+
+    Usa $bucketAuto sobre _id no servidor; o max de cada bucket é exclusivo,
+    exceto o do último, que é inclusivo.
+
+    Returns:
+        Lista de dicts {index, min, max, max_inclusive}
+    """
+    if partitions_count <= 1:
+        return [{"index": 0, "min": MinKey(), "max": MaxKey(), "max_inclusive": True}]
+
+    buckets = list(legacy_collection.aggregate(
+        [{"$bucketAuto": {"groupBy": "$_id", "buckets": partitions_count}}],
+        allowDiskUse=True
+    ))
+    return [
+        {
+            "index": index,
+            "min": bucket["_id"]["min"],
+            "max": bucket["_id"]["max"],
+            "max_inclusive": index == len(buckets) - 1,
+        }
+        for index, bucket in enumerate(buckets)
+    ]
+
+
+def load_or_plan_partitions(db, partitions_count: int, resume: bool) -> list:
+    """Reaproveita o plano salvo (--resume) ou calcula e grava um novo."""
+    checkpoints = db[CHECKPOINT_COLLECTION]
+    saved = checkpoints.find_one({"_id": PARTITION_PLAN_ID})
+    if resume and saved and not saved.get("completed"):
+        print(f"↩️  Retomando plano salvo com {len(saved['partitions'])} partição(ões)")
+        return saved["partitions"]
+
+    partitions = plan_partitions(db.councilor_executions, partitions_count)
+    checkpoints.delete_many({"_id": {"$regex": f"^{PARTITION_PLAN_ID}"}})
+    checkpoints.insert_one({
+        "_id": PARTITION_PLAN_ID,
+        "partitions": partitions,
+        "completed": False,
+        "created_at": datetime.now(timezone.utc),
+    })
+    return partitions
+
+
+def complete_partition_plan(db):
+    db[CHECKPOINT_COLLECTION].update_one(
+        {"_id": PARTITION_PLAN_ID},
+        {"$set": {"completed": True, "completed_at": datetime.now(timezone.utc)}}
+    )
+
+
+def partition_checkpoint_id(partition: dict) -> str:
+    return f"{PARTITION_PLAN_ID}:{partition['index']}"
+
+
+def partition_filter(partition: dict, after=None) -> dict:
+    """Filtro de _id da partição, opcionalmente a partir do último _id processado."""
+    bounds = {}
+    if after is not None:
+        bounds["$gt"] = after
+    elif not isinstance(partition["min"], MinKey):
+        bounds["$gte"] = partition["min"]
+    if not isinstance(partition["max"], MaxKey):
+        bounds["$lte" if partition["max_inclusive"] else "$lt"] = partition["max"]
+    return {"_id": bounds} if bounds else {}
+
+
+_print_lock = threading.Lock()
+
+
+def migrate_partition(db, partition: dict, batch_size: int, adopt_legacy: bool,
+                      resume: bool = False) -> dict:
+    """
+    Migra uma faixa de _id, gravando checkpoint após cada lote.
+
+    Returns:
+        Dict com index, processed, migrated, skipped, errors e elapsed da partição
+    """
+    checkpoints = db[CHECKPOINT_COLLECTION]
+    checkpoint_id = partition_checkpoint_id(partition)
+    label = f"[P{partition['index']:02d}]"
+
+    result = {"index": partition["index"], "processed": 0, "migrated": 0, "skipped": 0, "errors": 0}
+    after = None
+    checkpoint = checkpoints.find_one({"_id": checkpoint_id}) if resume else None
+    if checkpoint:
+        result.update(checkpoint["stats"])
+        if checkpoint.get("completed"):
+            result["elapsed"] = 0.0
+            return result
+        after = checkpoint["last_id"]
+
+    query = partition_filter(partition, after)
+    total_docs = db.councilor_executions.count_documents(query)
+    cursor = db.councilor_executions.find(query).sort("_id", 1).batch_size(batch_size)
+
+    done = 0
+    started = time.monotonic()
+    for batch_number, batch in enumerate(batches(cursor, batch_size), start=1):
+        batch_started = time.monotonic()
+        batch_result = write_batch(db.tasks, batch, adopt_legacy)
+        batch_elapsed = max(time.monotonic() - batch_started, 1e-6)
+
+        for key, value in batch_result.items():
+            result[key] += value
+        result["processed"] += len(batch)
+        done += len(batch)
+
+        checkpoints.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {
+                "last_id": batch[-1]["_id"],
+                "stats": {key: result[key] for key in ("processed", "migrated", "skipped", "errors")},
+                "updated_at": datetime.now(timezone.utc),
+            }},
+            upsert=True
+        )
+
+        with _print_lock:
+            print(f"   {label} Lote {batch_number}: +{batch_result['migrated']} migrados, "
+                  f"{batch_result['skipped']} já existentes, {batch_result['errors']} erros | "
+                  f"{done}/{total_docs} | {len(batch) / batch_elapsed:,.0f} docs/s")
+
+    result["elapsed"] = time.monotonic() - started
+    checkpoints.update_one({"_id": checkpoint_id}, {"$set": {"completed": True}}, upsert=True)
+    return result
+
+
+def print_partition_report(results: list, elapsed: float):
+    """Consolida os resultados das partições em um único relatório."""
+    totals = {key: sum(r[key] for r in results) for key in ("processed", "migrated", "skipped", "errors")}
+
+    if len(results) > 1:
+        print(f"\n{'partição':>9} {'processados':>12} {'migrados':>9} {'existentes':>11} "
+              f"{'erros':>6} {'tempo (s)':>10} {'docs/s':>9}")
+        for r in results:
+            rate = r["processed"] / r["elapsed"] if r["elapsed"] else 0
+            print(f"{r['index']:>9} {r['processed']:>12} {r['migrated']:>9} {r['skipped']:>11} "
+                  f"{r['errors']:>6} {r['elapsed']:>10.1f} {rate:>9,.0f}")
+
+    print(f"\n✅ Migração concluída em {elapsed:.1f}s "
+          f"({totals['processed'] / max(elapsed, 1e-6):,.0f} docs/s)!")
+    print(f"   📊 Total processados: {totals['processed']}")
+    print(f"   ✓ Migrados: {totals['migrated']}")
+    print(f"   ⏭️  Pulados (já existentes): {totals['skipped']}")
+    print(f"   ❌ Erros: {totals['errors']}")
 
 
 def create_indexes(db):
-    """Cria índices necessários na coleção tasks"""
+    """Cria os índices da coleção tasks declarados em create_mongodb_index.INDEX_MANIFEST"""
     print("\n📑 Criando índices na coleção tasks...")
 
-    tasks_collection = db.tasks
-
     try:
-        # Índice composto para queries de conselheiros
-        tasks_collection.create_index([
-            ("agent_id", 1),
-            ("is_councilor_execution", 1),
-            ("created_at", -1)
-        ], name="councilor_executions_idx")
+        if reconcile_indexes(db, ["tasks"]):
+            print("✅ Índices criados com sucesso")
+        else:
+            print("⚠️  Índices de tasks divergem do manifesto (veja o relatório acima)")
 
-        # Índice para severity
-        tasks_collection.create_index("severity", name="severity_idx")
+    except Exception as e:
+        print(f"⚠️  Aviso ao criar índices: {e}")
 
-        # Índice para is_councilor_execution
-        tasks_collection.create_index("is_councilor_execution", name="is_councilor_idx")
 
-        print("✅ Índices criados com sucesso")
+def backup_collection_name(now: datetime = None) -> str:
+    """Nome da coleção de backup com timestamp UTC (não colide entre execuções)"""
+    now = now or datetime.now(timezone.utc)
+    return f"{BACKUP_PREFIX}_{now:%Y%m%d_%H%M%S}"
 
-    except Exception as e:
-        print(f"⚠️  Aviso ao criar índices: {e}")
 
+def backup_collection(db, export_dir: str = None, export_format: str = "bson",
+                      batch_size: int = 1000):
+    """
+    Cria backup da coleção councilor_executions no servidor via $out.
 
-def backup_collection(db):
-    """Cria backup da coleção councilor_executions"""
+    Returns:
+        Nome da coleção de backup criada (ou None se não havia documentos)
+    """
     print("\n💾 Criando backup da coleção councilor_executions...")
 
     legacy_collection = db.councilor_executions
-    backup_collection = db.councilor_executions_backup
 
     try:
-        # Copiar todos os documentos
-        docs = list(legacy_collection.find())
-        if docs:
-            backup_collection.insert_many(docs)
-            print(f"✅ Backup criado: {len(docs)} documentos em councilor_executions_backup")
-        else:
+        if legacy_collection.estimated_document_count() == 0:
             print("ℹ️  Nenhum documento para backup")
+            return None
+
+        backup_name = backup_collection_name()
+        legacy_collection.aggregate([{"$out": backup_name}], allowDiskUse=True)
+        count = db[backup_name].count_documents({})
+        print(f"✅ Backup criado: {count} documentos em {backup_name}")
+
+        if export_dir:
+            export_collection(db[backup_name], export_dir, export_format, batch_size)
+
+        return backup_name
 
     except Exception as e:
         print(f"❌ Erro ao criar backup: {e}")
         raise
 
 
+def _encode_bson(doc: dict) -> bytes:
+    return bson.encode(doc)
+
+
+def _encode_ndjson(doc: dict) -> bytes:
+    # Extended JSON canônico preserva ObjectId, datas e tipos numéricos
+    return (json_util.dumps(doc, json_options=json_util.CANONICAL_JSON_OPTIONS) + "\n").encode("utf-8")
+
+
+def export_collection(collection, export_dir: str, export_format: str = "bson",
+                      batch_size: int = 1000) -> dict:
+    """
+    Exporta a coleção em streaming para <export_dir>/<coleção>.<formato>.gz.
+
+    Grava também <arquivo>.sha256 (verificável com `sha256sum -c`) e
+    <arquivo>.manifest.json com contagem, sha256 do arquivo comprimido e do
+    conteúdo descomprimido.
+
+    Returns:
+        Manifesto da exportação
+    """
+    encode = _encode_bson if export_format == "bson" else _encode_ndjson
+    os.makedirs(export_dir, exist_ok=True)
+    filename = f"{collection.name}.{export_format}.gz"
+    path = os.path.join(export_dir, filename)
+    tmp_path = path + ".tmp"
+
+    print(f"📦 Exportando {collection.name} para {path}...")
+
+    content_hash = hashlib.sha256()
+    count = 0
+    with gzip.open(tmp_path, "wb") as out:
+        for doc in collection.find().sort("_id", 1).batch_size(batch_size):
+            data = encode(doc)
+            content_hash.update(data)
+            out.write(data)
+            count += 1
+    os.replace(tmp_path, path)
+
+    file_hash = hashlib.sha256()
+    with open(path, "rb") as exported:
+        for block in iter(lambda: exported.read(1024 * 1024), b""):
+            file_hash.update(block)
+
+    manifest = {
+        "collection": collection.name,
+        "database": collection.database.name,
+        "format": export_format,
+        "documents": count,
+        "file": filename,
+        "sha256": file_hash.hexdigest(),
+        "content_sha256": content_hash.hexdigest(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    with open(path + ".sha256", "w") as checksum_file:
+        checksum_file.write(f"{manifest['sha256']}  {filename}\n")
+    with open(path + ".manifest.json", "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+
+    print(f"✅ Exportados {count} documentos ({os.path.getsize(path) / 1024 / 1024:.2f} MB)")
+    print(f"   sha256: {manifest['sha256']}")
+    return manifest
+
+
+def verify_export(path: str) -> bool:
+    """Confere um arquivo exportado contra o seu .manifest.json (arquivo e conteúdo)"""
+    with open(path + ".manifest.json") as manifest_file:
+        manifest = json.load(manifest_file)
+
+    file_hash = hashlib.sha256()
+    content_hash = hashlib.sha256()
+    with open(path, "rb") as exported:
+        for block in iter(lambda: exported.read(1024 * 1024), b""):
+            file_hash.update(block)
+    with gzip.open(path, "rb") as content:
+        for block in iter(lambda: content.read(1024 * 1024), b""):
+            content_hash.update(block)
+
+    return (file_hash.hexdigest() == manifest["sha256"]
+            and content_hash.hexdigest() == manifest["content_sha256"])
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Migra execuções de conselheiros para coleção tasks unificada"
@@ -182,13 +568,41 @@ def main():
         "--batch-size",
         type=int,
         default=100,
-        help="Tamanho do lote para processamento (padrão: 100)"
+        help="Documentos por lote de leitura e por bulk_write (padrão: 100)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Threads migrando partições em paralelo (padrão: 1)"
+    )
+    parser.add_argument(
+        "--partitions",
+        type=int,
+        default=None,
+        help="Faixas de _id ($bucketAuto) a migrar (padrão: 4 por worker, ou 1 com um worker)"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Retoma o último plano de partições a partir dos checkpoints"
     )
     parser.add_argument(
         "--no-backup",
         action="store_true",
         help="Pula criação de backup"
     )
+    parser.add_argument(
+        "--export-dir",
+        type=str,
+        help="Exporta também o backup para um arquivo comprimido neste diretório"
+    )
+    parser.add_argument(
+        "--export-format",
+        choices=EXPORT_FORMATS,
+        default="bson",
+        help="Formato da exportação: bson (mongorestore) ou ndjson (Extended JSON) (padrão: bson)"
+    )
     parser.add_argument(
         "--mongo-uri",
         type=str,
@@ -212,14 +626,18 @@ def main():
     try:
         # Criar backup se não for dry-run e não for --no-backup
         if not args.dry_run and not args.no_backup:
-            backup_collection(db)
+            backup_collection(db, args.export_dir, args.export_format)
 
         # Criar índices
         if not args.dry_run:
             create_indexes(db)
 
         # Migrar execuções
-        migrated = migrate_executions(db, dry_run=args.dry_run, batch_size=args.batch_size)
+        partitions = args.partitions or (1 if args.workers <= 1 else args.workers * 4)
+        migrated = migrate_executions(
+            db, dry_run=args.dry_run, batch_size=args.batch_size,
+            workers=args.workers, partitions_count=partitions, resume=args.resume
+        )
 
         if migrated > 0:
             print("\n🎉 Migração concluída com sucesso!")
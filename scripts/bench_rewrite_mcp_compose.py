@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Benchmark do rewrite_mcp_compose.py sobre uma árvore sintética grande.
+
+Gera compose files com vários serviços por arquivo, misturando os formatos
+de environment encontrados nos composes reais (lista, mapa, flow, merge
+`<<: *anchor`, sem environment) e comentários no meio dos blocos. Mede:
+
+1. a primeira passada (insere MCP_NAME, MCP_HOST_PORT e MCP_REGISTRY_URL)
+2. a segunda passada (idempotente: nenhuma escrita)
+
+E valida o resultado: as chaves entram apenas nos sidecars, serviços que
+não são sidecar ficam idênticos e nenhum comentário é perdido.
+
+Uso:
+    python bench_rewrite_mcp_compose.py                 # 1000 arquivos
+    python bench_rewrite_mcp_compose.py --files 5000
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import yaml
+
+from rewrite_mcp_compose import COMPOSE_FILENAME, RULES, rewrite_tree
+
+ENV_LAYOUTS = {
+    "list": """\
+    environment:
+      - MCP_PORT=9000          # porta interna do sidecar
+      - TARGET_URL=http://{name}-api:8000
+""",
+    "map": """\
+    environment:
+      MCP_PORT: 9000
+      # backend
+      TARGET_URL: http://{name}-api:8000
+""",
+    "flow": """\
+    environment: [MCP_PORT=9000, TARGET_URL=http://{name}-api:8000]
+""",
+    "merge": """\
+    environment:
+      <<: *sidecar-env
+      TARGET_URL: http://{name}-api:8000
+""",
+    "none": "",
+}
+
+COMPOSE_TEMPLATE = """\
+# Serviço {name} (gerado para benchmark)
+x-sidecar-env: &sidecar-env
+  MCP_PORT: 9000
+
+services:
+  {name}-mcp:
+    image: primoia/mcp-sidecar:latest
+    container_name: {name}-mcp
+    ports:
+      - "{mcp_port}:9000"
+{env}    depends_on:
+      - {name}-api
+    # healthcheck padrão dos sidecars
+    healthcheck:
+      test: ["CMD", "curl", "-f", "http://localhost:9000/health"]
+      interval: 30s
+
+  {name}-api:
+    image: primoia/{name}-api:latest
+    container_name: {name}-api
+    ports:
+      - "{api_port}:8000"
+    environment:
+      - DATABASE_URL=postgresql://user:pass@{name}-db:5432/{name}
+      - LOG_LEVEL=info
+
+  {name}-worker:
+    image: primoia/{name}-api:latest
+    command: ["python", "-m", "worker"]
+    environment:
+      QUEUE: {name}
+"""
+
+
+def generate_tree(base_path: Path, count: int) -> None:
+    layouts = list(ENV_LAYOUTS)
+    for i in range(count):
+        name = f"service-{i:05d}"
+        service_dir = base_path / f"group-{i // 50:03d}" / name
+        service_dir.mkdir(parents=True, exist_ok=True)
+        env = ENV_LAYOUTS[layouts[i % len(layouts)]].format(name=name)
+        (service_dir / COMPOSE_FILENAME).write_text(COMPOSE_TEMPLATE.format(
+            name=name, env=env, mcp_port=40000 + i, api_port=20000 + i
+        ))
+
+
+def snapshot(base_path: Path) -> dict:
+    return {f: f.read_text() for f in sorted(base_path.rglob(COMPOSE_FILENAME))}
+
+
+def validate(before: dict, after: dict) -> list:
+    """Confere sidecars atualizados, demais serviços intactos e comentários preservados."""
+    problems = []
+    for path, old_content in before.items():
+        new_content = after[path]
+        old_services = yaml.safe_load(old_content)["services"]
+        new_services = yaml.safe_load(new_content)["services"]
+
+        for name, new_service in new_services.items():
+            if name.endswith("-mcp"):
+                env = new_service.get("environment") or {}
+                keys = set(env) if isinstance(env, dict) else {e.split("=", 1)[0] for e in env}
+                missing = set(RULES) - keys
+                if missing:
+                    problems.append(f"{path}: {name} sem {sorted(missing)}")
+            elif new_service != old_services[name]:
+                problems.append(f"{path}: serviço {name} alterado indevidamente")
+
+        old_comments = [l for l in old_content.splitlines() if l.strip().startswith("#")]
+        new_comments = [l for l in new_content.splitlines() if l.strip().startswith("#")]
+        if old_comments != new_comments:
+            problems.append(f"{path}: comentários alterados")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark do rewrite_mcp_compose.py em uma árvore sintética"
+    )
+    parser.add_argument(
+        "--files",
+        type=int,
+        default=1000,
+        help="Número de compose files sintéticos (padrão: %(default)s)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Arquivos processados em paralelo (padrão: o do rewrite_mcp_compose)"
+    )
+
+    args = parser.parse_args()
+    rules = list(RULES.values())
+
+    with tempfile.TemporaryDirectory(prefix="bench-rewrite-") as tmp:
+        base_path = Path(tmp)
+        print(f"Gerando {args.files} compose files sintéticos em {tmp}...")
+        generate_tree(base_path, args.files)
+        before = snapshot(base_path)
+
+        start = time.perf_counter()
+        results = rewrite_tree(base_path, rules, workers=args.workers)
+        first_pass = time.perf_counter() - start
+
+        start = time.perf_counter()
+        second = rewrite_tree(base_path, rules, workers=args.workers)
+        second_pass = time.perf_counter() - start
+
+        errors = [r for r in results + second if r.error]
+        updated = sum(1 for r in results if r.added)
+        rewritten_again = sum(1 for r in second if r.added)
+
+        print()
+        print(f"1ª passada: {first_pass:.3f}s ({args.files / first_pass:,.0f} arquivos/s), "
+              f"{updated} arquivos atualizados")
+        print(f"2ª passada: {second_pass:.3f}s ({args.files / second_pass:,.0f} arquivos/s), "
+              f"{rewritten_again} arquivos atualizados")
+
+        problems = validate(before, snapshot(base_path))
+        problems += [f"{r.path}: {r.error}" for r in errors]
+        if rewritten_again:
+            problems.append("segunda passada não foi idempotente")
+
+        print()
+        if problems:
+            print(f"❌ {len(problems)} problema(s):")
+            for problem in problems[:20]:
+                print(f"   {problem}")
+            sys.exit(1)
+        print("✅ Chaves apenas nos sidecars, demais serviços e comentários intactos")
+
+
+if __name__ == "__main__":
+    main()
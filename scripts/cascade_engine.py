@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Engine declarativo de soft delete em cascata sobre o grafo de entidades do conductor.
+
+O grafo descreve:
+- ENTITIES: cada collection e a sua convenção de soft delete (campo de data
+  deletedAt/deleted_at, índice {chave, isDeleted} quando existir)
+- RELATIONS: cada relação pai -> filho, com o campo do pai (pode ser um caminho
+  em array, ex.: participants.instance_id) e o campo do filho que ele referencia
+
+A partir do grafo o engine monta, para cada collection alvo, UM pipeline
+server-side que parte dos screenplays selecionados e percorre todas as relações
+que chegam nela ($lookup, com $unionWith quando há mais de um caminho). A
+alcançabilidade não depende do estado de deleção das entidades intermediárias,
+então as collections alvo são independentes entre si e os planos rodam em
+paralelo.
+
+Estratégias de escrita por collection:
+- merge: o próprio pipeline aplica o update via $merge (só contagens voltam)
+- bulk:  só os _id trafegam, atualizados com update_many em chunks
+- entidades com batch_index (history) são sempre atualizadas em batches de
+  chaves; antes de cada batch o explain() do mesmo update confirma que o
+  planner escolhe um índice (sem COLLSCAN), e o update roda sem hint, com o
+  plano verificado
+
+Dry run: contagem no servidor ($count / count_documents) e uma amostra de até
+N documentos por collection, projetada em sample_fields. Nenhum documento
+inteiro trafega e a memória fica constante independentemente do volume; a
+passada real usa o mesmo cursor projetado (apenas _id/_reason), em chunks.
+
+O mesmo plano serve para delete e restore; mudam apenas o filtro de estado e o
+update. O restore só reverte documentos marcados pela cascata (_cascadeDelete).
+
+Adicionar uma entidade nova ao cascade = uma entrada em ENTITIES e uma em RELATIONS.
+
+Requer MongoDB 5.0+ ($lookup com localField/foreignField + pipeline).
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DELETE = "delete"
+RESTORE = "restore"
+ACTIONS = (DELETE, RESTORE)
+WRITE_MODES = ("merge", "bulk")
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_WORKERS = 4
+
+# Marcador gravado pela cascata; o restore só reverte documentos que o têm
+CASCADE_MARKER = "_cascadeDelete"
+
+# Documentos ainda não deletados. Igualdade no boolean (isDeleted está sempre
+# presente após a migração 20250110_03 de migrations.py), que é o filtro dos
+# índices parciais *_live de create_mongodb_index.py
+NOT_DELETED = {"isDeleted": False}
+
+
+@dataclass(frozen=True)
+class Entity:
+    """Collection do grafo e a sua convenção de soft delete."""
+    collection: str
+    deleted_at_field: str = "deleted_at"
+    # Campos calculados no início do pipeline (ex.: ID lógico do screenplay)
+    computed: Optional[dict] = None
+    # Índice {chave, isDeleted} exigido pela escrita em batches de chaves + explain()
+    batch_index: Optional[str] = None
+    # Campos exibidos nas amostras do dry run
+    sample_fields: tuple = ()
+
+
+@dataclass(frozen=True)
+class Relation:
+    """Relação pai -> filho: documentos do filho cujo child_field está em parent_field do pai."""
+    parent: str
+    child: str
+    parent_field: str
+    child_field: str
+    reason: str
+
+
+ROOT = "screenplays"
+
+ENTITIES = {entity.collection: entity for entity in (
+    Entity("screenplays", "deletedAt",
+           computed={"screenplay_id": {"$ifNull": ["$id", {"$toString": "$_id"}]}}),
+    Entity("conversations", "deletedAt",
+           sample_fields=("conversation_id", "screenplay_id")),
+    Entity("agent_instances", "deleted_at",
+           sample_fields=("instance_id", "agent_id", "screenplay_id")),
+    Entity("history", "deleted_at", batch_index="instance_id_1_isDeleted_1",
+           sample_fields=("instance_id", "agent_id")),
+)}
+
+RELATIONS = (
+    Relation("screenplays", "conversations", "screenplay_id", "screenplay_id", "screenplay_deleted"),
+    Relation("conversations", "agent_instances", "participants.instance_id", "instance_id",
+             "conversation_deleted"),
+    Relation("screenplays", "agent_instances", "screenplay_id", "screenplay_id", "screenplay_deleted"),
+    Relation("agent_instances", "history", "instance_id", "instance_id", "instance_deleted"),
+)
+
+
+def chunked(items, size: int):
+    """Divide `items` em listas de no máximo `size` elementos."""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def plan_stages(plan: dict) -> list:
+    """
+    Lista os estágios de um plano do explain (clássico ou SBE), do topo às
+    folhas, como (estágio, índice usado ou None). Usado também pelo index_advisor.py.
+    """
+    stages = []
+    pending = [plan]
+    while pending:
+        node = pending.pop()
+        if not isinstance(node, dict):
+            continue
+        if "stage" in node:
+            stages.append((node["stage"], node.get("indexName")))
+        pending.extend(node.get(key) for key in ("inputStage", "queryPlan", "winningPlan"))
+        pending.extend(node.get("inputStages", []))
+    return stages
+
+
+def _alias(field: str) -> str:
+    """Nome de campo plano para carregar `field` (possivelmente aninhado) entre estágios."""
+    return "_k_" + field.replace(".", "_")
+
+
+class CascadeEngine:
+    """
+    Planeja e executa delete/restore em cascata a partir de screenplays.
+
+    Args:
+        db: Database MongoDB
+        entities: Convenções por collection (padrão: ENTITIES)
+        relations: Arestas do grafo (padrão: RELATIONS)
+        root: Collection raiz da cascata
+        exclude: Collections a ignorar (e tudo que só é alcançável por elas)
+        workers: Collections alvo processadas em paralelo
+    """
+
+    def __init__(self, db, entities: Dict[str, Entity] = None, relations=RELATIONS,
+                 root: str = ROOT, exclude=(), workers: int = DEFAULT_WORKERS):
+        self.db = db
+        self.entities = entities or ENTITIES
+        self.root = root
+        self.workers = workers
+
+        for relation in relations:
+            for name in (relation.parent, relation.child):
+                if name not in self.entities:
+                    raise ValueError(f"Relação {relation} referencia entidade desconhecida: {name}")
+
+        # Mantém apenas as relações alcançáveis a partir da raiz sem passar por `exclude`
+        reachable = {root}
+        pending = list(relations)
+        changed = True
+        while changed:
+            changed = False
+            for relation in list(pending):
+                if relation.parent in reachable and relation.child not in exclude:
+                    reachable.add(relation.child)
+                    pending.remove(relation)
+                    changed = True
+        self.relations = [r for r in relations if r.parent in reachable and r.child in reachable]
+        self.targets = self._topological_targets()
+
+    def _topological_targets(self) -> List[str]:
+        order = []
+        visiting = set()
+
+        def visit(name):
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"Ciclo no grafo de cascata envolvendo {name}")
+            visiting.add(name)
+            for relation in self.incoming(name):
+                visit(relation.parent)
+            visiting.discard(name)
+            order.append(name)
+
+        for relation in self.relations:
+            visit(relation.child)
+        return [name for name in order if name != self.root]
+
+    def incoming(self, name: str) -> List[Relation]:
+        return [r for r in self.relations if r.child == name]
+
+    def outgoing(self, name: str) -> List[Relation]:
+        return [r for r in self.relations if r.parent == name]
+
+    # ------------------------------------------------------------------
+    # Planejamento
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def root_state(action: str) -> dict:
+        """Screenplays que disparam a ação: deletados (delete) ou não deletados (restore)."""
+        return {"isDeleted": True} if action == DELETE else NOT_DELETED
+
+    @staticmethod
+    def state_filter(action: str) -> dict:
+        """Documentos que a ação ainda precisa alterar."""
+        if action == RESTORE:
+            return {"isDeleted": True, CASCADE_MARKER: {"$exists": True}}
+        return NOT_DELETED
+
+    def _projection(self, name: str) -> dict:
+        """Campos que os documentos de `name` carregam pelo pipeline."""
+        projection = {"_id": 1, "isDeleted": 1, CASCADE_MARKER: 1}
+        for relation in self.outgoing(name):
+            projection[_alias(relation.parent_field)] = "$" + relation.parent_field
+        return projection
+
+    def reach_pipeline(self, name: str, selection: dict) -> list:
+        """
+        Pipeline (sobre a raiz) que produz os documentos de `name` ligados à seleção.
+
+        Cada documento sai com _id, isDeleted, _cascadeDelete, `_reason` (da
+        relação pela qual foi alcançado) e os campos usados pelas relações de saída.
+        """
+        if name == self.root:
+            entity = self.entities[name]
+            stages = [{"$match": selection}]
+            if entity.computed:
+                stages.append({"$set": entity.computed})
+            stages.append({"$project": self._projection(name)})
+            return stages
+
+        branches = []
+        for relation in self.incoming(name):
+            branches.append(self.reach_pipeline(relation.parent, selection) + [
+                {"$lookup": {
+                    "from": name,
+                    "localField": _alias(relation.parent_field),
+                    "foreignField": relation.child_field,
+                    "pipeline": [{"$project": self._projection(name)}],
+                    "as": "_child",
+                }},
+                {"$unwind": "$_child"},
+                {"$replaceRoot": {"newRoot": "$_child"}},
+                {"$set": {"_reason": relation.reason}},
+            ])
+
+        pipeline = branches[0] + [
+            {"$unionWith": {"coll": self.root, "pipeline": branch}} for branch in branches[1:]
+        ]
+        # Um documento pode ser alcançado por mais de um pai/caminho
+        return pipeline + [
+            {"$group": {"_id": "$_id", "doc": {"$first": "$$ROOT"}}},
+            {"$replaceRoot": {"newRoot": "$doc"}},
+        ]
+
+    def keys_pipeline(self, name: str, selection: dict) -> list:
+        """Pipeline das chaves (child_field) de `name`, com o `_reason` de cada uma."""
+        branches = []
+        for relation in self.incoming(name):
+            branches.append(self.reach_pipeline(relation.parent, selection) + [
+                {"$project": {"_id": 0, "key": "$" + _alias(relation.parent_field)}},
+                {"$unwind": "$key"},
+                {"$set": {"_reason": relation.reason}},
+            ])
+
+        pipeline = branches[0] + [
+            {"$unionWith": {"coll": self.root, "pipeline": branch}} for branch in branches[1:]
+        ]
+        return pipeline + [
+            {"$match": {"key": {"$nin": [None, ""]}}},
+            {"$group": {"_id": "$key", "_reason": {"$first": "$_reason"}}},
+        ]
+
+    def describe(self, action: str = DELETE) -> List[str]:
+        """Resumo legível do plano: uma linha por collection alvo."""
+        lines = []
+        for name in self.targets:
+            entity = self.entities[name]
+            paths = ", ".join(f"{r.parent}.{r.parent_field} -> {r.child_field}" for r in self.incoming(name))
+            strategy = "batches de chaves" if entity.batch_index else "pipeline"
+            lines.append(f"{action} {name} ({strategy}): {paths}")
+        return lines
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+
+    def _update(self, name: str, action: str, reason: str, timestamp: datetime) -> dict:
+        entity = self.entities[name]
+        if action == RESTORE:
+            return {
+                "$set": {"isDeleted": False},
+                "$unset": {entity.deleted_at_field: "", CASCADE_MARKER: ""}
+            }
+        return {
+            "$set": {
+                "isDeleted": True,
+                entity.deleted_at_field: timestamp,
+                CASCADE_MARKER: {
+                    "reason": reason,
+                    "deletedAt": timestamp
+                }
+            }
+        }
+
+    def _merge_update(self, name: str, action: str, timestamp: datetime) -> list:
+        """Pipeline do whenMatched do $merge ($$new._reason vem do documento de origem)."""
+        entity = self.entities[name]
+        if action == RESTORE:
+            return [
+                {"$set": {"isDeleted": False}},
+                {"$unset": [entity.deleted_at_field, CASCADE_MARKER]},
+            ]
+        return [{"$set": {
+            "isDeleted": True,
+            entity.deleted_at_field: timestamp,
+            CASCADE_MARKER: {"reason": "$$new._reason", "deletedAt": timestamp},
+        }}]
+
+    def check_plan(self, name: str, query: dict, update: dict) -> list:
+        """
+        explain() do update_many de um batch, com o mesmo filtro e sem hint,
+        exatamente como o batch é executado; garante que o planner escolhe um
+        índice e não degrada para COLLSCAN.
+
+        Raises:
+            RuntimeError: se o plano vencedor contém COLLSCAN
+        """
+        explain = self.db.command(
+            "explain",
+            {"update": name, "updates": [{"q": query, "u": update, "multi": True}]},
+            verbosity="queryPlanner"
+        )
+        stages = [stage for stage, _ in plan_stages(explain["queryPlanner"]["winningPlan"])]
+        if "COLLSCAN" in stages:
+            raise RuntimeError(
+                f"Batch de {name} degradou para COLLSCAN (plano: {' -> '.join(stages)}); abortando"
+            )
+        return stages
+
+    def ensure_indexes(self) -> None:
+        """Falha cedo se um índice usado pelos batches ou pelos $lookup não existir."""
+        for name in self.targets:
+            indexes = self.db[name].index_information()
+            batch_index = self.entities[name].batch_index
+            # Cada $lookup pai -> filho precisa de um índice com child_field como prefixo
+            leading = {next(iter(index["key"]))[0] for index in indexes.values()}
+            missing = [batch_index] if batch_index and batch_index not in indexes else [
+                f"{{{relation.child_field}: 1, ...}}" for relation in self.incoming(name)
+                if relation.child_field not in leading
+            ]
+            if missing:
+                raise RuntimeError(
+                    f"Índice(s) {', '.join(missing)} não encontrado(s) em {self.db.name}.{name}. "
+                    f"Crie-os com create_mongodb_index.py (MONGODB_DB={self.db.name}) "
+                    f"ou exclua {name} da cascata"
+                )
+
+    # ------------------------------------------------------------------
+    # Execução
+    # ------------------------------------------------------------------
+
+    def _log_samples(self, name: str, query: dict, budget: dict) -> None:
+        """Loga até budget[name] documentos de `query`, projetados em sample_fields."""
+        remaining = budget.get(name, 0)
+        if remaining <= 0:
+            return
+        projection = {field: 1 for field in self.entities[name].sample_fields}
+        for doc in self.db[name].find(query, projection or None).limit(remaining):
+            logger.info(f"  [DRY RUN] {name}: {doc}")
+            budget[name] -= 1
+
+    def _run_pipeline_target(self, name: str, selection: dict, action: str, mode: str,
+                             dry_run: bool, chunk_size: int, timestamp: datetime,
+                             sample_budget: dict) -> int:
+        pipeline = self.reach_pipeline(name, selection) + [
+            {"$match": self.state_filter(action)},
+            {"$project": {"_id": 1, "_reason": 1}},
+        ]
+        root = self.db[self.root]
+
+        if dry_run or mode == "merge":
+            result = list(root.aggregate(pipeline + [{"$count": "total"}], allowDiskUse=True))
+            total = result[0]["total"] if result else 0
+            if dry_run and total and sample_budget.get(name, 0) > 0:
+                sample_ids = [doc["_id"] for doc in root.aggregate(
+                    pipeline + [{"$limit": sample_budget[name]}], allowDiskUse=True
+                )]
+                self._log_samples(name, {"_id": {"$in": sample_ids}}, sample_budget)
+            if not dry_run and total:
+                root.aggregate(pipeline + [{"$merge": {
+                    "into": name,
+                    "on": "_id",
+                    "whenMatched": self._merge_update(name, action, timestamp),
+                    "whenNotMatched": "discard",
+                }}], allowDiskUse=True)
+            return total
+
+        collection = self.db[name]
+        state = self.state_filter(action)
+        modified = 0
+        cursor = root.aggregate(pipeline, allowDiskUse=True, batchSize=chunk_size)
+        for chunk in chunked(cursor, chunk_size):
+            by_reason = {}
+            for doc in chunk:
+                by_reason.setdefault(doc.get("_reason"), []).append(doc["_id"])
+            for reason, ids in by_reason.items():
+                modified += collection.update_many(
+                    {"_id": {"$in": ids}, **state},
+                    self._update(name, action, reason, timestamp)
+                ).modified_count
+        return modified
+
+    def _run_keyed_target(self, name: str, selection: dict, action: str,
+                          dry_run: bool, chunk_size: int, timestamp: datetime,
+                          sample_budget: dict) -> int:
+        collection = self.db[name]
+        child_field = self.incoming(name)[0].child_field
+        state = self.state_filter(action)
+
+        cursor = self.db[self.root].aggregate(
+            self.keys_pipeline(name, selection), allowDiskUse=True, batchSize=chunk_size
+        )
+        total = 0
+        for chunk in chunked(cursor, chunk_size):
+            by_reason = {}
+            for doc in chunk:
+                by_reason.setdefault(doc["_reason"], []).append(doc["_id"])
+            for reason, keys in by_reason.items():
+                query = {child_field: {"$in": keys}, **state}
+                update = self._update(name, action, reason, timestamp)
+                self.check_plan(name, query, update)
+                if dry_run:
+                    total += collection.count_documents(query)
+                    self._log_samples(name, query, sample_budget)
+                else:
+                    total += collection.update_many(query, update).modified_count
+        return total
+
+    def _run_target(self, name: str, selection: dict, action: str, mode: str,
+                    dry_run: bool, chunk_size: int, timestamp: datetime, sample_budget: dict) -> int:
+        if self.entities[name].batch_index:
+            total = self._run_keyed_target(
+                name, selection, action, dry_run, chunk_size, timestamp, sample_budget
+            )
+        else:
+            total = self._run_pipeline_target(
+                name, selection, action, mode, dry_run, chunk_size, timestamp, sample_budget
+            )
+
+        verb = "encontrados" if dry_run else ("restaurados" if action == RESTORE else "marcados como deletados")
+        logger.info(f"  {name}: {total} documentos {verb}")
+        return total
+
+    def run(self, selection: dict = None, action: str = DELETE, mode: str = "bulk",
+            dry_run: bool = True, chunk_size: int = DEFAULT_CHUNK_SIZE,
+            sample_budget: Dict[str, int] = None) -> Dict[str, int]:
+        """
+        Executa a ação para os screenplays selecionados.
+
+        Args:
+            selection: Filtro adicional sobre a raiz (ex.: {"_id": {"$in": [...]}})
+            action: DELETE ou RESTORE
+            mode: "merge" ou "bulk" (entidades com batch_index sempre usam batches de chaves)
+            dry_run: Se True, apenas conta
+            chunk_size: Máximo de IDs/chaves por update_many
+            sample_budget: Amostras ainda a logar por collection no dry run
+                (decrementado; compartilhe o mesmo dict entre chunks)
+
+        Returns:
+            Dict {collection: documentos alterados (ou encontrados, em dry run)}
+        """
+        selection = {**self.root_state(action), **(selection or {})}
+        timestamp = datetime.utcnow()
+        sample_budget = sample_budget if sample_budget is not None else {}
+
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            futures = {
+                name: executor.submit(
+                    self._run_target, name, selection, action, mode, dry_run, chunk_size,
+                    timestamp, sample_budget
+                )
+                for name in self.targets
+            }
+            return {name: future.result() for name, future in futures.items()}
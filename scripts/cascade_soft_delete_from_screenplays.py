@@ -1,23 +1,61 @@
 #!/usr/bin/env python3
 """
-Script de Soft Delete em Cascata: Screenplays -> Conversations -> Agent Instances
-
-Este script propaga o soft delete de screenplays para suas entidades relacionadas:
-1. Busca todos os screenplays com isDeleted = true
-2. Marca as conversations relacionadas com isDeleted = true
-3. Para cada conversation, marca os agent_instances (participants) com is_deleted = true
+Script de Soft Delete em Cascata: Screenplays -> Conversations -> Agent Instances -> History
+
+Este script propaga o soft delete de screenplays para suas entidades relacionadas
+(e, com --restore, desfaz a propagação para screenplays restaurados). As relações
+ficam declaradas em cascade_engine.py (ENTITIES/RELATIONS):
+- screenplays -> conversations (screenplay_id)
+- conversations -> agent_instances (participants.instance_id)
+- screenplays -> agent_instances (screenplay_id)
+- agent_instances -> history (instance_id; batches de chaves que exigem o
+  índice instance_id_1_isDeleted_1, verificados com explain() - aborta se houver COLLSCAN)
+
+O engine resolve cada collection alvo com um único pipeline server-side
+($lookup) e processa as collections em paralelo (--workers). Modos de escrita
+(--mode):
+- merge: o update é aplicado no servidor via $merge; apenas contagens voltam
+- bulk:  somente os _id trafegam, atualizados em chunks de update_many
+
+O processamento em lote é feito em chunks de --chunk-size screenplays (e no
+máximo --chunk-size IDs por $in/update_many). Após cada chunk um checkpoint
+com o último screenplay processado é gravado em `cascade_soft_delete_state`;
+--resume continua a partir dele. Execuções com --screenplay-id não gravam
+checkpoint (não sobrescrevem o de uma passada completa interrompida). O
+progresso é reportado em docs/s e ETA.
+
+O --dry-run conta no servidor e loga só uma amostra de --sample documentos por
+collection (projetados), com memória constante; a passada real usa o mesmo
+cursor de screenplays e pipelines projetados.
+
+Modo contínuo (--follow): acompanha um change stream em `screenplays` e
+propaga cada screenplay assim que o isDeleted muda (true -> delete, false ->
+restore). O resume token é persistido em `cascade_soft_delete_state`, então um
+restart continua de onde parou. Na primeira execução (sem token) é feita uma
+passada completa antes de consumir o stream. Change streams exigem replica
+set; para testar localmente, um replica set de um nó basta:
+
+    docker run -d --name mongo-rs -p 27017:27017 mongo:7 --replSet rs0
+    docker exec mongo-rs mongosh --quiet --eval 'rs.initiate()'
+    MONGO_URI='mongodb://localhost:27017/?directConnection=true' \\
+        python cascade_soft_delete_from_screenplays.py --execute --follow
 
 Autor: Claude Code Assistant
 Data: 2025-01-10
 """
 
-import os
 import sys
+import time
 import logging
-from datetime import datetime
-from pathlib import Path
-from pymongo import MongoClient
-from dotenv import load_dotenv
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from cascade_engine import (
+    DELETE, RESTORE, WRITE_MODES, DEFAULT_CHUNK_SIZE, DEFAULT_WORKERS,
+    CascadeEngine, chunked
+)
+from mongo_connection import connect_to_mongodb, load_environment
 
 # Configurar logging
 logging.basicConfig(
@@ -26,305 +64,318 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Carregar variáveis de ambiente
-# Tenta carregar .env.centralized primeiro, depois .env
-script_dir = Path(__file__).parent.parent
-env_centralized = script_dir / '.env.centralized'
-env_local = script_dir / '.env'
-
-if env_centralized.exists():
-    load_dotenv(env_centralized)
-    logger.info(f"Carregado: {env_centralized}")
-elif env_local.exists():
-    load_dotenv(env_local)
-    logger.info(f"Carregado: {env_local}")
-else:
-    load_dotenv()  # Tenta .env no diretório atual
-
-
-def connect_to_mongodb():
-    """Conecta ao MongoDB usando variáveis de ambiente."""
-    # Tenta diferentes nomes de variáveis usados no projeto
-    mongo_uri = (
-        os.getenv('MONGODB_URI') or
-        os.getenv('MONGO_URI') or
-        os.getenv('MONGO_URL') or
-        os.getenv('MONGODB_URL')
-    )
+# Carregar variáveis de ambiente (.env.centralized primeiro, depois .env)
+load_environment()
 
-    if not mongo_uri:
-        raise ValueError(
-            "Nenhuma URI do MongoDB encontrada. "
-            "Defina MONGODB_URI, MONGO_URI, MONGO_URL ou MONGODB_URL"
-        )
 
-    # Se rodando fora do Docker, substituir hostname do container por localhost
-    if 'primoia-shared-mongo' in mongo_uri:
-        mongo_uri_local = mongo_uri.replace('primoia-shared-mongo', 'localhost')
-        logger.info("Detectado hostname Docker, tentando localhost primeiro...")
-        try:
-            client = MongoClient(mongo_uri_local, serverSelectionTimeoutMS=3000)
-            client.admin.command('ping')
-            mongo_uri = mongo_uri_local
-        except Exception:
-            logger.info("localhost falhou, usando URI original (Docker)")
+# Estado persistido: checkpoint do modo em lote e resume token do --follow
+CASCADE_STATE_COLLECTION = "cascade_soft_delete_state"
+CHANGE_STREAM_STATE_ID = "screenplays_change_stream"
+BATCH_CHECKPOINT_IDS = {
+    DELETE: "screenplays_batch_checkpoint",
+    RESTORE: "screenplays_restore_checkpoint",
+}
+DEFAULT_SAMPLE_SIZE = 5
+TOKEN_SAVE_INTERVAL = 5.0  # segundos entre gravações do token com o stream ocioso
 
-    client = MongoClient(mongo_uri)
+# Códigos de erro do servidor tratados no modo --follow
+CHANGE_STREAM_NOT_SUPPORTED = 40573  # mongod standalone
+CHANGE_STREAM_HISTORY_LOST = (260, 280, 286)  # token inválido / fora do oplog
 
-    # Usar conductor_state como padrão (banco principal do projeto)
-    db_name = os.getenv('MONGO_DATABASE') or 'conductor_state'
-    db = client[db_name]
-    logger.info(f"Conectado ao MongoDB: {db_name}")
-    return db
 
+def screenplay_selection(screenplay_id: str = None) -> dict:
+    """Filtro para um screenplay específico (id lógico ou _id), ou {} para todos."""
+    if not screenplay_id:
+        return {}
+    keys = [{"id": screenplay_id}, {"_id": screenplay_id}]
+    if ObjectId.is_valid(screenplay_id):
+        keys.append({"_id": ObjectId(screenplay_id)})
+    return {"$or": keys}
 
-def get_deleted_screenplays(db):
-    """Busca todos os screenplays com isDeleted = true."""
-    screenplays = db.screenplays
 
-    deleted = list(screenplays.find({"isDeleted": True}))
-    logger.info(f"Encontrados {len(deleted)} screenplays deletados")
+def new_stats(engine: CascadeEngine) -> dict:
+    return {"screenplays": 0, **{name: 0 for name in engine.targets}}
 
-    return deleted
 
+def add_stats(total: dict, stats: dict) -> None:
+    for key, value in stats.items():
+        total[key] = total.get(key, 0) + value
 
-def soft_delete_conversations(db, screenplay_ids: list, dry_run: bool = True):
-    """
-    Marca conversations relacionadas aos screenplays como deletadas.
 
-    Args:
-        db: Database MongoDB
-        screenplay_ids: Lista de IDs de screenplays deletados
-        dry_run: Se True, apenas simula sem modificar dados
+def load_resume_token(db):
+    """Lê o resume token persistido do change stream de screenplays (ou None)."""
+    state = db[CASCADE_STATE_COLLECTION].find_one({"_id": CHANGE_STREAM_STATE_ID})
+    return state.get("resume_token") if state else None
 
-    Returns:
-        Tuple (conversations_updated, instance_ids_to_delete)
-    """
-    conversations = db.conversations
-
-    # Buscar conversations que ainda não estão deletadas
-    query = {
-        "screenplay_id": {"$in": screenplay_ids},
-        "$or": [
-            {"isDeleted": {"$exists": False}},
-            {"isDeleted": False}
-        ]
-    }
-
-    convs_to_update = list(conversations.find(query))
-    logger.info(f"Encontradas {len(convs_to_update)} conversations para marcar como deletadas")
-
-    # Coletar todos os instance_ids dos participants
-    instance_ids = set()
-    for conv in convs_to_update:
-        participants = conv.get('participants', [])
-        for participant in participants:
-            instance_id = participant.get('instance_id')
-            if instance_id:
-                instance_ids.add(instance_id)
-
-        if dry_run:
-            logger.info(f"  [DRY RUN] Conversation: {conv.get('conversation_id')} "
-                       f"(screenplay: {conv.get('screenplay_id')}, "
-                       f"participants: {len(participants)})")
-
-    # Atualizar conversations
-    if not dry_run and convs_to_update:
-        result = conversations.update_many(
-            {"_id": {"$in": [c['_id'] for c in convs_to_update]}},
-            {
-                "$set": {
-                    "isDeleted": True,
-                    "deletedAt": datetime.utcnow().isoformat(),
-                    "_cascadeDelete": {
-                        "reason": "screenplay_deleted",
-                        "deletedAt": datetime.utcnow().isoformat()
-                    }
-                }
-            }
-        )
-        logger.info(f"Conversations atualizadas: {result.modified_count}")
 
-    return len(convs_to_update), list(instance_ids)
+def save_resume_token(db, token) -> None:
+    """Persiste o resume token para que um restart continue de onde parou."""
+    db[CASCADE_STATE_COLLECTION].update_one(
+        {"_id": CHANGE_STREAM_STATE_ID},
+        {"$set": {"resume_token": token, "updated_at": datetime.utcnow()}},
+        upsert=True
+    )
 
 
-def soft_delete_agent_instances(db, instance_ids: list, dry_run: bool = True):
-    """
-    Marca agent_instances como deletados.
+def clear_resume_token(db) -> None:
+    db[CASCADE_STATE_COLLECTION].delete_one({"_id": CHANGE_STREAM_STATE_ID})
 
-    Args:
-        db: Database MongoDB
-        instance_ids: Lista de instance_ids para marcar como deletados
-        dry_run: Se True, apenas simula sem modificar dados
 
-    Returns:
-        Número de instances atualizadas
+def screenplay_changes_pipeline():
     """
-    if not instance_ids:
-        logger.info("Nenhum agent_instance para atualizar")
-        return 0
-
-    agent_instances = db.agent_instances
-
-    # Buscar apenas os que ainda não estão deletados (usa isDeleted camelCase)
-    query = {
-        "instance_id": {"$in": instance_ids},
-        "$or": [
-            {"isDeleted": {"$exists": False}},
-            {"isDeleted": False}
-        ]
-    }
-
-    instances_to_update = list(agent_instances.find(query))
-    logger.info(f"Encontrados {len(instances_to_update)} agent_instances para marcar como deletados")
-
-    if dry_run:
-        for inst in instances_to_update:
-            logger.info(f"  [DRY RUN] Agent instance: {inst.get('instance_id')} "
-                       f"(agent_id: {inst.get('agent_id')}, "
-                       f"screenplay_id: {inst.get('screenplay_id')})")
+    Filtro do change stream: updates que gravam ou removem ($unset) o isDeleted
+    de um screenplay e inserts/replaces com isDeleted booleano (um replace com
+    false é um restore).
+    """
+    return [
+        {"$match": {
+            "$or": [
+                {"operationType": "update",
+                 "updateDescription.updatedFields.isDeleted": {"$exists": True}},
+                {"operationType": "update",
+                 "updateDescription.removedFields": "isDeleted"},
+                {"operationType": {"$in": ["insert", "replace"]},
+                 "fullDocument.isDeleted": {"$type": "bool"}},
+            ]
+        }},
+        {"$project": {
+            "documentKey": 1,
+            "operationType": 1,
+            "updateDescription.updatedFields.isDeleted": 1,
+            "updateDescription.removedFields": 1,
+            "fullDocument.isDeleted": 1,
+        }},
+    ]
+
+
+def change_action(change: dict) -> str:
+    """
+    DELETE se o evento marcou o screenplay como deletado, RESTORE caso contrário
+    (inclusive quando o update removeu o campo com $unset).
+    """
+    if change["operationType"] == "update":
+        deleted = change["updateDescription"].get("updatedFields", {}).get("isDeleted")
     else:
-        if instances_to_update:
-            result = agent_instances.update_many(
-                {"_id": {"$in": [i['_id'] for i in instances_to_update]}},
-                {
-                    "$set": {
-                        "isDeleted": True,
-                        "deleted_at": datetime.utcnow().isoformat(),
-                        "_cascadeDelete": {
-                            "reason": "conversation_deleted",
-                            "deletedAt": datetime.utcnow().isoformat()
-                        }
-                    }
-                }
-            )
-            logger.info(f"Agent instances atualizados: {result.modified_count}")
-
-    return len(instances_to_update)
+        deleted = change["fullDocument"]["isDeleted"]
+    return DELETE if deleted is True else RESTORE
 
 
-def soft_delete_agent_instances_by_screenplay(db, screenplay_ids: list, dry_run: bool = True):
+def follow_screenplay_changes(engine: CascadeEngine, dry_run: bool = True, mode: str = "bulk",
+                              chunk_size: int = DEFAULT_CHUNK_SIZE, max_await_ms: int = 1000):
     """
-    Marca agent_instances diretamente relacionados aos screenplays como deletados.
-    (Para casos onde agent_instances têm screenplay_id diretamente)
+    Propaga deleções (e restaurações) de screenplays a partir de um change stream.
 
-    Args:
-        db: Database MongoDB
-        screenplay_ids: Lista de IDs de screenplays deletados
-        dry_run: Se True, apenas simula sem modificar dados
+    Cada evento dispara a cascata restrita ao screenplay do evento. O resume
+    token é gravado após cada evento processado (e periodicamente com o stream
+    ocioso). Em dry run o token não é gravado.
+
+    Sem token salvo, o stream é aberto antes da passada completa de catch-up,
+    para que nenhuma deleção ocorrida durante essa passada seja perdida.
 
     Returns:
-        Número de instances atualizadas
+        Dict com as estatísticas acumuladas até a interrupção (Ctrl+C)
     """
-    agent_instances = db.agent_instances
-
-    # Buscar agent_instances vinculados aos screenplays e ainda não deletados (usa isDeleted camelCase)
-    query = {
-        "screenplay_id": {"$in": screenplay_ids},
-        "$or": [
-            {"isDeleted": {"$exists": False}},
-            {"isDeleted": False}
-        ]
-    }
-
-    instances_to_update = list(agent_instances.find(query))
-    logger.info(f"Encontrados {len(instances_to_update)} agent_instances diretamente vinculados aos screenplays")
-
-    if dry_run:
-        for inst in instances_to_update:
-            logger.info(f"  [DRY RUN] Agent instance (via screenplay): {inst.get('instance_id')} "
-                       f"(screenplay_id: {inst.get('screenplay_id')})")
-    else:
-        if instances_to_update:
-            result = agent_instances.update_many(
-                {"_id": {"$in": [i['_id'] for i in instances_to_update]}},
-                {
-                    "$set": {
-                        "isDeleted": True,
-                        "deleted_at": datetime.utcnow().isoformat(),
-                        "_cascadeDelete": {
-                            "reason": "screenplay_deleted",
-                            "deletedAt": datetime.utcnow().isoformat()
-                        }
-                    }
-                }
-            )
-            logger.info(f"Agent instances atualizados: {result.modified_count}")
+    db = engine.db
+    totals = new_stats(engine)
+    resume_token = load_resume_token(db)
 
-    return len(instances_to_update)
+    while True:
+        try:
+            with db.screenplays.watch(
+                screenplay_changes_pipeline(),
+                resume_after=resume_token,
+                max_await_time_ms=max_await_ms
+            ) as stream:
+                if resume_token is None:
+                    logger.info("Nenhum resume token salvo: executando passada completa antes do stream")
+                    add_stats(totals, run_cascade(
+                        engine, dry_run=dry_run, mode=mode, chunk_size=chunk_size
+                    ))
+                    if not dry_run:
+                        save_resume_token(db, stream.resume_token)
+                else:
+                    logger.info("Retomando change stream a partir do resume token salvo")
+
+                logger.info("Aguardando alterações em screenplays (Ctrl+C para encerrar)...")
+                saved_token = stream.resume_token
+                last_save = time.monotonic()
+
+                while stream.alive:
+                    change = stream.try_next()
+                    if change is not None:
+                        screenplay_key = change["documentKey"]["_id"]
+                        action = change_action(change)
+                        logger.info(f"Screenplay {screenplay_key}: {action}")
+                        stats = engine.run(
+                            {"_id": screenplay_key}, action=action, mode=mode,
+                            dry_run=dry_run, chunk_size=chunk_size
+                        )
+                        stats["screenplays"] = 1
+                        add_stats(totals, stats)
+
+                    resume_token = stream.resume_token
+                    if dry_run or resume_token == saved_token:
+                        continue
+                    if change is not None or time.monotonic() - last_save >= TOKEN_SAVE_INTERVAL:
+                        save_resume_token(db, resume_token)
+                        saved_token = resume_token
+                        last_save = time.monotonic()
+
+        except OperationFailure as e:
+            if e.code == CHANGE_STREAM_NOT_SUPPORTED:
+                raise RuntimeError(
+                    "Change streams exigem replica set (o MongoDB conectado é standalone). "
+                    "Use o modo em lote (sem --follow)."
+                ) from e
+            if e.code not in CHANGE_STREAM_HISTORY_LOST or resume_token is None:
+                raise
+            logger.warning(f"Resume token não é mais válido ({e.code}); "
+                           "reiniciando com uma passada completa")
+            resume_token = None
+            if not dry_run:
+                clear_resume_token(db)
+
+        except KeyboardInterrupt:
+            logger.info("\nModo contínuo interrompido")
+            return totals
+
+
+def load_batch_checkpoint(db, action: str = DELETE):
+    return db[CASCADE_STATE_COLLECTION].find_one({"_id": BATCH_CHECKPOINT_IDS[action]})
+
+
+def save_batch_checkpoint(db, action: str, last_screenplay_id, stats: dict, mode: str,
+                          completed: bool = False) -> None:
+    """Grava o último screenplay processado e as estatísticas acumuladas."""
+    db[CASCADE_STATE_COLLECTION].update_one(
+        {"_id": BATCH_CHECKPOINT_IDS[action]},
+        {"$set": {
+            "last_screenplay_id": last_screenplay_id,
+            "stats": stats,
+            "mode": mode,
+            "completed": completed,
+            "updated_at": datetime.utcnow()
+        }},
+        upsert=True
+    )
+
+
+def format_eta(seconds: float) -> str:
+    return str(timedelta(seconds=int(seconds)))
 
 
-def run_cascade_delete(db, dry_run: bool = True):
+def log_progress(done: int, total: int, docs: int, started: float) -> None:
+    """Loga screenplays processados, docs/s e ETA estimado pelo ritmo atual."""
+    elapsed = max(time.monotonic() - started, 1e-6)
+    rate = done / elapsed
+    eta = format_eta((total - done) / rate) if rate and total > done else "0:00:00"
+    logger.info(f"Progresso: {done}/{total} screenplays ({done * 100 / max(total, 1):.1f}%) | "
+                f"{docs / elapsed:,.1f} docs/s | ETA {eta}")
+
+
+def run_cascade(engine: CascadeEngine, action: str = DELETE, dry_run: bool = True,
+                mode: str = "bulk", chunk_size: int = DEFAULT_CHUNK_SIZE,
+                resume: bool = False, selection: dict = None,
+                sample_size: int = DEFAULT_SAMPLE_SIZE):
     """
-    Executa o soft delete em cascata.
+    Executa o delete (ou restore) em cascata em chunks de screenplays.
+
+    Os screenplays são percorridos por _id (apenas _id trafega) em chunks de
+    `chunk_size`; cada chunk é propagado pelo engine. Fora do dry run, um
+    checkpoint com o último screenplay do chunk é gravado ao final de cada chunk.
+    O checkpoint (um por ação) é só da passada completa: execuções com
+    `selection` não o leem nem o gravam, para não sobrescrever o de uma
+    passada completa pendente.
 
     Args:
-        db: Database MongoDB
-        dry_run: Se True, apenas simula sem modificar dados
+        engine: CascadeEngine configurado
+        action: DELETE (screenplays deletados) ou RESTORE (screenplays não deletados)
+        dry_run: Se True, apenas conta sem modificar dados
+        mode: "merge" ou "bulk"
+        chunk_size: Screenplays por chunk (e máximo de IDs por $in/update_many)
+        resume: Continuar a partir do checkpoint gravado por uma execução anterior
+        selection: Filtro adicional sobre screenplays (ex.: um screenplay específico)
+        sample_size: Documentos de exemplo logados por collection no dry run
 
     Returns:
-        Dict com estatísticas da operação
+        Dict com estatísticas da operação ({"screenplays": n, <collection>: n, ...})
     """
-    stats = {
-        "screenplays_deleted": 0,
-        "conversations_updated": 0,
-        "agent_instances_from_conversations": 0,
-        "agent_instances_from_screenplays": 0
-    }
-
-    # 1. Buscar screenplays deletados
-    deleted_screenplays = get_deleted_screenplays(db)
-    stats["screenplays_deleted"] = len(deleted_screenplays)
-
-    if not deleted_screenplays:
-        logger.info("Nenhum screenplay deletado encontrado. Nada a fazer.")
+    db = engine.db
+    stats = new_stats(engine)
+
+    query = {**engine.root_state(action), **(selection or {})}
+    checkpointed = not dry_run and not selection
+    if resume and selection:
+        logger.info("--resume ignorado: o checkpoint é só da passada completa")
+    elif resume:
+        checkpoint = load_batch_checkpoint(db, action)
+        if checkpoint and not checkpoint.get("completed"):
+            query["_id"] = {"$gt": checkpoint["last_screenplay_id"]}
+            stats.update(checkpoint.get("stats", {}))
+            logger.info(f"Retomando após o screenplay {checkpoint['last_screenplay_id']} "
+                        f"({stats['screenplays']} já processados)")
+        else:
+            logger.info("Nenhum checkpoint pendente encontrado; iniciando do começo")
+
+    total = db.screenplays.count_documents(query)
+    logger.info(f"Encontrados {total} screenplays a processar ({action})")
+
+    if not total:
+        logger.info("Nenhum screenplay encontrado. Nada a fazer.")
         return stats
 
-    # Extrair IDs dos screenplays
-    screenplay_ids = [s.get('id') or str(s.get('_id')) for s in deleted_screenplays]
-    logger.info(f"IDs dos screenplays deletados: {screenplay_ids}")
+    for line in engine.describe(action):
+        logger.info(f"  Plano: {line}")
+
+    cursor = db.screenplays.find(query, {"_id": 1}).sort("_id", 1).batch_size(chunk_size)
+    sample_budget = {name: sample_size for name in engine.targets} if dry_run else {}
+
+    done = 0
+    docs = 0
+    started = time.monotonic()
+    for chunk in chunked(cursor, chunk_size):
+        ids = [s['_id'] for s in chunk]
+        chunk_stats = engine.run(
+            {"_id": {"$in": ids}}, action=action, mode=mode,
+            dry_run=dry_run, chunk_size=chunk_size, sample_budget=sample_budget
+        )
 
-    # 2. Soft delete das conversations relacionadas
-    logger.info("\n--- Processando Conversations ---")
-    convs_updated, instance_ids_from_convs = soft_delete_conversations(db, screenplay_ids, dry_run)
-    stats["conversations_updated"] = convs_updated
+        add_stats(stats, chunk_stats)
+        stats["screenplays"] += len(chunk)
+        done += len(chunk)
+        docs += sum(chunk_stats.values())
 
-    # 3. Soft delete dos agent_instances (via participants das conversations)
-    logger.info("\n--- Processando Agent Instances (via conversations) ---")
-    instances_from_convs = soft_delete_agent_instances(db, instance_ids_from_convs, dry_run)
-    stats["agent_instances_from_conversations"] = instances_from_convs
+        if checkpointed:
+            save_batch_checkpoint(db, action, ids[-1], stats, mode)
+        log_progress(done, total, docs, started)
 
-    # 4. Soft delete dos agent_instances (vinculados diretamente aos screenplays)
-    logger.info("\n--- Processando Agent Instances (via screenplay_id) ---")
-    instances_from_screenplays = soft_delete_agent_instances_by_screenplay(db, screenplay_ids, dry_run)
-    stats["agent_instances_from_screenplays"] = instances_from_screenplays
+    if checkpointed:
+        save_batch_checkpoint(db, action, ids[-1], stats, mode, completed=True)
 
     return stats
 
 
-def print_summary(stats: dict, dry_run: bool):
+def print_summary(stats: dict, dry_run: bool, action: str = DELETE):
     """Imprime resumo da operação."""
     mode = "[DRY RUN]" if dry_run else "[EXECUTADO]"
+    verb = "restaurados" if action == RESTORE else "marcados como deletados"
 
     logger.info(f"\n{'='*60}")
     logger.info(f"RESUMO DA OPERACAO {mode}")
     logger.info(f"{'='*60}")
-    logger.info(f"Screenplays deletados encontrados: {stats['screenplays_deleted']}")
-    logger.info(f"Conversations marcadas como deletadas: {stats['conversations_updated']}")
-    logger.info(f"Agent instances (via conversations): {stats['agent_instances_from_conversations']}")
-    logger.info(f"Agent instances (via screenplay_id): {stats['agent_instances_from_screenplays']}")
+    logger.info(f"Screenplays processados: {stats.get('screenplays', 0)}")
+    for collection, count in stats.items():
+        if collection != "screenplays":
+            logger.info(f"{collection}: {count} documentos {verb}")
     logger.info(f"{'='*60}")
 
-    total_instances = stats['agent_instances_from_conversations'] + stats['agent_instances_from_screenplays']
-    logger.info(f"TOTAL agent_instances afetados: {total_instances}")
-
 
 def main():
     """Função principal do script."""
     import argparse
 
     parser = argparse.ArgumentParser(
-        description='Propaga soft delete de screenplays para conversations e agent_instances'
+        description='Propaga soft delete de screenplays para conversations, agent_instances e history'
     )
     parser.add_argument(
         '--dry-run',
@@ -336,6 +387,59 @@ def main():
         action='store_true',
         help='Executar as alterações (use com cuidado!)'
     )
+    parser.add_argument(
+        '--restore',
+        action='store_true',
+        help='Desfazer a cascata para screenplays restaurados (isDeleted != true); só '
+             'reverte documentos marcados pela cascata (_cascadeDelete)'
+    )
+    parser.add_argument(
+        '--screenplay-id',
+        type=str,
+        help='Processar apenas este screenplay (id ou _id)'
+    )
+    parser.add_argument(
+        '--mode',
+        choices=WRITE_MODES,
+        default='bulk',
+        help='merge: update no servidor via $merge; bulk: update_many em chunks de _id '
+             '(padrão: %(default)s)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=DEFAULT_WORKERS,
+        help='Collections alvo processadas em paralelo (padrão: %(default)s)'
+    )
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help='Screenplays por chunk/checkpoint e máximo de IDs por $in/update_many '
+             '(padrão: %(default)s)'
+    )
+    parser.add_argument(
+        '--sample',
+        type=int,
+        default=DEFAULT_SAMPLE_SIZE,
+        help='Documentos de exemplo logados por collection no dry run (padrão: %(default)s)'
+    )
+    parser.add_argument(
+        '--skip-history',
+        action='store_true',
+        help='Não propagar para a collection history'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Continuar a partir do último checkpoint gravado (modo em lote)'
+    )
+    parser.add_argument(
+        '--follow',
+        action='store_true',
+        help='Modo contínuo: propaga cada alteração de isDeleted em screenplays via '
+             'change stream, persistindo o resume token (requer replica set)'
+    )
 
     args = parser.parse_args()
 
@@ -346,6 +450,7 @@ def main():
         sys.exit(1)
 
     dry_run = args.dry_run or not args.execute
+    action = RESTORE if args.restore else DELETE
 
     try:
         # Conectar ao MongoDB
@@ -356,11 +461,28 @@ def main():
         else:
             logger.info("\n[EXECUTE] Modo de execucao - alteracoes serao aplicadas!\n")
 
-        # Executar cascade delete
-        stats = run_cascade_delete(db, dry_run=dry_run)
+        engine = CascadeEngine(
+            db,
+            exclude=("history",) if args.skip_history else (),
+            workers=args.workers
+        )
+        engine.ensure_indexes()
+
+        # Executar a cascata
+        if args.follow:
+            stats = follow_screenplay_changes(
+                engine, dry_run=dry_run, mode=args.mode, chunk_size=args.chunk_size
+            )
+        else:
+            stats = run_cascade(
+                engine, action=action, dry_run=dry_run, mode=args.mode,
+                chunk_size=args.chunk_size, resume=args.resume,
+                selection=screenplay_selection(args.screenplay_id),
+                sample_size=args.sample
+            )
 
         # Imprimir resumo
-        print_summary(stats, dry_run)
+        print_summary(stats, dry_run, action)
 
         if dry_run:
             logger.info("\nPara aplicar as alteracoes, execute com --execute")
@@ -5,6 +5,11 @@ Script to cleanup obsolete MongoDB collections
 Removes:
 - apscheduler_jobs (not used - scheduler uses in-memory jobstore)
 - councilor_executions (migrated to tasks collection with is_councilor_execution=True)
+
+Also registered as migration 20250110_02 in scripts/migrations.py, which runs
+after the councilor_executions migration and records the applied version:
+    python scripts/migrations.py plan
+    python scripts/migrations.py up --yes
 """
 
 import os
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+Runner de migrações de dados do conductor (MongoDB).
+
+Cada migração tem uma versão e uma lista de passos. As versões aplicadas ficam
+registradas em `schema_migrations` (com duração e estatísticas de cada passo),
+então uma migração só roda uma vez. Passos em lote percorrem a collection de
+origem por _id em lotes de --batch-size e gravam um checkpoint em
+`migration_checkpoints` após cada lote: uma execução interrompida continua do
+último _id confirmado na próxima chamada de `up`.
+
+O `plan` (dry run) estima o custo de cada passo pendente sem alterar dados:
+count_documents da origem (a partir do checkpoint), número de lotes e volume
+estimado a partir do tamanho BSON de uma amostra de documentos.
+
+Passos destrutivos (ex.: drop de collections) só rodam com --yes; não há
+prompts interativos.
+
+Migrações registradas:
+- 20250110_01 councilor_executions -> tasks (migrate_councilor_executions.py)
+- 20250110_02 remoção de collections obsoletas (cleanup_obsolete_collections.py)
+- 20250110_03 normalização do soft delete: datas em BSON date e isDeleted
+  sempre presente (boolean), mais os índices parciais *_live (isDeleted: false)
+
+Uso:
+    python migrations.py status
+    python migrations.py plan [--sample 20]
+    python migrations.py up [--to 20250110_01] [--batch-size 500] [--yes]
+"""
+
+import sys
+import math
+import time
+import logging
+import argparse
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import bson
+from pymongo import UpdateOne
+
+# migrate_councilor_executions.py fica na raiz do repositório
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import migrate_councilor_executions as councilor_migration  # noqa: E402
+from cleanup_obsolete_collections import OBSOLETE_COLLECTIONS  # noqa: E402
+from cascade_engine import ENTITIES, CASCADE_MARKER  # noqa: E402
+from create_mongodb_index import reconcile_indexes  # noqa: E402
+from mongo_connection import connect_to_mongodb, load_environment  # noqa: E402
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_COLLECTION = "schema_migrations"
+CHECKPOINT_COLLECTION = "migration_checkpoints"
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_SAMPLE_SIZE = 20
+
+
+@dataclass
+class Context:
+    """Estado compartilhado pelos passos de uma migração."""
+    db: object
+    dry_run: bool = False
+    batch_size: int = DEFAULT_BATCH_SIZE
+    state: dict = field(default_factory=dict)
+
+
+@dataclass
+class Step:
+    """
+    Passo de uma migração.
+
+    Passos em lote definem `source` (+ `query`) e `process_batch(ctx, docs)`,
+    que devolve um dict de contadores somados entre lotes. Passos simples
+    definem apenas `run(ctx)`.
+    """
+    name: str
+    run: Optional[Callable[[Context], Optional[dict]]] = None
+    source: Optional[str] = None
+    query: dict = field(default_factory=dict)
+    process_batch: Optional[Callable[[Context, list], dict]] = None
+    destructive: bool = False
+    # Estimativa de custo de passos sem `source` (ex.: collections que serão removidas)
+    estimate: Optional[Callable[[Context], dict]] = None
+
+    @property
+    def batched(self) -> bool:
+        return self.process_batch is not None
+
+
+@dataclass
+class Migration:
+    version: str
+    name: str
+    steps: List[Step]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def register(migration: Migration) -> Migration:
+    if any(m.version == migration.version for m in MIGRATIONS):
+        raise ValueError(f"Versão de migração duplicada: {migration.version}")
+    MIGRATIONS.append(migration)
+    MIGRATIONS.sort(key=lambda m: m.version)
+    return migration
+
+
+class MigrationRunner:
+    """Aplica, estima e lista migrações registradas."""
+
+    def __init__(self, db, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+        self.applied = db[MIGRATIONS_COLLECTION]
+        self.checkpoints = db[CHECKPOINT_COLLECTION]
+
+    def applied_versions(self) -> Dict[str, dict]:
+        return {doc["_id"]: doc for doc in self.applied.find()}
+
+    def pending(self, target: str = None) -> List[Migration]:
+        applied = self.applied_versions()
+        return [
+            m for m in MIGRATIONS
+            if m.version not in applied and (target is None or m.version <= target)
+        ]
+
+    @staticmethod
+    def checkpoint_id(migration: Migration, step: Step) -> str:
+        return f"{migration.version}:{step.name}"
+
+    def _step_query(self, migration: Migration, step: Step) -> dict:
+        """Query da origem, a partir do último _id confirmado no checkpoint."""
+        checkpoint = self.checkpoints.find_one({"_id": self.checkpoint_id(migration, step)})
+        if checkpoint and checkpoint.get("last_id") is not None:
+            return {"$and": [step.query, {"_id": {"$gt": checkpoint["last_id"]}}]}
+        return step.query
+
+    # ------------------------------------------------------------------
+    # Estimativa (dry run)
+    # ------------------------------------------------------------------
+
+    def estimate_step(self, migration: Migration, step: Step, sample_size: int) -> dict:
+        ctx = Context(self.db, dry_run=True, batch_size=self.batch_size)
+        if step.estimate:
+            return step.estimate(ctx)
+        if not step.source:
+            return {}
+
+        collection = self.db[step.source]
+        query = self._step_query(migration, step)
+        documents = collection.count_documents(query)
+        sample = list(collection.aggregate([{"$match": query}, {"$sample": {"size": sample_size}}]))
+        avg_size = sum(len(bson.encode(doc)) for doc in sample) / len(sample) if sample else 0
+        return {
+            "documents": documents,
+            "batches": math.ceil(documents / self.batch_size),
+            "avg_doc_bytes": round(avg_size),
+            "estimated_mb": round(documents * avg_size / 1024 / 1024, 2),
+        }
+
+    def plan(self, target: str = None, sample_size: int = DEFAULT_SAMPLE_SIZE) -> None:
+        pending = self.pending(target)
+        if not pending:
+            logger.info("Nenhuma migração pendente")
+            return
+        for migration in pending:
+            logger.info(f"[PLAN] {migration.version} {migration.name}")
+            for step in migration.steps:
+                started = time.monotonic()
+                estimate = self.estimate_step(migration, step, sample_size)
+                flags = " (destrutivo: requer --yes)" if step.destructive else ""
+                logger.info(f"   - {step.name}{flags}: {estimate or 'sem estimativa'} "
+                            f"[{time.monotonic() - started:.2f}s]")
+
+    # ------------------------------------------------------------------
+    # Execução
+    # ------------------------------------------------------------------
+
+    def _run_batched(self, ctx: Context, migration: Migration, step: Step) -> dict:
+        checkpoint_id = self.checkpoint_id(migration, step)
+        checkpoint = self.checkpoints.find_one({"_id": checkpoint_id}) or {}
+        stats = dict(checkpoint.get("stats", {}))
+
+        query = self._step_query(migration, step)
+        total = self.db[step.source].count_documents(query)
+        cursor = self.db[step.source].find(query).sort("_id", 1).batch_size(ctx.batch_size)
+
+        done = 0
+        started = time.monotonic()
+        for batch in councilor_migration.batches(cursor, ctx.batch_size):
+            for key, value in (step.process_batch(ctx, batch) or {}).items():
+                stats[key] = stats.get(key, 0) + value
+            done += len(batch)
+            self.checkpoints.update_one(
+                {"_id": checkpoint_id},
+                {"$set": {
+                    "last_id": batch[-1]["_id"],
+                    "stats": stats,
+                    "updated_at": datetime.now(timezone.utc),
+                }},
+                upsert=True
+            )
+            rate = done / max(time.monotonic() - started, 1e-6)
+            logger.info(f"      {step.name}: {done}/{total} ({rate:,.0f} docs/s)")
+        return stats
+
+    @staticmethod
+    def _check_destructive(migrations: List[Migration], confirm_destructive: bool) -> None:
+        blocked = [
+            f"{m.version}:{s.name}" for m in migrations for s in m.steps
+            if s.destructive and not confirm_destructive
+        ]
+        if blocked:
+            raise RuntimeError(
+                f"Passos destrutivos pendentes ({', '.join(blocked)}); "
+                "revise com `plan` e rode com --yes"
+            )
+
+    def apply(self, migration: Migration, confirm_destructive: bool = False) -> dict:
+        """
+        Aplica uma migração passo a passo e registra a versão ao final.
+
+        Raises:
+            RuntimeError: se um passo destrutivo não foi confirmado com --yes
+        """
+        self._check_destructive([migration], confirm_destructive)
+
+        logger.info(f"[UP] {migration.version} {migration.name}")
+        ctx = Context(self.db, batch_size=self.batch_size)
+        report = []
+        started = time.monotonic()
+
+        for step in migration.steps:
+            checkpoint_id = self.checkpoint_id(migration, step)
+            checkpoint = self.checkpoints.find_one({"_id": checkpoint_id})
+            if checkpoint and checkpoint.get("completed"):
+                logger.info(f"   - {step.name}: já concluído (checkpoint)")
+                report.append({"step": step.name, "skipped": True, **checkpoint.get("summary", {})})
+                continue
+
+            step_started = time.monotonic()
+            stats = self._run_batched(ctx, migration, step) if step.batched else (step.run(ctx) or {})
+            duration = time.monotonic() - step_started
+
+            summary = {"duration_s": round(duration, 3), "stats": stats}
+            self.checkpoints.update_one(
+                {"_id": checkpoint_id},
+                {"$set": {"completed": True, "summary": summary,
+                          "updated_at": datetime.now(timezone.utc)}},
+                upsert=True
+            )
+            report.append({"step": step.name, **summary})
+            logger.info(f"   - {step.name}: {duration:.2f}s {stats}")
+
+        record = {
+            "_id": migration.version,
+            "name": migration.name,
+            "applied_at": datetime.now(timezone.utc),
+            "duration_s": round(time.monotonic() - started, 3),
+            "steps": report,
+        }
+        self.applied.insert_one(record)
+        self.checkpoints.delete_many({"_id": {"$regex": f"^{migration.version}:"}})
+        logger.info(f"[UP] {migration.version} aplicada em {record['duration_s']:.2f}s")
+        return record
+
+    def up(self, target: str = None, confirm_destructive: bool = False) -> List[dict]:
+        pending = self.pending(target)
+        if not pending:
+            logger.info("Nenhuma migração pendente")
+        # Valida antes de aplicar a primeira, para não parar no meio da sequência
+        self._check_destructive(pending, confirm_destructive)
+        return [self.apply(m, confirm_destructive) for m in pending]
+
+    def status(self) -> None:
+        applied = self.applied_versions()
+        for migration in MIGRATIONS:
+            record = applied.get(migration.version)
+            if record:
+                logger.info(f"[x] {migration.version} {migration.name} "
+                            f"(aplicada em {record['applied_at']:%Y-%m-%d %H:%M}, "
+                            f"{record['duration_s']:.1f}s)")
+            else:
+                logger.info(f"[ ] {migration.version} {migration.name}")
+
+
+# ----------------------------------------------------------------------
+# Migrações registradas
+# ----------------------------------------------------------------------
+
+def _prepare_councilor_migration(ctx: Context) -> dict:
+    councilor_migration.create_indexes(ctx.db)
+    councilor_migration.ensure_migration_index(ctx.db)
+    return {}
+
+
+def _migrate_councilor_batch(ctx: Context, batch: list) -> dict:
+    if "adopt_legacy" not in ctx.state:
+        ctx.state["adopt_legacy"] = councilor_migration.has_unkeyed_migrations(ctx.db)
+    return councilor_migration.write_batch(ctx.db.tasks, batch, ctx.state["adopt_legacy"])
+
+
+def _backup_councilor_executions(ctx: Context) -> dict:
+    return {"backup_collection": councilor_migration.backup_collection(ctx.db)}
+
+
+register(Migration(
+    version="20250110_01",
+    name="councilor_executions -> tasks",
+    steps=[
+        Step("backup", run=_backup_councilor_executions),
+        Step("indexes", run=_prepare_councilor_migration),
+        Step("migrate", source="councilor_executions", process_batch=_migrate_councilor_batch),
+    ],
+))
+
+
+def _existing_obsolete(db) -> list:
+    existing = set(db.list_collection_names())
+    return [name for name in OBSOLETE_COLLECTIONS if name in existing]
+
+
+def _estimate_obsolete(ctx: Context) -> dict:
+    return {name: ctx.db[name].estimated_document_count() for name in _existing_obsolete(ctx.db)}
+
+
+def _drop_obsolete(ctx: Context) -> dict:
+    dropped = {}
+    for name in _existing_obsolete(ctx.db):
+        dropped[name] = ctx.db[name].estimated_document_count()
+        ctx.db[name].drop()
+    return {"dropped": dropped}
+
+
+register(Migration(
+    version="20250110_02",
+    name="remove collections obsoletas (apscheduler_jobs, councilor_executions)",
+    steps=[
+        Step("drop", run=_drop_obsolete, estimate=_estimate_obsolete, destructive=True),
+    ],
+))
+
+
+def parse_iso_date(value: str) -> Optional[datetime]:
+    """Data ISO 8601 em string (como a cascata gravava) -> datetime UTC, ou None."""
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def soft_delete_query(field: str) -> dict:
+    """Documentos com data de soft delete em string ou isDeleted ausente/não-boolean."""
+    return {"$or": [
+        {field: {"$type": "string"}},
+        {f"{CASCADE_MARKER}.deletedAt": {"$type": "string"}},
+        {"isDeleted": {"$not": {"$type": "bool"}}},
+    ]}
+
+
+def _soft_delete_step(name: str) -> Step:
+    """Passo em lote que normaliza o soft delete de `name` (campo de cascade_engine.ENTITIES)."""
+    field = ENTITIES[name].deleted_at_field
+    marker_field = f"{CASCADE_MARKER}.deletedAt"
+
+    def process_batch(ctx: Context, batch: list) -> dict:
+        operations = []
+        invalid = 0
+        for doc in batch:
+            changes = {}
+            dates = ((field, doc.get(field)),
+                     (marker_field, (doc.get(CASCADE_MARKER) or {}).get("deletedAt")))
+            for path, value in dates:
+                if isinstance(value, str):
+                    parsed = parse_iso_date(value)
+                    if parsed is None:
+                        invalid += 1
+                    else:
+                        changes[path] = parsed
+            if not isinstance(doc.get("isDeleted"), bool):
+                changes["isDeleted"] = doc.get("isDeleted") in (True, "true")
+            if changes:
+                operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+
+        if operations:
+            ctx.db[name].bulk_write(operations, ordered=False)
+        return {"normalized": len(operations), "invalid_dates": invalid}
+
+    return Step(f"normalize_{name}", source=name, query=soft_delete_query(field),
+                process_batch=process_batch)
+
+
+def _create_live_indexes(ctx: Context) -> dict:
+    healthy = reconcile_indexes(ctx.db, list(ENTITIES))
+    return {"indexes_in_sync": healthy}
+
+
+register(Migration(
+    version="20250110_03",
+    name="soft delete em BSON date + isDeleted boolean",
+    steps=[_soft_delete_step(name) for name in ENTITIES] + [
+        Step("live_indexes", run=_create_live_indexes),
+    ],
+))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Aplica migrações de dados versionadas do conductor"
+    )
+    parser.add_argument(
+        "command",
+        choices=("status", "plan", "up"),
+        help="status: lista migrações; plan: estima custo das pendentes (dry run); up: aplica"
+    )
+    parser.add_argument(
+        "--to",
+        type=str,
+        help="Aplicar/estimar apenas até esta versão (inclusive)"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Documentos por lote/checkpoint (padrão: %(default)s)"
+    )
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=DEFAULT_SAMPLE_SIZE,
+        help="Documentos amostrados por passo no plan (padrão: %(default)s)"
+    )
+    parser.add_argument(
+        "--yes",
+        action="store_true",
+        help="Confirma passos destrutivos (ex.: drop de collections)"
+    )
+
+    args = parser.parse_args()
+
+    try:
+        load_environment()
+        runner = MigrationRunner(connect_to_mongodb(), batch_size=args.batch_size)
+        if args.command == "status":
+            runner.status()
+        elif args.command == "plan":
+            runner.plan(args.to, args.sample)
+        else:
+            runner.up(args.to, confirm_destructive=args.yes)
+    except Exception as e:
+        logger.error(f"Erro durante execucao: {e}", exc_info=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
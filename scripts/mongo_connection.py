@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Conexão com o MongoDB compartilhada pelos scripts de manutenção.
+
+Importar este módulo não tem efeitos colaterais: o .env só é carregado por
+load_environment() e o logging fica a cargo de cada script.
+"""
+
+import os
+import logging
+from pathlib import Path
+
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# .env.centralized e .env ficam na raiz do repositório
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def load_environment() -> None:
+    """Carrega .env.centralized (ou .env) da raiz do repositório, senão o .env do diretório atual."""
+    for env_file in (REPO_ROOT / '.env.centralized', REPO_ROOT / '.env'):
+        if env_file.exists():
+            load_dotenv(env_file)
+            logger.info(f"Carregado: {env_file}")
+            return
+    load_dotenv()
+
+
+def connect_to_mongodb():
+    """Conecta ao MongoDB usando variáveis de ambiente."""
+    # Tenta diferentes nomes de variáveis usados no projeto
+    mongo_uri = (
+        os.getenv('MONGODB_URI') or
+        os.getenv('MONGO_URI') or
+        os.getenv('MONGO_URL') or
+        os.getenv('MONGODB_URL')
+    )
+
+    if not mongo_uri:
+        raise ValueError(
+            "Nenhuma URI do MongoDB encontrada. "
+            "Defina MONGODB_URI, MONGO_URI, MONGO_URL ou MONGODB_URL"
+        )
+
+    # Se rodando fora do Docker, substituir hostname do container por localhost
+    if 'primoia-shared-mongo' in mongo_uri:
+        mongo_uri_local = mongo_uri.replace('primoia-shared-mongo', 'localhost')
+        logger.info("Detectado hostname Docker, tentando localhost primeiro...")
+        try:
+            client = MongoClient(mongo_uri_local, serverSelectionTimeoutMS=3000)
+            client.admin.command('ping')
+            mongo_uri = mongo_uri_local
+        except Exception:
+            logger.info("localhost falhou, usando URI original (Docker)")
+
+    client = MongoClient(mongo_uri)
+
+    # Usar conductor_state como padrão (banco principal do projeto)
+    db_name = os.getenv('MONGO_DATABASE') or 'conductor_state'
+    db = client[db_name]
+    logger.info(f"Conectado ao MongoDB: {db_name}")
+    return db
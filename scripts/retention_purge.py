@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Retenção de dados soft-deletados: arquivamento + expurgo (ou índice TTL)
+
+Documentos com isDeleted=true há mais de N dias (campo de data de cada
+collection, o mesmo que a cascata grava - ver cascade_engine.ENTITIES) deixam
+de ocupar o working set. As políticas ficam em RETENTION_POLICIES e podem ser
+sobrescritas com --days collection=N.
+
+Modos (--mode):
+- archive: os documentos vencidos são lidos em lotes de --batch-size,
+  paginados por _id (_id > último do lote anterior), e cada lote é gravado e
+  sincronizado em disco (<arquivo>.pending) antes do delete_many pelos _id
+  exatos do lote (com o filtro de vencimento reaplicado: um documento
+  restaurado no meio tempo fica). Só os documentos que de fato saíram da
+  collection vão para <archive-dir>/<collection>/<collection>_<ts>.ndjson.gz
+  (Extended JSON canônico, um documento por linha), que é sincronizado antes
+  de o .pending ser apagado. Um .pending que sobrar após uma interrupção tem
+  os documentos do último lote. Entre lotes há uma pausa de --pause-ms para
+  não competir com a carga da aplicação. Ao final grava .sha256 e
+  .manifest.json (como o export de migrate_councilor_executions.py).
+  Para restaurar:
+      gunzip -k history_<ts>.ndjson.gz
+      mongoimport --db conductor_state --collection history --file history_<ts>.ndjson
+- ttl: cria (ou ajusta via collMod) o índice TTL <campo>_ttl, parcial em
+  isDeleted=true, ao lado do {campo: 1} esparso do manifesto, que nunca é
+  convertido. O próprio servidor remove os documentos, sem arquivo. Índices
+  com a mesma chave e filtros parciais diferentes exigem MongoDB 5.0+.
+  Índices TTL só expiram valores BSON date: collections que ainda têm datas
+  em string ISO são recusadas até serem normalizadas (migrations.py, 20250110_03).
+
+Datas em string ISO (o formato gravado até aqui) e BSON date são aceitas pelo
+modo archive: o corte é comparado nos dois tipos.
+
+Uso:
+    python retention_purge.py                       # dry run: contagens por collection
+    python retention_purge.py --execute --archive-dir ./archives
+    python retention_purge.py --execute --days history=7 --collection history
+    python retention_purge.py --execute --mode ttl
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import hashlib
+import logging
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from bson import json_util
+from pymongo.errors import OperationFailure
+
+from cascade_engine import ENTITIES
+from mongo_connection import connect_to_mongodb, load_environment
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Dias de retenção de documentos soft-deletados, por collection
+RETENTION_POLICIES = {
+    "history": 30,
+    "agent_instances": 90,
+    "conversations": 90,
+}
+MODES = ("archive", "ttl")
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_PAUSE_MS = 200
+DEFAULT_ARCHIVE_DIR = "./archives"
+
+
+def expired_filter(field: str, cutoff: datetime) -> dict:
+    """Soft-deletados antes de `cutoff`, com a data em BSON date ou string ISO."""
+    return {
+        "isDeleted": True,
+        "$or": [
+            {field: {"$lt": cutoff}},
+            {field: {"$lt": cutoff.isoformat()}},
+        ]
+    }
+
+
+def parse_days(values: list) -> dict:
+    """Converte ['history=7', ...] em {'history': 7}, validando as collections."""
+    days = dict(RETENTION_POLICIES)
+    for value in values or []:
+        name, _, number = value.partition("=")
+        if name not in RETENTION_POLICIES or not number.isdigit():
+            raise argparse.ArgumentTypeError(
+                f"--days espera collection=N com collection em {', '.join(RETENTION_POLICIES)}"
+            )
+        days[name] = int(number)
+    return days
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as archived:
+        for block in iter(lambda: archived.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_batch(out, batch: list) -> bytes:
+    """Grava os documentos em Extended JSON canônico, um por linha; devolve as linhas gravadas."""
+    lines = b"".join(
+        (json_util.dumps(doc, json_options=json_util.CANONICAL_JSON_OPTIONS) + "\n").encode("utf-8")
+        for doc in batch
+    )
+    out.write(lines)
+    return lines
+
+
+def _fsync(raw) -> None:
+    raw.flush()
+    os.fsync(raw.fileno())
+
+
+def archive_and_purge(db, name: str, days: int, archive_dir: str, batch_size: int,
+                      pause_ms: int, dry_run: bool) -> int:
+    """Arquiva e remove em lotes os documentos vencidos de `name`. Retorna o total removido."""
+    field = ENTITIES[name].deleted_at_field
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    query = expired_filter(field, cutoff)
+    collection = db[name]
+
+    if dry_run:
+        total = collection.count_documents(query)
+        logger.info(f"[DRY RUN] {name}: {total} documentos com {field} < {cutoff:%Y-%m-%d} "
+                    f"seriam arquivados e removidos")
+        return total
+
+    folder = os.path.join(archive_dir, name)
+    os.makedirs(folder, exist_ok=True)
+    filename = f"{name}_{datetime.utcnow():%Y%m%d_%H%M%S}.ndjson.gz"
+    path = os.path.join(folder, filename)
+    pending_path = path[:-len(".gz")] + ".pending"
+
+    archived = removed = 0
+    last_id = None
+    content_hash = hashlib.sha256()
+    started = time.monotonic()
+    with open(path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as out:
+        while True:
+            # Paginação por _id: cada lote continua de onde o anterior parou
+            page = query if last_id is None else {"$and": [query, {"_id": {"$gt": last_id}}]}
+            batch = list(collection.find(page).sort("_id", 1).limit(batch_size))
+            if not batch:
+                break
+            last_id = batch[-1]["_id"]
+            ids = [doc["_id"] for doc in batch]
+
+            # O lote vai para disco antes do delete; se o processo cair entre o
+            # delete e o arquivo final, os documentos ficam em <arquivo>.pending
+            with open(pending_path, "wb") as pending:
+                _write_batch(pending, batch)
+                _fsync(pending)
+
+            # Os _id exatos do lote, reaplicando o filtro: um documento restaurado
+            # nesse meio tempo não é removido
+            removed += collection.delete_many({"$and": [query, {"_id": {"$in": ids}}]}).deleted_count
+
+            # Só entram no arquivo os documentos que de fato saíram da collection
+            remaining = {doc["_id"] for doc in collection.find({"_id": {"$in": ids}}, {"_id": 1})}
+            deleted = [doc for doc in batch if doc["_id"] not in remaining]
+            if remaining:
+                logger.info(f"  {name}: {len(remaining)} documentos restaurados durante o expurgo "
+                            f"foram mantidos")
+            content_hash.update(_write_batch(out, deleted))
+            out.flush()
+            _fsync(raw)
+            os.remove(pending_path)
+            archived += len(deleted)
+
+            rate = removed / max(time.monotonic() - started, 1e-6)
+            logger.info(f"  {name}: {removed} removidos ({rate:,.0f} docs/s)")
+            time.sleep(pause_ms / 1000)
+
+    if not archived:
+        os.remove(path)
+        logger.info(f"{name}: nenhum documento com {field} < {cutoff:%Y-%m-%d}")
+        return 0
+
+    manifest = {
+        "collection": name,
+        "database": db.name,
+        "format": "ndjson",
+        "documents": archived,
+        "removed": removed,
+        "cutoff": cutoff.isoformat(),
+        "file": filename,
+        "sha256": _sha256(path),
+        "content_sha256": content_hash.hexdigest(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    with open(path + ".sha256", "w") as checksum_file:
+        checksum_file.write(f"{manifest['sha256']}  {filename}\n")
+    with open(path + ".manifest.json", "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+
+    logger.info(f"{name}: {archived} documentos arquivados em {path}, {removed} removidos")
+    return removed
+
+
+def apply_ttl(db, name: str, days: int, dry_run: bool) -> bool:
+    """Cria (ou ajusta) o índice TTL parcial <campo>_ttl de `name`."""
+    field = ENTITIES[name].deleted_at_field
+    collection = db[name]
+    seconds = days * 24 * 3600
+
+    strings = collection.count_documents({field: {"$type": "string"}})
+    if strings:
+        logger.error(
+            f"{name}: {strings} documentos com {field} em string ISO não expiram por TTL; "
+            f"normalize as datas (python migrations.py up, migração 20250110_03) "
+            f"antes de usar --mode ttl"
+        )
+        return False
+
+    # Índice TTL próprio e parcial em isDeleted=true: o {campo: 1} esparso do
+    # manifesto não é convertido, ou um documento restaurado fora da cascata
+    # que ainda carrega a data também expiraria
+    index_name = f"{field}_ttl"
+    indexes = collection.index_information()
+    converted = [name for name, index in indexes.items()
+                 if "expireAfterSeconds" in index and "partialFilterExpression" not in index]
+    if converted:
+        logger.warning(
+            f"{name}: índice(s) {', '.join(converted)} expiram documentos mesmo com isDeleted=false; "
+            f"remova o expireAfterSeconds (collMod) ou recrie-os sem TTL"
+        )
+
+    existing = indexes.get(index_name)
+    if dry_run:
+        action = f"collMod em {index_name}" if existing else f"criação do índice TTL {index_name}"
+        logger.info(f"[DRY RUN] {name}: {action} com {field} expirando após {days} dias")
+        return True
+
+    if existing:
+        db.command("collMod", name, index={"name": index_name, "expireAfterSeconds": seconds})
+        logger.info(f"{name}: índice {index_name} agora expira após {days} dias")
+    else:
+        collection.create_index(
+            [(field, 1)],
+            name=index_name,
+            expireAfterSeconds=seconds,
+            partialFilterExpression={"isDeleted": True}
+        )
+        logger.info(f"{name}: índice TTL {index_name} criado ({days} dias)")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Arquiva e remove documentos soft-deletados além do período de retenção"
+    )
+    parser.add_argument(
+        "--execute",
+        action="store_true",
+        help="Executa de fato (o padrão é dry run)"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=MODES,
+        default="archive",
+        help="archive: arquiva em disco e remove em lotes; ttl: índice TTL (padrão: %(default)s)"
+    )
+    parser.add_argument(
+        "--collection",
+        action="append",
+        choices=sorted(RETENTION_POLICIES),
+        help="Restringe a esta collection (repetível; padrão: todas as políticas)"
+    )
+    parser.add_argument(
+        "--days",
+        action="append",
+        metavar="COLLECTION=N",
+        help="Sobrescreve a retenção de uma collection (ex.: history=7)"
+    )
+    parser.add_argument(
+        "--archive-dir",
+        default=DEFAULT_ARCHIVE_DIR,
+        help="Diretório dos arquivos .ndjson.gz (padrão: %(default)s)"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Documentos por lote de arquivamento/delete (padrão: %(default)s)"
+    )
+    parser.add_argument(
+        "--pause-ms",
+        type=int,
+        default=DEFAULT_PAUSE_MS,
+        help="Pausa entre lotes, em ms (padrão: %(default)s)"
+    )
+
+    args = parser.parse_args()
+    dry_run = not args.execute
+
+    try:
+        days = parse_days(args.days)
+        load_environment()
+        db = connect_to_mongodb()
+        failed = False
+
+        for name in args.collection or RETENTION_POLICIES:
+            if args.mode == "ttl":
+                failed |= not apply_ttl(db, name, days[name], dry_run)
+            else:
+                archive_and_purge(db, name, days[name], args.archive_dir,
+                                  args.batch_size, args.pause_ms, dry_run)
+    except (argparse.ArgumentTypeError, OperationFailure) as e:
+        logger.error(str(e))
+        sys.exit(1)
+    except Exception as e:
+        logger.error(f"Erro durante execucao: {e}", exc_info=True)
+        sys.exit(1)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Reescrita unificada dos docker-compose.centralized.yml com MCP sidecar.
+
+Substitui add_mcp_host_port.py, add_mcp_name.py e update_mcp_registry_url.py:
+percorre a árvore uma única vez e aplica um conjunto declarado de regras de
+variáveis de ambiente (MCP_HOST_PORT, MCP_NAME, MCP_REGISTRY_URL, ...) a cada
+serviço sidecar, com uma única leitura/modificação/escrita por arquivo.
+
+O serviço e o seu `environment` são localizados pela árvore de nós YAML
+(services.<nome>.environment), não por heurísticas de texto; as novas
+entradas são inseridas na posição exata, no formato já usado pelo serviço
+(lista `- KEY=val` ou mapa `KEY: val`), preservando comentários e formatação.
+
+Arquivos são processados em paralelo e gravados de forma atômica (arquivo
+temporário + rename). Se o arquivo mudar entre a leitura e a escrita, a
+alteração é descartada em vez de sobrescrever a edição concorrente.
+
+Uso:
+    python rewrite_mcp_compose.py [--dry-run]                    # Todas as regras
+    python rewrite_mcp_compose.py --rules MCP_NAME,MCP_HOST_PORT  # Apenas algumas
+    python rewrite_mcp_compose.py --list-rules                   # Regras disponíveis
+"""
+
+import os
+import sys
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+# Base path do Primoia
+BASE_PATH = Path("/mnt/ramdisk/primoia-main/primoia")
+
+COMPOSE_FILENAME = "docker-compose.centralized.yml"
+
+MCP_REGISTRY_URL_VALUE = "${MCP_REGISTRY_URL:-http://community-conductor-bff:8080}"
+
+# libyaml quando disponível: a composição dos nós domina o custo por arquivo
+COMPOSE_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class ServiceNode:
+    """
+    Um serviço de `services:` localizado na árvore de nós YAML.
+
+    Os nós vêm de yaml.compose (libyaml quando disponível) e carregam a
+    posição exata (linha/coluna) no arquivo. As edições são inserções de
+    linhas nessas posições, então comentários e formatação do restante do
+    arquivo ficam intactos.
+    """
+
+    def __init__(self, name: str, key_node: yaml.Node, node: yaml.Node):
+        self.name = name
+        self.key_node = key_node
+        self.node = node
+        self.fields: Dict[str, yaml.Node] = {}
+        if isinstance(node, yaml.MappingNode):
+            self.fields = {k.value: v for k, v in node.value if isinstance(k, yaml.ScalarNode)}
+
+    def field_value(self, key: str) -> Optional[str]:
+        """Valor escalar de uma chave direta do serviço (ex: image, container_name)."""
+        node = self.fields.get(key)
+        return node.value if isinstance(node, yaml.ScalarNode) and node.value else None
+
+    def host_port(self) -> Optional[str]:
+        """Porta host do primeiro mapeamento de ports (ex: 13145:9000 -> 13145)."""
+        ports = self.fields.get("ports")
+        if not isinstance(ports, yaml.SequenceNode):
+            return None
+        for item in ports.value:
+            if isinstance(item, yaml.ScalarNode):
+                parts = item.value.split("/")[0].split(":")
+                if len(parts) >= 2 and parts[-2].isdigit():
+                    return parts[-2]
+            elif isinstance(item, yaml.MappingNode):
+                published = {k.value: v.value for k, v in item.value if isinstance(v, yaml.ScalarNode)}
+                if str(published.get("published", "")).isdigit():
+                    return str(published["published"])
+        return None
+
+    def environment_keys(self) -> set:
+        """Chaves já presentes no environment (formato lista ou mapa, incluindo merges `<<`)."""
+        return _env_keys(self.fields.get("environment"))
+
+    def is_mcp_sidecar(self) -> bool:
+        image = self.field_value("image") or ""
+        return (
+            "mcp-sidecar" in image.lower()
+            or self.name.endswith("-mcp")
+            or "MCP_NAME" in self.environment_keys()
+        )
+
+
+def _env_keys(node: Optional[yaml.Node]) -> set:
+    keys = set()
+    if isinstance(node, yaml.SequenceNode):
+        for item in node.value:
+            if isinstance(item, yaml.ScalarNode):
+                keys.add(item.value.split("=", 1)[0].strip())
+    elif isinstance(node, yaml.MappingNode):
+        for key_node, value_node in node.value:
+            if key_node.tag == "tag:yaml.org,2002:merge":
+                merged = value_node.value if isinstance(value_node, yaml.SequenceNode) else [value_node]
+                for merged_node in merged:
+                    keys |= _env_keys(merged_node)
+            elif isinstance(key_node, yaml.ScalarNode):
+                keys.add(key_node.value)
+    return keys
+
+
+@dataclass
+class EnvRule:
+    """
+    Regra declarativa: garante `key` no environment de cada sidecar.
+
+    `value` recebe o ServiceNode e devolve o valor a inserir, ou None quando
+    não é possível derivá-lo (a regra é então ignorada para aquele serviço).
+    """
+    key: str
+    value: Callable[[ServiceNode], Optional[str]]
+    description: str = ""
+
+
+def _derive_mcp_name(service: ServiceNode) -> Optional[str]:
+    container = service.field_value("container_name") or service.name
+    return container.replace("-mcp", "").replace("_", "-")
+
+
+# Regras disponíveis, na ordem em que são inseridas no environment.
+# Novas variáveis entram aqui, sem um novo script.
+RULES: Dict[str, EnvRule] = {
+    rule.key: rule for rule in [
+        EnvRule("MCP_NAME", _derive_mcp_name,
+                "Derivado do container_name/nome do serviço sem o sufixo -mcp"),
+        EnvRule("MCP_HOST_PORT", lambda service: service.host_port(),
+                "Porta host do mapeamento de ports do sidecar"),
+        EnvRule("MCP_REGISTRY_URL", lambda service: MCP_REGISTRY_URL_VALUE,
+                "URL do registry (BFF do conductor)"),
+    ]
+}
+
+
+@dataclass
+class FileResult:
+    path: Path
+    added: Dict[str, List[str]] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+def find_services(content: str) -> List[ServiceNode]:
+    """Localiza os serviços sob a chave `services:` de nível raiz."""
+    root = yaml.compose(content, Loader=COMPOSE_LOADER)
+    if not isinstance(root, yaml.MappingNode):
+        return []
+    for key_node, value_node in root.value:
+        if isinstance(key_node, yaml.ScalarNode) and key_node.value == "services":
+            if isinstance(value_node, yaml.MappingNode):
+                return [ServiceNode(str(k.value), k, v) for k, v in value_node.value]
+    return []
+
+
+def _insertion_line(node: yaml.Node) -> int:
+    """Primeira linha após o conteúdo de um nó (antes de comentários finais)."""
+    # O end_mark de coleções em bloco aponta para o próximo token (pode ser o
+    # serviço seguinte); desce até o último escalar/coleção flow do nó.
+    while isinstance(node, (yaml.SequenceNode, yaml.MappingNode)) and not node.flow_style and node.value:
+        node = node.value[-1] if isinstance(node, yaml.SequenceNode) else node.value[-1][1]
+    end = node.end_mark
+    return end.line + 1 if end.column > 0 else end.line
+
+
+def _line_indent(line: str) -> int:
+    return len(line) - len(line.lstrip())
+
+
+def _format_entry(key: str, value: str, fmt: str) -> str:
+    if fmt == "list":
+        return f"{key}={value}"
+    quote = '"' if "'" in value else "'"
+    return f"{key}: {quote}{value}{quote}"
+
+
+def _needs_flow_quotes(item: str) -> bool:
+    """Itens com indicadores de flow (`,[]{}#` ou `: `) precisam de aspas dentro de [...]/{...}."""
+    return any(c in item for c in ",[]{}#") or ": " in item
+
+
+def _plan_environment_edit(lines: List[str], service: ServiceNode,
+                           entries: List[Tuple[str, str]]) -> Tuple[int, List[str], Optional[Tuple]]:
+    """
+    Planeja a inserção das entradas no environment do serviço.
+
+    Returns:
+        (linha de inserção, linhas novas, edição inline) onde a edição inline
+        (linha, coluna, texto) é usada no lugar das linhas para environment
+        em flow style (`[...]` / `{...}`).
+    """
+    env = service.fields.get("environment")
+
+    if isinstance(env, (yaml.SequenceNode, yaml.MappingNode)) and (env.value or env.flow_style):
+        fmt = "list" if isinstance(env, yaml.SequenceNode) else "map"
+        items = [_format_entry(k, v, fmt) for k, v in entries]
+
+        if env.flow_style:
+            # environment: [A=1] -> [A=1, NOVO=x]; o fechamento fica em end_mark - 1
+            if fmt == "list":
+                items = [f'"{item}"' if _needs_flow_quotes(item) else item for item in items]
+            text = ", ".join(items)
+            text = f", {text}" if env.value else text
+            return 0, [], (env.end_mark.line, env.end_mark.column - 1, text)
+
+        first = env.value[0] if fmt == "list" else env.value[0][0]
+        first_line = lines[first.start_mark.line]
+        if fmt == "list":
+            # Coluna do "-" que precede o primeiro item
+            prefix = first_line[:first.start_mark.column].rstrip()
+            indent = len(prefix) - 1
+            new_lines = [f"{' ' * indent}- {item}" for item in items]
+        else:
+            indent = first.start_mark.column
+            new_lines = [f"{' ' * indent}{item}" for item in items]
+
+        last = env.value[-1] if fmt == "list" else env.value[-1][1]
+        return _insertion_line(last), new_lines, None
+
+    # Sem environment (ou vazio): cria a chave em formato lista
+    if isinstance(service.node, yaml.MappingNode) and service.node.value:
+        key_indent = service.node.value[0][0].start_mark.column
+    else:
+        key_indent = service.key_node.start_mark.column + 2
+    new_lines = [f"{' ' * (key_indent + 2)}- {_format_entry(k, v, 'list')}" for k, v in entries]
+
+    if env is not None:
+        # `environment:` vazio: entradas logo abaixo da chave
+        env_key = next(k for k, v in service.node.value if v is env)
+        return env_key.start_mark.line + 1, new_lines, None
+
+    last_value = service.node.value[-1][1] if service.node.value else service.key_node
+    return _insertion_line(last_value), [f"{' ' * key_indent}environment:"] + new_lines, None
+
+
+def rewrite_content(content: str, rules: List[EnvRule]) -> Tuple[str, Dict[str, List[str]]]:
+    """
+    Aplica as regras a todos os sidecars de um compose file.
+
+    Returns:
+        (novo conteúdo, {serviço: [chaves adicionadas]})
+    """
+    lines = content.split("\n")
+    added: Dict[str, List[str]] = {}
+    edits = []
+
+    for service in find_services(content):
+        if not service.is_mcp_sidecar():
+            continue
+
+        existing = service.environment_keys()
+        new_entries = []
+        for rule in rules:
+            if rule.key in existing:
+                continue
+            value = rule.value(service)
+            if value is not None:
+                new_entries.append((rule.key, value))
+
+        if not new_entries:
+            continue
+
+        edits.append(_plan_environment_edit(lines, service, new_entries))
+        added[service.name] = [k for k, _ in new_entries]
+
+    # De baixo para cima, para que inserções não desloquem as posições seguintes
+    for insert_at, new_lines, inline in sorted(edits, key=lambda e: e[2][:2] if e[2] else (e[0], 0),
+                                               reverse=True):
+        if inline:
+            line_no, column, text = inline
+            lines[line_no] = lines[line_no][:column] + text + lines[line_no][column:]
+        else:
+            lines[insert_at:insert_at] = new_lines
+
+    return "\n".join(lines), added
+
+
+def atomic_write(path: Path, content: str, expected_mtime_ns: int) -> None:
+    """
+    Grava via arquivo temporário + rename, preservando permissões.
+
+    Raises:
+        RuntimeError: se o arquivo foi modificado desde a leitura
+    """
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "w") as f:
+            f.write(content)
+        os.chmod(tmp_path, path.stat().st_mode & 0o7777)
+        if path.stat().st_mtime_ns != expected_mtime_ns:
+            raise RuntimeError("arquivo modificado durante a reescrita; tente novamente")
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def process_file(path: Path, rules: List[EnvRule], dry_run: bool = False) -> FileResult:
+    """Lê, aplica as regras e grava (uma vez) um compose file."""
+    result = FileResult(path)
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+        content = path.read_text()
+
+        # Atalho barato: arquivo sem nenhum indício de sidecar MCP
+        if "mcp" not in content.lower():
+            return result
+
+        new_content, result.added = rewrite_content(content, rules)
+        if result.added and not dry_run:
+            atomic_write(path, new_content, mtime_ns)
+    except Exception as e:
+        result.error = str(e)
+    return result
+
+
+def rewrite_tree(base_path: Path, rules: List[EnvRule], dry_run: bool = False,
+                 workers: Optional[int] = None) -> List[FileResult]:
+    """Percorre a árvore uma vez e processa os compose files em paralelo."""
+    files = sorted(base_path.rglob(COMPOSE_FILENAME))
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 4)) as pool:
+        return list(pool.map(lambda f: process_file(f, rules, dry_run), files))
+
+
+def select_rules(names: Optional[str]) -> List[EnvRule]:
+    if not names:
+        return list(RULES.values())
+    selected = [n.strip() for n in names.split(",") if n.strip()]
+    unknown = [n for n in selected if n not in RULES]
+    if unknown:
+        raise SystemExit(f"Regras desconhecidas: {', '.join(unknown)} (disponíveis: {', '.join(RULES)})")
+    # Mantém a ordem declarada em RULES
+    return [rule for key, rule in RULES.items() if key in selected]
+
+
+def run_cli(default_rules: Optional[str] = None, description: Optional[str] = None) -> None:
+    """CLI compartilhada (também usada pelos scripts legados como wrappers)."""
+    parser = argparse.ArgumentParser(
+        description=description or "Aplica regras de environment aos MCP sidecars dos docker-compose"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Apenas mostra o que seria feito, sem modificar arquivos"
+    )
+    parser.add_argument(
+        "--path",
+        type=str,
+        default=str(BASE_PATH),
+        help=f"Caminho base para buscar (default: {BASE_PATH})"
+    )
+    parser.add_argument(
+        "--rules",
+        type=str,
+        default=default_rules,
+        help=f"Regras a aplicar, separadas por vírgula (default: todas: {','.join(RULES)})"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Número de arquivos processados em paralelo"
+    )
+    parser.add_argument(
+        "--list-rules",
+        action="store_true",
+        help="Lista as regras disponíveis"
+    )
+
+    args = parser.parse_args()
+
+    if args.list_rules:
+        for rule in RULES.values():
+            print(f"  {rule.key:<20} {rule.description}")
+        return
+
+    base_path = Path(args.path)
+    if not base_path.exists():
+        print(f"Erro: Caminho não existe: {base_path}")
+        sys.exit(1)
+
+    rules = select_rules(args.rules)
+
+    print(f"{'[DRY-RUN] ' if args.dry_run else ''}Aplicando {', '.join(r.key for r in rules)} "
+          f"em {base_path}...")
+    print()
+
+    results = rewrite_tree(base_path, rules, dry_run=args.dry_run, workers=args.workers)
+
+    updated_count = 0
+    error_count = 0
+    for result in results:
+        relative_path = result.path.relative_to(base_path)
+        if result.error:
+            print(f"  [ERROR]  {relative_path}")
+            print(f"           {result.error}")
+            error_count += 1
+        elif result.added:
+            print(f"  [UPDATE] {relative_path}")
+            for service, keys in result.added.items():
+                print(f"           {service}: {'would add' if args.dry_run else 'added'} {', '.join(keys)}")
+            updated_count += 1
+
+    print()
+    print("=" * 60)
+    print("Resumo:")
+    print(f"  Atualizados: {updated_count}")
+    print(f"  Sem mudança: {len(results) - updated_count - error_count}")
+    print(f"  Erros:       {error_count}")
+    print(f"  Total:       {len(results)}")
+    print("=" * 60)
+
+    if args.dry_run and updated_count > 0:
+        print()
+        print("Execute sem --dry-run para aplicar as mudanças.")
+
+
+if __name__ == "__main__":
+    run_cli()
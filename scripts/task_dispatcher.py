@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Despacho de tasks pendentes para o watcher: change stream com fallback para polling
+
+O claude-mongo-watcher.py consultava `tasks` a cada --poll-interval (1s por
+padrão): até um segundo de latência por task e queries constantes com o
+sistema ocioso. TaskDispatcher.tasks() entrega as tasks com status "pending"
+assim que elas aparecem:
+
+- stream: change stream em `tasks` (inserts/updates que deixam a task como
+  pending). O resume token fica em `task_dispatcher_state`, então um restart
+  continua de onde parou. Ao abrir o stream, as tasks pending já existentes
+  são entregues primeiro (catch-up), para não perder as criadas com o
+  watcher parado.
+- poll: consulta {status: "pending"} (índice status_1_created_at_1) com backoff
+  adaptativo: o intervalo começa em poll_min, dobra a cada consulta vazia até
+  poll_max e volta ao mínimo quando chega uma task.
+- auto (padrão): stream; se o servidor não suportar change streams (mongod
+  standalone), cai para poll.
+
+A mesma task pode ser entregue mais de uma vez (catch-up + evento, ou polls
+seguidos): o consumidor deve reivindicá-la atomicamente (ex.: o
+mark_as_processing do watcher, um update condicionado a status "pending").
+
+O claude-mongo-watcher.py (submódulo conductor/conductor) ainda faz o próprio
+polling; run-watcher.sh ganha a opção de modo quando o watcher adotar o
+despacho, que é assim:
+
+    from task_dispatcher import TaskDispatcher
+    dispatcher = TaskDispatcher(db.tasks, mode="auto", poll_max=poll_interval)
+    for task in dispatcher.tasks():
+        process_request(task)
+
+Até lá, `python task_dispatcher.py` acompanha o despacho sem processar as tasks.
+
+Teste local com replica set de um nó:
+
+    docker run -d --name mongo-rs -p 27017:27017 mongo:7 --replSet rs0
+    docker exec mongo-rs mongosh --quiet --eval 'rs.initiate()'
+    python task_dispatcher.py --mongo-uri 'mongodb://localhost:27017/?directConnection=true'
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+from datetime import datetime
+from typing import Iterator
+
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+MODES = ("auto", "stream", "poll")
+PENDING = "pending"
+DISPATCHER_STATE_COLLECTION = "task_dispatcher_state"
+DEFAULT_POLL_MIN = 0.05
+DEFAULT_POLL_MAX = 1.0
+DEFAULT_MAX_AWAIT_MS = 1000
+POLL_BATCH_SIZE = 100
+TOKEN_SAVE_INTERVAL = 5.0  # segundos entre gravações do token com o stream ocioso
+
+# Códigos de erro do servidor tratados no modo stream
+CHANGE_STREAM_NOT_SUPPORTED = 40573  # mongod standalone
+CHANGE_STREAM_HISTORY_LOST = (260, 280, 286)  # token inválido / fora do oplog
+
+
+def pending_changes_pipeline():
+    """Filtro do change stream: tasks inseridas ou atualizadas para status pending."""
+    return [
+        {"$match": {
+            "$or": [
+                {"operationType": {"$in": ["insert", "replace"]}, "fullDocument.status": PENDING},
+                {"operationType": "update", "updateDescription.updatedFields.status": PENDING},
+            ]
+        }},
+    ]
+
+
+class TaskDispatcher:
+    """Entrega tasks pending de uma collection, via change stream ou polling adaptativo."""
+
+    def __init__(self, collection, mode: str = "auto", poll_min: float = DEFAULT_POLL_MIN,
+                 poll_max: float = DEFAULT_POLL_MAX, max_await_ms: int = DEFAULT_MAX_AWAIT_MS):
+        if mode not in MODES:
+            raise ValueError(f"Modo inválido: {mode} (use {', '.join(MODES)})")
+        self.collection = collection
+        self.mode = mode
+        self.poll_min = poll_min
+        self.poll_max = max(poll_max, poll_min)
+        self.max_await_ms = max_await_ms
+        self.state = collection.database[DISPATCHER_STATE_COLLECTION]
+        self.state_id = f"{collection.name}_change_stream"
+
+    def pending(self, limit: int = POLL_BATCH_SIZE):
+        """Cursor das tasks pending, mais antigas primeiro (limit=0: todas)."""
+        return self.collection.find({"status": PENDING}).sort("created_at", 1).limit(limit)
+
+    def load_resume_token(self):
+        state = self.state.find_one({"_id": self.state_id})
+        return state.get("resume_token") if state else None
+
+    def save_resume_token(self, token) -> None:
+        self.state.update_one(
+            {"_id": self.state_id},
+            {"$set": {"resume_token": token, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    def clear_resume_token(self) -> None:
+        self.state.delete_one({"_id": self.state_id})
+
+    def tasks(self) -> Iterator[dict]:
+        """Gera as tasks pending indefinidamente, no modo configurado."""
+        if self.mode == "poll":
+            yield from self.poll()
+            return
+        try:
+            yield from self.stream()
+        except OperationFailure as e:
+            if e.code != CHANGE_STREAM_NOT_SUPPORTED or self.mode == "stream":
+                raise
+            logger.warning("Change streams indisponíveis (mongod standalone); "
+                           "usando polling com backoff adaptativo")
+            yield from self.poll()
+
+    def stream(self) -> Iterator[dict]:
+        """Tasks pending a partir do change stream (com catch-up ao abrir)."""
+        resume_token = self.load_resume_token()
+
+        while True:
+            try:
+                with self.collection.watch(
+                    pending_changes_pipeline(),
+                    full_document="updateLookup",
+                    resume_after=resume_token,
+                    max_await_time_ms=self.max_await_ms
+                ) as stream:
+                    logger.info(f"Change stream aberto em {self.collection.name} "
+                                f"({'retomando do token salvo' if resume_token else 'sem token salvo'})")
+                    # Aberto antes do catch-up: nada criado nesse intervalo se perde
+                    yield from self.pending(limit=0)
+
+                    saved_token = resume_token
+                    last_save = time.monotonic()
+                    while stream.alive:
+                        change = stream.try_next()
+                        task = change.get("fullDocument") if change else None
+                        if task is not None and task.get("status") == PENDING:
+                            yield task
+
+                        resume_token = stream.resume_token
+                        if resume_token == saved_token:
+                            continue
+                        if change is not None or time.monotonic() - last_save >= TOKEN_SAVE_INTERVAL:
+                            self.save_resume_token(resume_token)
+                            saved_token = resume_token
+                            last_save = time.monotonic()
+
+            except OperationFailure as e:
+                if e.code not in CHANGE_STREAM_HISTORY_LOST or resume_token is None:
+                    raise
+                logger.warning(f"Resume token não é mais válido ({e.code}); "
+                               "reabrindo o stream com catch-up das tasks pending")
+                resume_token = None
+                self.clear_resume_token()
+
+    def poll(self) -> Iterator[dict]:
+        """Tasks pending por polling, com intervalo adaptativo entre poll_min e poll_max."""
+        interval = self.poll_min
+        while True:
+            dispatched = 0
+            for task in self.pending():
+                dispatched += 1
+                yield task
+            if dispatched:
+                # Volta ao mínimo (a pausa evita girar em falso se ninguém reivindicar as tasks)
+                interval = self.poll_min
+                time.sleep(self.poll_min)
+                continue
+            time.sleep(interval)
+            interval = min(interval * 2, self.poll_max)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Acompanha as tasks pending (change stream ou polling) e mostra o despacho"
+    )
+    parser.add_argument(
+        "--mongo-uri",
+        default=os.getenv("MONGO_URI", "mongodb://localhost:27017"),
+        help="URI do MongoDB (padrão: $MONGO_URI ou localhost)"
+    )
+    parser.add_argument(
+        "--database",
+        default=os.getenv("MONGO_DATABASE", "conductor_state"),
+        help="Database (padrão: %(default)s)"
+    )
+    parser.add_argument(
+        "--collection",
+        default="tasks",
+        help="Collection de tasks (padrão: %(default)s)"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=MODES,
+        default=os.getenv("WATCH_MODE", "auto"),
+        help="auto: stream com fallback para poll (padrão: %(default)s)"
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_MAX,
+        help="Intervalo máximo do polling adaptativo, em segundos (padrão: %(default)s)"
+    )
+
+    args = parser.parse_args()
+
+    try:
+        client = MongoClient(args.mongo_uri, serverSelectionTimeoutMS=5000)
+        client.admin.command("ping")
+        dispatcher = TaskDispatcher(client[args.database][args.collection],
+                                    mode=args.mode, poll_max=args.poll_interval)
+        for task in dispatcher.tasks():
+            created_at = task.get("created_at")
+            latency = ""
+            if isinstance(created_at, datetime):
+                latency = f" ({(datetime.utcnow() - created_at).total_seconds() * 1000:.0f} ms após created_at)"
+            logger.info(f"Task pending {task['_id']} agent={task.get('agent_id')}{latency}")
+    except KeyboardInterrupt:
+        logger.info("Encerrado")
+    except Exception as e:
+        logger.error(f"Erro durante execucao: {e}", exc_info=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
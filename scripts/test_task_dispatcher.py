@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Testes do TaskDispatcher: backoff do polling e persistência do resume token.
+
+Usam mongomock para as collections; o change stream é um stub (mongomock não
+implementa watch) e o time.sleep do módulo é substituído para registrar as
+pausas sem esperar.
+
+Uso:
+    python -m pytest scripts/test_task_dispatcher.py -q
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import pytest
+from pymongo.errors import OperationFailure
+
+mongomock = pytest.importorskip("mongomock")
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import task_dispatcher  # noqa: E402
+from task_dispatcher import TaskDispatcher  # noqa: E402
+
+
+class StopDispatch(Exception):
+    """Interrompe o gerador infinito do dispatcher dentro do teste."""
+
+
+class StubChangeStream:
+    """Change stream com eventos pré-definidos; o resume token avança a cada try_next."""
+
+    def __init__(self, events):
+        self.events = list(events)
+        self.resume_token = None
+        self.alive = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def try_next(self):
+        if not self.events:
+            self.alive = False
+            return None
+        token, change = self.events.pop(0)
+        self.resume_token = token
+        return change
+
+
+def _tasks():
+    return mongomock.MongoClient().conductor_state.tasks
+
+
+def _record_sleeps(monkeypatch, limit: int, on_sleep=None) -> list:
+    sleeps = []
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        if on_sleep is not None:
+            on_sleep(len(sleeps))
+        if len(sleeps) >= limit:
+            raise StopDispatch
+
+    monkeypatch.setattr(task_dispatcher.time, "sleep", fake_sleep)
+    return sleeps
+
+
+def test_poll_backs_off_while_idle_and_resets_on_task(monkeypatch):
+    tasks = _tasks()
+
+    def insert_task(count):
+        if count == 6:
+            tasks.insert_one({"status": "pending", "created_at": datetime.utcnow()})
+
+    sleeps = _record_sleeps(monkeypatch, limit=9, on_sleep=insert_task)
+    dispatcher = TaskDispatcher(tasks, mode="poll", poll_min=0.05, poll_max=1.0)
+
+    delivered = []
+    with pytest.raises(StopDispatch):
+        for task in dispatcher.tasks():
+            delivered.append(task)
+            tasks.update_one({"_id": task["_id"]}, {"$set": {"status": "processing"}})
+
+    assert len(delivered) == 1
+    # Dobra até poll_max com a fila vazia; a task traz o intervalo de volta ao mínimo
+    assert sleeps == [0.05, 0.1, 0.2, 0.4, 0.8, 1.0, 0.05, 0.05, 0.1]
+
+
+def test_stream_persists_resume_token_and_resumes_from_it(monkeypatch):
+    tasks = _tasks()
+    task = {"_id": "t1", "status": "pending", "created_at": datetime.utcnow()}
+    opened_with = []
+
+    def watch(pipeline, full_document=None, resume_after=None, max_await_time_ms=None):
+        opened_with.append(resume_after)
+        if len(opened_with) > 1:
+            raise StopDispatch
+        return StubChangeStream([("token-1", {"fullDocument": task})])
+
+    monkeypatch.setattr(tasks, "watch", watch, raising=False)
+    dispatcher = TaskDispatcher(tasks, mode="stream")
+
+    delivered = []
+    with pytest.raises(StopDispatch):
+        for item in dispatcher.tasks():
+            delivered.append(item)
+
+    assert delivered == [task]
+    assert opened_with == [None, "token-1"]
+    # Um dispatcher novo (restart do watcher) retoma do token gravado
+    assert TaskDispatcher(tasks, mode="stream").load_resume_token() == "token-1"
+
+
+def test_stream_discards_token_when_history_is_lost(monkeypatch):
+    tasks = _tasks()
+    tasks.insert_one({"_id": "old", "status": "pending", "created_at": datetime.utcnow()})
+    dispatcher = TaskDispatcher(tasks, mode="stream")
+    dispatcher.save_resume_token("expired-token")
+    opened_with = []
+
+    def watch(pipeline, full_document=None, resume_after=None, max_await_time_ms=None):
+        opened_with.append(resume_after)
+        if resume_after is not None:
+            raise OperationFailure("resume point no longer in the oplog", code=286)
+        raise StopDispatch
+
+    monkeypatch.setattr(tasks, "watch", watch, raising=False)
+
+    with pytest.raises(StopDispatch):
+        list(dispatcher.tasks())
+
+    assert opened_with == ["expired-token", None]
+    assert dispatcher.load_resume_token() is None